@@ -0,0 +1,76 @@
+# ================== scripts/bench_answer_cache.py ==================
+# Answer cache check: fill services.answer_cache with the FAQ questions from
+# the system prompt (plus filler entries up to --size), then time lookups for
+# exact repeats, reworded near-duplicates and unrelated questions, and the
+# memory the cache holds.
+#
+#   python scripts/bench_answer_cache.py
+#   python scripts/bench_answer_cache.py --size 5000 -r 2000
+import os, sys, time, argparse, statistics, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services import answer_cache as ac
+
+FAQ = [
+    "What’s included in your SEO Starter vs Pro plan?",
+    "Which technologies do you use for web & app development?",
+    "How do you report results and KPIs to clients?",
+    "Can you help with AI search inclusion (ChatGPT, Gemini, Perplexity)?",
+    "Do you provide Shopify SEO and conversion optimization?",
+    "How do you track SEO performance? (traffic, keywords, CTR, conversions)",
+    "What’s included in Technical SEO? (site speed, schema, sitemaps)",
+    "How do you handle Local SEO for multiple markets?",
+    "Can you optimize Google Ads with GA4 reporting?",
+    "Do you offer Facebook Ads campaign management?",
+    "How do you improve Core Web Vitals and page speed?",
+    "How do you rank a new website fast on Google?",
+]
+REWORDED = [
+    "whats included in your seo starter vs pro plan",
+    "Which technologies do you use for web and app development",
+    "how do you report results and KPIs to your clients?",
+    "Do you provide Shopify SEO & conversion optimization?",
+    "How do you improve core web vitals and page speed??",
+]
+UNRELATED = [
+    "Do you offer Google Ads campaign management?",
+    "How do you handle international SEO for multiple markets?",
+    "What is the weather in Dhaka today?",
+]
+
+
+def run(size, rounds):
+    tracemalloc.start()
+    cache = ac.AnswerCache(size=size)
+    for i in range(size - len(FAQ)):
+        cache.put(f"filler question number {i} about topic {i * 7919 % 1000}", "x")
+    for q in FAQ:
+        cache.put(q, "answer: " + q)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    out = {}
+    for label, qs in (("exact", FAQ), ("reworded", REWORDED), ("unrelated", UNRELATED)):
+        times, hits = [], 0
+        for r in range(rounds):
+            q = qs[r % len(qs)]
+            t = time.perf_counter()
+            hits += cache.get(q) is not None
+            times.append(time.perf_counter() - t)
+        out[label] = (statistics.median(times) * 1e6, hits / rounds)
+    return out, held, cache.stats()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size", type=int, default=ac.CACHE_SIZE)
+    ap.add_argument("-r", "--rounds", type=int, default=500)
+    args = ap.parse_args()
+    out, held, stats = run(args.size, args.rounds)
+    print(f"{args.size} entries, {held / 1e6:.1f} MB held")
+    for label, (us, ratio) in out.items():
+        print(f"   {label:>9}: {us:9.1f} µs median   hit ratio {ratio:.2f}")
+    print(f"   stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# ================== scripts/bench_broadcast.py ==================
+# Agent-status broadcast cost: old broadcast_users (SELECT every cid from
+# `clients`, publish to each user:<cid>) versus the `users` broadcast channel
+# every live visitor stream subscribes to.
+#
+#   python scripts/bench_broadcast.py                    # 100k historical, 500 live
+#   python scripts/bench_broadcast.py --clients 1000000 --live 2000
+import os, sys, time, argparse, tempfile, statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services.db import ConnectionPool
+from services.hub import Hub
+from services.hub_backends import LocalBackend
+
+USERS = "users"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=100_000, help="rows in clients (historical)")
+    ap.add_argument("--live", type=int, default=500, help="open visitor streams")
+    ap.add_argument("-r", "--rounds", type=int, default=10)
+    args = ap.parse_args()
+
+    pool = ConnectionPool(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    with pool.tx() as con:
+        con.execute("CREATE TABLE clients(cid TEXT PRIMARY KEY, created REAL, last_seen REAL, online INTEGER DEFAULT 0)")
+        con.executemany("INSERT INTO clients VALUES(?,?,?,0)",
+                        ((f"client-{i:07d}", 0.0, float(i)) for i in range(args.clients)))
+
+    hub = Hub(LocalBackend())
+    step = max(1, args.clients // args.live)
+    live = [f"client-{i:07d}" for i in range(0, args.clients, step)][: args.live]
+    streams = [hub.subscribe((f"user:{c}", USERS)) for c in live]
+    for g in streams:
+        next(g)
+    data = {"online": True, "last_seen": time.time(), "ts": time.time()}
+
+    def drain():
+        for g in streams:
+            next(g)
+
+    def old():
+        cids = [r[0] for r in pool.query("SELECT cid FROM clients")]
+        for c in cids:
+            hub.publish(f"user:{c}", "agent_status", data)
+
+    def new():
+        hub.publish(USERS, "agent_status", data)
+
+    for label, fn in (("scan + per-cid publish", old), ("users channel", new)):
+        times = []
+        for _ in range(args.rounds):
+            t = time.perf_counter()
+            fn()
+            drain()
+            times.append(time.perf_counter() - t)
+        print(f"{label:>24}: {statistics.median(times) * 1000:9.2f} ms per broadcast "
+              f"({args.clients} clients, {len(live)} live)")
+
+
+if __name__ == "__main__":
+    main()
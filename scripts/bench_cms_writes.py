@@ -0,0 +1,79 @@
+# ================== scripts/bench_cms_writes.py ==================
+# CMS write-path check on a scratch copy of data/content.json:
+#   - P writer processes each append W items to one section via JSON-Patch
+#     (read-modify-write under the store's writer lock) → no update is lost
+#   - a reader process re-parses the file in a loop the whole time → it never
+#     sees a half-written file
+#   - for contrast, the old path (json.dump straight over the file) is run too
+#
+#   python scripts/bench_cms_writes.py -p 4 -w 50
+import os, sys, json, time, shutil, argparse, tempfile, multiprocessing as mp
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+from services.content_store import ContentStore
+
+
+def reader(path, stop, out):
+    reads = bad = 0
+    while not stop.is_set():
+        try:
+            with open(path) as f:
+                json.load(f)
+        except (ValueError, OSError):
+            bad += 1
+        reads += 1
+    out.put((reads, bad))
+
+
+def writer_store(path, n, k):
+    store = ContentStore(path, {}, check_sec=0)
+    for i in range(n):
+        store.patch_section("testimonials", [{"op": "add", "path": "/-",
+                                              "value": {"name": f"w{k}-{i}", "text": "ok", "rating": 5}}])
+
+
+def writer_naive(path, n, k):
+    for i in range(n):
+        try:
+            with open(path) as f:
+                content = json.load(f)
+        except ValueError:
+            continue
+        content["testimonials"].append({"name": f"w{k}-{i}", "text": "ok", "rating": 5})
+        with open(path, "w") as f:
+            json.dump(content, f, indent=2)
+
+
+def run(label, target, path, procs, n):
+    before = len(json.load(open(path))["testimonials"])
+    stop, out = mp.Event(), mp.Queue()
+    rd = mp.Process(target=reader, args=(path, stop, out))
+    rd.start()
+    t = time.perf_counter()
+    ws = [mp.Process(target=target, args=(path, n, k)) for k in range(procs)]
+    for w in ws: w.start()
+    for w in ws: w.join()
+    dt = time.perf_counter() - t
+    stop.set()
+    reads, bad = out.get()
+    rd.join()
+    after = len(json.load(open(path))["testimonials"])
+    print(f"{label:<7} {procs}x{n} appends in {dt:.2f}s: kept {after - before}/{procs * n}, "
+          f"reader saw {bad} broken files in {reads} reads")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-p", "--procs", type=int, default=4)
+    ap.add_argument("-w", "--writes", type=int, default=50)
+    args = ap.parse_args()
+    d = tempfile.mkdtemp()
+    for label, target in (("naive", writer_naive), ("store", writer_store)):
+        path = os.path.join(d, f"{label}.json")
+        shutil.copy(os.path.join(SRC, "data", "content.json"), path)
+        run(label, target, path, args.procs, args.writes)
+
+
+if __name__ == "__main__":
+    main()
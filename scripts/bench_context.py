@@ -0,0 +1,57 @@
+# ================== scripts/bench_context.py ==================
+# Context builder check: grow one conversation turn by turn and print the
+# prompt size (estimated tokens) and build time — it should level off at the
+# budget instead of growing with the conversation, while the rolling summary
+# absorbs the turns that slide out of the window.
+#
+#   python scripts/bench_context.py --turns 400
+import os, sys, time, argparse, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services.db import ConnectionPool
+from services.context import ContextBuilder, estimate_tokens
+
+SYSTEM = "You are the AI assistant for DMS MEHEDI. Answer in clear, concise English. " * 4
+USER = ["What’s included in your SEO Starter vs Pro plan?",
+        "How long until we see results for a Shopify store? আমাদের দোকান নতুন।",
+        "Can you also run Google Ads with GA4 reporting for us?",
+        "And what would a monthly retainer look like for both?"]
+BOT = ("Starter covers on-page basics, GBP setup and an analytics baseline. Pro adds content clusters, "
+       "link outreach and monthly growth sprints. Happy to tailor a quote.")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--turns", type=int, default=300)
+    ap.add_argument("--every", type=int, default=50, help="print every N turns")
+    args = ap.parse_args()
+
+    pool = ConnectionPool(os.path.join(tempfile.mkdtemp(), "ctx.db"))
+    with pool.tx() as con:
+        con.execute("CREATE TABLE messages(id INTEGER PRIMARY KEY AUTOINCREMENT, cid TEXT, role TEXT, content TEXT, ts REAL)")
+        con.execute("CREATE INDEX idx_messages_cid_id ON messages(cid,id)")
+        con.execute("CREATE TABLE conversation_summaries(cid TEXT PRIMARY KEY, upto_id INTEGER, summary TEXT, updated REAL)")
+    ctx = ContextBuilder(pool)
+    naive_total = 0
+    print(f"{'turns':>6} {'naive tokens':>13} {'packed tokens':>14} {'msgs':>5} {'build ms':>9}")
+    for i in range(1, args.turns + 1):
+        q = f"{USER[i % len(USER)]} (#{i})"
+        with pool.tx() as con:
+            msg_id = con.execute("INSERT INTO messages(cid,role,content,ts) VALUES('c','user',?,?)",
+                                 (q, time.time())).lastrowid
+        naive_total += estimate_tokens(q)
+        t = time.perf_counter()
+        msgs = ctx.build("c", q, SYSTEM, before_id=msg_id)
+        ms = (time.perf_counter() - t) * 1000
+        with pool.tx() as con:
+            con.execute("INSERT INTO messages(cid,role,content,ts) VALUES('c','bot',?,?)", (BOT, time.time()))
+        naive_total += estimate_tokens(BOT)
+        if i % args.every == 0 or i == 1:
+            packed = sum(estimate_tokens(m["content"]) for m in msgs)
+            print(f"{i:>6} {naive_total + estimate_tokens(SYSTEM):>13} {packed:>14} {len(msgs):>5} {ms:>9.2f}")
+    print(ctx.stats())
+    print("summary:\n" + msgs[0]["content"].split("(summary):\n", 1)[-1])
+
+
+if __name__ == "__main__":
+    main()
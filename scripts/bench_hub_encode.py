@@ -0,0 +1,81 @@
+# ================== scripts/bench_hub_encode.py ==================
+# Micro-benchmark: SSE fan-out with per-subscriber encoding (the old Hub:
+# every stream() ran json.dumps + f-string framing itself) versus encode-once
+# (services.hub: publish frames the event once, all subscribers share the bytes).
+#
+#   python scripts/bench_hub_encode.py            # 1k and 10k subscribers
+#   python scripts/bench_hub_encode.py -s 500 -s 50000 -r 20
+import os, sys, json, time, argparse, statistics
+from queue import Queue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services.hub import Hub
+from services.hub_backends import LocalBackend
+
+PAYLOAD = {
+    "cid": "client-3f9c2a7e-5d1b-4c8e-9a0f-1b2c3d4e5f60", "role": "user",
+    "text": "Hi! What’s included in your SEO Starter vs Pro plan? আমি দাম জানতে চাই।",
+    "mid": "u_4b1f0c9d2e3a", "tempId": "k3j9x2", "ts": 1760000000.123,
+}
+
+
+def legacy_stream(q):
+    # the pre-change Hub.subscribe().stream() body, minus the keep-alive timeout
+    yield "retry: 10000\n\n"
+    while True:
+        item = q.get()
+        ev   = item.get("event", "message")
+        data = json.dumps(item.get("data", {}), ensure_ascii=False)
+        yield (f"event: {ev}\n" f"data: {data}\n\n").encode("utf-8")
+
+
+def per_subscriber(n, rounds):
+    """Old behaviour: the dict is queued, each subscriber serializes it."""
+    subs = [Queue() for _ in range(n)]
+    streams = [legacy_stream(q) for q in subs]
+    for g in streams:
+        next(g)
+    times = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        msg = {"event": "message", "data": PAYLOAD}
+        for q in subs:
+            q.put_nowait(msg)
+        for g in streams:
+            next(g)
+        times.append(time.perf_counter() - t)
+    return times
+
+
+def encode_once(n, rounds):
+    """services.hub: publish encodes once, subscribers yield the shared frame."""
+    hub = Hub(LocalBackend())
+    streams = [hub.subscribe("admin") for _ in range(n)]
+    for g in streams:
+        next(g)                       # opening frame
+    times = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        hub.publish("admin", "message", PAYLOAD)
+        for g in streams:
+            next(g)
+        times.append(time.perf_counter() - t)
+    for g in streams:
+        g.close()
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-s", "--subscribers", type=int, action="append")
+    ap.add_argument("-r", "--rounds", type=int, default=10)
+    args = ap.parse_args()
+    for n in args.subscribers or [1000, 10000]:
+        old = statistics.median(per_subscriber(n, args.rounds)) * 1000
+        new = statistics.median(encode_once(n, args.rounds)) * 1000
+        print(f"{n:>6} subscribers  per-subscriber: {old:8.2f} ms   encode-once: {new:8.2f} ms   "
+              f"speedup x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
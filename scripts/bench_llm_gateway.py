@@ -0,0 +1,114 @@
+# ================== scripts/bench_llm_gateway.py ==================
+# LLM gateway check with the fake client (no key, no network):
+#   1. burst of N threads, half asking the same question → upstream calls,
+#      coalesced joins, peak concurrency, latency histogram
+#   2. the same with stream=True (joiners replay the leader's pieces)
+#   3. a failing upstream trips the circuit breaker; later calls fail fast
+#
+#   python scripts/bench_llm_gateway.py -n 40 -c 4
+import os, sys, time, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services.fake_llm import FakeOpenAI
+from services.llm_gateway import LLMGateway, CircuitOpen
+
+
+class Peak:
+    """Wraps a client and records the highest number of concurrent create() calls."""
+
+    def __init__(self, inner):
+        self.inner, self.now, self.peak, self.lock = inner, 0, 0, threading.Lock()
+        self.chat = self
+        self.completions = self
+
+    def create(self, **kw):
+        with self.lock:
+            self.now += 1
+            self.peak = max(self.peak, self.now)
+        if kw.get("stream"):
+            return self._stream(self.inner.chat.completions.create(**kw))
+        try:
+            return self.inner.chat.completions.create(**kw)
+        finally:
+            self._done()
+
+    def _stream(self, chunks):
+        try:
+            yield from chunks
+        finally:
+            self._done()
+
+    def _done(self):
+        with self.lock:
+            self.now -= 1
+
+
+class Broken:
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+        self.calls = 0
+
+    def create(self, **kw):
+        self.calls += 1
+        time.sleep(0.01)
+        raise TimeoutError("upstream timed out")
+
+
+def burst(args, stream):
+    gw = LLMGateway(max_concurrency=args.concurrency, queue_timeout=60)
+    client = Peak(FakeOpenAI(latency_ms=args.latency, ttft_ms=args.latency / 5))
+    msgs = lambda i: [{"role": "user", "content": "What’s included in your SEO Starter vs Pro plan?"
+                       if i % 2 == 0 else f"distinct question {i}"}]
+
+    def one(i):
+        if stream:
+            return "".join(gw.stream(client, "gpt-4o-mini", msgs(i)))
+        return gw.complete(client, "gpt-4o-mini", msgs(i))
+
+    t = time.perf_counter()
+    with ThreadPoolExecutor(args.requests) as ex:
+        answers = list(ex.map(one, range(args.requests)))
+    wall = time.perf_counter() - t
+    st = gw.stats()
+    same = {a for i, a in enumerate(answers) if i % 2 == 0}
+    print(f"{'stream' if stream else 'complete':>8}: {args.requests} requests in {wall:.2f}s  "
+          f"upstream calls={st['calls']} coalesced={st['coalesced']}  peak in-flight={client.peak} "
+          f"(limit {args.concurrency})  identical answers agree={len(same) == 1}")
+    print(f"          latency {st['latency']['count']} calls p50<={st['latency']['p50_ms']}ms "
+          f"p95<={st['latency']['p95_ms']}ms" + (f"  ttft p50<={st['ttft']['p50_ms']}ms" if stream else ""))
+
+
+def breaker():
+    gw = LLMGateway(max_concurrency=2, breaker_failures=3, breaker_cooldown=0.5)
+    bad = Broken()
+    errors = []
+    for i in range(8):
+        try:
+            gw.complete(bad, "gpt-4o-mini", [{"role": "user", "content": f"q{i}"}])
+        except Exception as e:
+            errors.append(type(e).__name__)
+    st = gw.stats()
+    print(f" breaker: 8 calls → upstream hit {bad.calls}x, errors {errors}, state={st['breaker']}")
+    time.sleep(0.6)
+    try:
+        gw.complete(FakeOpenAI(latency_ms=10), "gpt-4o-mini", [{"role": "user", "content": "probe"}])
+        print(f"          after cooldown: probe ok, state={gw.stats()['breaker']}")
+    except CircuitOpen:
+        print("          after cooldown: still open (unexpected)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--requests", type=int, default=40)
+    ap.add_argument("-c", "--concurrency", type=int, default=4)
+    ap.add_argument("--latency", type=float, default=300, help="fake completion ms")
+    args = ap.parse_args()
+    burst(args, stream=False)
+    burst(args, stream=True)
+    breaker()
+
+
+if __name__ == "__main__":
+    main()
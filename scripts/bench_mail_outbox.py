@@ -0,0 +1,95 @@
+# ================== scripts/bench_mail_outbox.py ==================
+# Mail outbox check against a local debug SMTP stand-in (stdlib only, no TLS,
+# no AUTH): queue N mails, drain, and report how many SMTP sessions it took
+# (should be 1) and the time per mail. Then stop the server, queue more, and
+# show they stay queued with a backoff instead of being lost.
+#
+#   python scripts/bench_mail_outbox.py -n 200
+import os, sys, time, argparse, tempfile, threading, socketserver
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services.db import ConnectionPool
+from services.mailer import Outbox
+
+
+class DebugSMTP(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail: EHLO/MAIL/RCPT/DATA/NOOP/RSET/QUIT."""
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.sessions += 1
+        self.reply("220 debug ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode(errors="replace").strip().upper()
+            if cmd.startswith("EHLO"):
+                self.reply("250-debug\r\n250 8BITMIME")
+            elif cmd.startswith("HELO") or cmd.startswith(("MAIL", "RCPT", "NOOP", "RSET")):
+                self.reply("250 OK")
+            elif cmd == "DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                self.server.received += 1
+                self.reply("250 queued")
+            elif cmd == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    sessions = received = 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200)
+    args = ap.parse_args()
+
+    srv = Server(("127.0.0.1", 0), DebugSMTP)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    os.environ.update({"EMAIL_HOST": "127.0.0.1", "EMAIL_PORT": str(srv.server_address[1]),
+                       "EMAIL_USE_TLS": "0", "EMAIL_HOST_USER": "site@example.com",
+                       "EMAIL_HOST_PASSWORD": "x", "EMAIL_TO": "owner@example.com"})
+
+    pool = ConnectionPool(os.path.join(tempfile.mkdtemp(), "mail.db"))
+    with pool.tx() as con:
+        con.execute("""CREATE TABLE mail_outbox(id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL, to_addr TEXT,
+                       subject TEXT, body TEXT, reply_to TEXT, ref TEXT, status TEXT DEFAULT 'queued',
+                       attempts INTEGER DEFAULT 0, next_try REAL, last_error TEXT, sent_at REAL)""")
+        con.execute("CREATE INDEX idx_mail_outbox_due ON mail_outbox(status,next_try)")
+    box = Outbox(pool)
+
+    t = time.perf_counter()
+    for i in range(args.n):
+        with pool.tx() as con:
+            box.enqueue(con, f"Contact #{i}", "hello " * 40, reply_to="visitor@example.com", ref=f"contact:{i}")
+    enq = time.perf_counter() - t
+    print(f"enqueue: {enq / args.n * 1e3:.3f} ms/mail (what the request pays)")
+
+    t = time.perf_counter()
+    sent = box.drain()
+    dt = time.perf_counter() - t
+    print(f"drain:   {sent} sent in {dt * 1e3:.0f} ms ({dt / max(sent, 1) * 1e3:.2f} ms/mail), "
+          f"server got {srv.received} over {srv.sessions} SMTP session(s)")
+
+    srv.shutdown(); srv.server_close()
+    box._close()
+    with pool.tx() as con:
+        box.enqueue(con, "While down", "hello")
+    box.drain()
+    row = pool.query_one("SELECT status, attempts, next_try - ?, last_error FROM mail_outbox ORDER BY id DESC LIMIT 1",
+                         (time.time(),))
+    print(f"server down: status={row[0]} attempts={row[1]} retry in {row[2]:.0f}s ({row[3]})")
+    print(box.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# ================== scripts/bench_ratelimit.py ==================
+# Rate limiter check:
+#   1. spray: hits from N distinct (fake) IPs — memory stays bounded by
+#      max_keys instead of growing with every address ever seen
+#   2. contention: T threads hammering the memory backend (sharded locks)
+#   3. sqlite backend: two processes share one bucket, so together they get
+#      the limit once, not once each
+#
+#   python scripts/bench_ratelimit.py --spray 200000 --threads 8
+import os, sys, time, argparse, tempfile, threading, multiprocessing as mp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services.db import ConnectionPool
+from services.ratelimit import RateLimiter
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS rate_buckets(name TEXT, key TEXT, tokens REAL, ts REAL,
+            PRIMARY KEY(name, key)) WITHOUT ROWID"""
+
+
+def spray(n, max_keys):
+    rl = RateLimiter("spray", 3, 300, max_keys=max_keys, backend="memory")
+    t = time.perf_counter()
+    for i in range(n):
+        rl.hit(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")
+    dt = time.perf_counter() - t
+    s = rl.stats()
+    print(f"spray    {n} IPs: {dt / n * 1e6:.2f} µs/hit, keys held {s['keys']} (cap {max_keys}), evicted {s['evicted']}")
+
+
+def contention(threads, per_thread):
+    rl = RateLimiter("hot", 1000, 1, backend="memory")
+    def work(k):
+        for i in range(per_thread):
+            rl.hit(f"ip{k}-{i % 64}")
+    ts = [threading.Thread(target=work, args=(k,)) for k in range(threads)]
+    t = time.perf_counter()
+    for th in ts: th.start()
+    for th in ts: th.join()
+    dt = time.perf_counter() - t
+    total = threads * per_thread
+    print(f"threads  {threads}x{per_thread}: {total / dt:,.0f} hits/s")
+
+
+def _worker(path, n, out):
+    rl = RateLimiter("shared", 10, 60, pool=ConnectionPool(path), backend="sqlite")
+    out.put(sum(rl.hit("1.2.3.4")[0] for _ in range(n)))
+
+
+def shared(procs, n):
+    path = os.path.join(tempfile.mkdtemp(), "rl.db")
+    with ConnectionPool(path).tx() as con:
+        con.execute(SCHEMA)
+    out = mp.Queue()
+    ps = [mp.Process(target=_worker, args=(path, n, out)) for _ in range(procs)]
+    t = time.perf_counter()
+    for p in ps: p.start()
+    allowed = [out.get() for _ in ps]
+    for p in ps: p.join()
+    dt = time.perf_counter() - t
+    print(f"sqlite   {procs} procs x {n} hits on one IP (limit 10/min): allowed {allowed} "
+          f"= {sum(allowed)} total, {dt / (procs * n) * 1e3:.3f} ms/hit")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--spray", type=int, default=200000)
+    ap.add_argument("--max-keys", type=int, default=10000)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--procs", type=int, default=2)
+    args = ap.parse_args()
+    spray(args.spray, args.max_keys)
+    contention(args.threads, 50000)
+    shared(args.procs, 200)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# ================== scripts/bench_startup.py ==================
+# Cold-start check: time `import main` (what a worker does on boot) in fresh
+# interpreters, and report whether the OpenAI SDK / httpx got imported on the
+# way. For scale, also times importing the SDK alone.
+# Note: importing main runs ensure_db() against src/dms_ai.db, as a boot would.
+#
+#   python scripts/bench_startup.py            # 5 runs each
+#   python scripts/bench_startup.py -n 10
+import os, sys, json, argparse, statistics, subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+print(json.dumps({{"sec": time.perf_counter() - t,
+                  "openai": "openai" in sys.modules, "httpx": "httpx" in sys.modules,
+                  "PIL": "PIL" in sys.modules}}))
+"""
+
+
+def run(module, n, env):
+    out = []
+    for _ in range(n):
+        p = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=SRC, env=env,
+                           capture_output=True, text=True, check=True)
+        out.append(json.loads(p.stdout.strip().splitlines()[-1]))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", "--runs", type=int, default=5)
+    args = ap.parse_args()
+    env = {**os.environ, "PYTHONPATH": SRC, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-startup-bench")}
+    for module in ("openai", "main"):
+        res = run(module, args.runs, env)
+        ms = statistics.median(r["sec"] for r in res) * 1000
+        print(f"import {module:<7} median {ms:8.1f} ms over {args.runs} runs   "
+              f"openai loaded={res[0]['openai']}  httpx loaded={res[0]['httpx']}  PIL loaded={res[0]['PIL']}")
+
+
+if __name__ == "__main__":
+    main()
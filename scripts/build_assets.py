@@ -0,0 +1,37 @@
+# ================== scripts/build_assets.py ==================
+# Static asset build (run on deploy, before the app starts):
+#   fingerprint src/static/{css,js,images,assets,sound}/* into src/static/_build/
+#   with .gz/.br siblings, rewrite references in CSS/JS, index.html, faq.html
+#   and templates/dms-admin.html, and write _build/manifest.json.
+#   If scripts/build_images.py ran first, <img sizes=…> tags get a srcset.
+# The app picks the manifest up at startup; without it everything is served
+# from src/static as before.
+#
+#   python scripts/build_assets.py
+import os, sys, time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+from services import assets, precompress
+from services.images import ImageManifest
+
+
+def main():
+    t = time.perf_counter()
+    imgs = ImageManifest(os.path.join(SRC, "static", "_img"))
+    m = assets.build(os.path.join(SRC, "static"), os.path.join(SRC, "templates"),
+                     images=imgs if imgs.ready else None)
+    raw = sum(a["size"] for a in m["assets"].values())
+    print(f"{len(m['assets'])} assets ({raw / 1024:.0f} KB), {len(m['pages'])} pages "
+          f"in {time.perf_counter() - t:.2f}s  (brotli: {'yes' if precompress.brotli else 'no'}, "
+          f"srcset: {'yes' if imgs.ready else 'no'})")
+    for rel, hashed in m["files"].items():
+        a = m["assets"][hashed]
+        if a["enc"]:
+            sizes = ", ".join(f"{e} {os.path.getsize(os.path.join(SRC, 'static', '_build', hashed) + precompress.SUFFIX[e]) / 1024:.1f} KB"
+                              for e in a["enc"])
+            print(f"  {rel:<28} {a['size'] / 1024:7.1f} KB → {sizes}")
+
+
+if __name__ == "__main__":
+    main()
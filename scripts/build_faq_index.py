@@ -0,0 +1,128 @@
+# ================== scripts/build_faq_index.py ==================
+# Offline build of the FAQ answer index (services/faq_index.py):
+#   - every question listed in FAQ_PROMPT, answered once by the LLM (with
+#     FAQ_PROMPT as the system prompt)
+#   - the hand-written Q&A of the FAQ accordion in static/faq.html, as is
+# Run at deploy time (needs OPENAI_API_KEY, or AI_FAKE=1 for a dry run):
+#
+#   python scripts/build_faq_index.py
+#   python scripts/build_faq_index.py --no-llm          # faq.html answers only
+#   python scripts/build_faq_index.py -o /tmp/faq.bin -j 8
+import os, re, sys, html, time, argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from services.faq_index import INDEX_PATH, FaqIndex, write_index
+
+SRC_DIR  = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+FAQ_HTML = os.path.join(SRC_DIR, "static", "faq.html")
+
+FAQ_ITEM = re.compile(r'<button class="faq-q">\s*<span>(.*?)</span>.*?'
+                      r'<div class="faq-a-inner">(.*?)<button class="faq-ask"', re.S)
+
+# -- Company/system context (উত্তরগুলো consistent হবে)
+FAQ_PROMPT = (
+    "You are the AI assistant for DMS MEHEDI. "
+    "Answer in clear, concise English. "
+    "Company focus: Digital Marketing (SEO/SEM, Google Ads & FB Ads, content, analytics), "
+    "Front-end and Backend web development, Shopify dropshipping. "
+    "Experience: 4+ years; Roles: Head of Marketing at Move X Health; worked with Hello Matlab Grocery and Softollyo. "
+    "When asked about pricing, briefly outline tiers and invite to contact for bespoke quotes. "
+    "Do not invent private data; keep paragraphs short; use bullet points when helpful."
+    "Answer in clear, concise English"
+    "💡 Frequent user queries to handle:\n"
+    "- What’s included in your SEO Starter vs Pro plan?\n"
+    "- Which technologies do you use for web & app development?\n"
+    "- How do you report results and KPIs to clients?\n"
+    "- Can you help with AI search inclusion (ChatGPT, Gemini, Perplexity)?\n"
+    "- Do you provide Shopify SEO and conversion optimization?\n"
+    "- How do you track SEO performance? (traffic, keywords, CTR, conversions)\n"
+    "- Do you prepare websites for AI search visibility?\n"
+    "- What’s included in Technical SEO? (site speed, schema, sitemaps)\n"
+    "- How do you handle Local SEO for multiple markets?\n"
+    "- Do you create SEO content and landing pages?\n"
+    "- Can you optimize Google Ads with GA4 reporting?\n"
+    "- Do you offer Facebook Ads campaign management?\n"
+    "- How do you structure backlink building strategies?\n"
+    "- What is your content strategy for ranking blogs?\n"
+    "- Do you set up Google Business Profile for local SEO?\n"
+    "- How do you improve Core Web Vitals and page speed?\n"
+    "- Do you help with eCommerce (Shopify, WooCommerce, WordPress) SEO?\n"
+    "- Can you create conversion-focused landing pages?\n"
+    "- Do you provide competitor SEO analysis and keyword research?\n"
+    "- How do you handle multi-language or international SEO?\n"
+    "- Do you help with YouTube SEO and video ranking?\n"
+    "- Can you integrate AI tools into websites for better engagement?\n"
+    "How do you rank a new website fast on Google?"
+    "What are the best tools for keyword research in 2025?"
+    "How can you optimize content for Google’s Helpful Content Update?"
+    "What’s the difference between on-page SEO and off-page SEO?"
+    "How do you use AI (ChatGPT, Gemini, Claude) for SEO content writing?"
+    "How do you track and improve Domain Authority (DA/DR)?"
+    "What are the top backlink strategies that actually work in 2025?"
+    "How do you structure pillar pages and topic clusters for SEO?"
+    "Can you integrate Google Analytics 4 (GA4) with Google Ads for better ROI?"
+    "How do you run Performance Max campaigns effectively?"
+    "What are the top strategies for ranking local businesses on Google Maps?"
+    "How do you optimize voice search (Siri, Alexa, Google Assistant) for SEO?"
+    "What’s the role of E-E-A-T in Google ranking and how do you improve it?"
+    "How do you optimize an eCommerce store for both SEO and conversions?"
+    "How do you prepare content for AI Overviews in Google Search?"
+)
+
+
+def prompt_questions(system_prompt):
+    """FAQ lines after 'Frequent user queries' — some '- ' bullets, some run together."""
+    tail = system_prompt.split("Frequent user queries to handle:", 1)[-1]
+    seen, out = set(), []
+    for q in re.findall(r"[^?\n]+\?", tail):
+        q = q.strip().lstrip("- ").strip()
+        if q and q.lower() not in seen:
+            seen.add(q.lower())
+            out.append(q)
+    return out
+
+
+def page_items(path=FAQ_HTML):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    out = []
+    for q, a in FAQ_ITEM.findall(text):
+        a = html.unescape(re.sub(r"<[^>]+>", " ", a))
+        out.append((html.unescape(q).strip(), re.sub(r"\s+", " ", a).strip()))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-o", "--output", default=INDEX_PATH)
+    ap.add_argument("-j", "--jobs", type=int, default=4, help="parallel LLM calls")
+    ap.add_argument("--no-llm", action="store_true", help="index faq.html answers only")
+    args = ap.parse_args()
+
+    entries = [{"q": q, "a": a, "sources": [{"title": f"FAQ: {q}", "uri": "/faq"}]}
+               for q, a in page_items()]
+    print(f"faq.html: {len(entries)} answers")
+
+    if not args.no_llm:
+        from services import ai
+        questions = prompt_questions(FAQ_PROMPT)
+        t = time.perf_counter()
+        with ThreadPoolExecutor(args.jobs) as ex:
+            answers = list(ex.map(lambda q: ai.complete([{"role": "system", "content": FAQ_PROMPT},
+                                                         {"role": "user", "content": q}], temperature=0.5),
+                                  questions))
+        print(f"FAQ_PROMPT: {len(questions)} answers in {time.perf_counter() - t:.1f}s")
+        entries += [{"q": q, "a": (a or "").strip(),
+                     "sources": [{"title": "DMS MEHEDI — FAQ", "uri": "/faq"},
+                                 {"title": "Contact for a tailored quote", "uri": "/contact"}]}
+                    for q, a in zip(questions, answers) if (a or "").strip()]
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    write_index(args.output, entries)
+    idx = FaqIndex(args.output)
+    print(f"wrote {args.output}: {idx.n} entries, {os.path.getsize(args.output)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# ================== scripts/build_images.py ==================
+# Responsive image build (run on deploy, before scripts/build_assets.py):
+#   resize src/static/images/* to the standard widths as AVIF/WebP + JPEG/PNG
+#   into src/static/_img/ in a process pool, skipping sources whose hash is
+#   unchanged since the last run, and write _img/manifest.json.
+# build_assets.py then adds srcset (/img/… URLs) to <img sizes=…> tags.
+#
+#   python scripts/build_images.py [-j WORKERS] [--force]
+import os, sys, time, shutil, argparse
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+from services import images
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-j", "--workers", type=int, default=images.WORKERS)
+    ap.add_argument("--force", action="store_true", help="re-encode everything")
+    args = ap.parse_args()
+    if not images.available():
+        print("Pillow not installed — skipping image derivatives (originals are served)")
+        return
+    out_dir = os.path.join(SRC, "static", "_img")
+    if args.force:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    t = time.perf_counter()
+    m, rebuilt = images.build(os.path.join(SRC, "static", "images"), out_dir, workers=args.workers)
+    print(f"{len(m['images'])} images, {len(rebuilt)} re-encoded ({args.workers} workers) "
+          f"in {time.perf_counter() - t:.2f}s  (formats: {', '.join(images.modern_formats()) or 'fallback only'})")
+    for rel, e in m["images"].items():
+        best = {fmt: per_w[str(max(int(w) for w in per_w))]["size"] for fmt, per_w in e["variants"].items()}
+        sizes = ", ".join(f"{fmt} {n / 1024:.0f} KB" for fmt, n in best.items())
+        print(f"  {rel:<40} {e['size'] / 1024:7.0f} KB {e['width']}px → {sizes}"
+              f"{'' if rel in rebuilt else '  (unchanged)'}")
+
+
+if __name__ == "__main__":
+    main()
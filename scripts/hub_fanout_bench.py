@@ -0,0 +1,75 @@
+# ================== scripts/hub_fanout_bench.py ==================
+# Cross-process Hub check: spawn W worker processes, each subscribed to the same
+# channel through HUB_BACKEND=unix:…, publish from one of them, and verify every
+# worker receives every event. Prints per-worker and overall fan-out latency.
+#
+#   python scripts/hub_fanout_bench.py -w 4 -n 500
+import os, sys, json, time, argparse, tempfile, threading, statistics, multiprocessing as mp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+
+def worker(idx, sock, n, ready, results, publisher):
+    from services.hub import Hub
+    from services.hub_backends import UnixSocketBackend
+    hub = Hub(UnixSocketBackend(sock))
+    stream = hub.subscribe("bench")
+    next(stream)                                   # retry: frame → subscribed
+    while not hub.backend.sock:                    # broker connection up
+        time.sleep(0.01)
+    ready.put(idx)
+    if publisher:
+        def publish():
+            publisher.wait()
+            for i in range(n):
+                hub.publish("bench", "tick", {"i": i, "t": time.time(), "from": idx})
+                time.sleep(0.001)
+        threading.Thread(target=publish, daemon=True).start()
+    lat, seen = [], set()
+    deadline = time.time() + 30
+    while len(seen) < n and time.time() < deadline:
+        frame = next(stream)
+        if b"event: tick\n" not in frame:
+            continue
+        data = json.loads(frame.split(b"data: ", 1)[1])
+        seen.add(data["i"])
+        lat.append((time.time() - data["t"]) * 1000)
+    results.put((idx, len(seen), lat))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-w", "--workers", type=int, default=4)
+    ap.add_argument("-n", "--events", type=int, default=500)
+    args = ap.parse_args()
+
+    ctx = mp.get_context("spawn")
+    sock = os.path.join(tempfile.mkdtemp(), "hub.sock")
+    ready, results, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = [ctx.Process(target=worker, args=(i, sock, args.events, ready, results, go if i == 0 else None))
+             for i in range(args.workers)]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        ready.get(timeout=30)
+    time.sleep(0.2)            # let the last connections register with the broker
+    go.set()
+
+    ok, all_lat = True, []
+    for _ in procs:
+        idx, got, lat = results.get(timeout=60)
+        lat.sort()
+        all_lat += lat
+        ok &= got == args.events
+        print(f"worker {idx}: {got}/{args.events} events  "
+              f"p50={statistics.median(lat):.2f}ms  p99={lat[int(len(lat) * .99) - 1]:.2f}ms  max={lat[-1]:.2f}ms")
+    for p in procs:
+        p.join()
+    all_lat.sort()
+    print(f"all workers: p50={statistics.median(all_lat):.2f}ms  p99={all_lat[int(len(all_lat) * .99) - 1]:.2f}ms")
+    print("OK — every worker received every event" if ok else "FAIL — events lost")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# ================== scripts/sse_loadtest.py ==================
+# Open N concurrent /sse/stream/<cid> connections and hold them.
+# Reports how many streams were established/kept and the delivery latency of
+# probe events pushed through /api/typing while all streams are open.
+#
+#   uvicorn asgi:app --app-dir src --port 8000 &
+#   ulimit -n 65535
+#   python scripts/sse_loadtest.py --url http://127.0.0.1:8000 -n 10000 --hold 60
+import argparse, asyncio, json, time, statistics
+from urllib.parse import urlparse
+
+
+async def open_stream(host, port, cid, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    writer.write((f"GET /sse/stream/{cid} HTTP/1.1\r\nHost: {host}\r\n"
+                  "Accept: text/event-stream\r\nCache-Control: no-cache\r\n\r\n").encode())
+    await writer.drain()
+    # wait for the first frame ("retry: …") so the subscription is live
+    while True:
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line:
+            raise ConnectionError("closed before first frame")
+        if line.startswith(b"retry:"):
+            return reader, writer
+
+
+async def post_json(host, port, path, body):
+    reader, writer = await asyncio.open_connection(host, port)
+    raw = json.dumps(body).encode()
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(raw)}\r\nConnection: close\r\n\r\n").encode() + raw)
+    await writer.drain()
+    status = (await reader.readline()).split(b" ")[1]
+    writer.close()
+    return int(status)
+
+
+class Stream:
+    """One open SSE connection; a reader task drains frames and resolves event waiters."""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.closed = False
+        self.waiters = {}
+        self.task = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"event: "):
+                    fut = self.waiters.pop(line[7:].strip().decode(), None)
+                    if fut and not fut.done():
+                        fut.set_result(time.perf_counter())
+        finally:
+            self.closed = True
+
+    def expect(self, event):
+        fut = self.waiters[event] = asyncio.get_running_loop().create_future()
+        return fut
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+
+async def main(args):
+    u = urlparse(args.url)
+    host, port = u.hostname, u.port or 80
+    sem = asyncio.Semaphore(args.concurrency)
+    streams, failed = {}, 0
+
+    async def connect(i):
+        nonlocal failed
+        cid = f"load-{args.tag}-{i}"
+        async with sem:
+            try:
+                streams[cid] = Stream(*await open_stream(host, port, cid, args.timeout))
+            except Exception:
+                failed += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(connect(i) for i in range(args.n)))
+    print(f"established {len(streams)}/{args.n} streams in {time.perf_counter() - t0:.1f}s ({failed} failed)")
+
+    # probe: push a typing event to a sample of cids and time its arrival
+    lat = []
+    for cid in list(streams)[:: max(1, len(streams) // args.probes)][: args.probes]:
+        fut = streams[cid].expect("typing")
+        t = time.perf_counter()
+        status = await post_json(host, port, "/api/typing", {"cid": cid, "who": "agent", "state": True})
+        try:
+            lat.append((await asyncio.wait_for(fut, args.timeout) - t) * 1000)
+        except asyncio.TimeoutError:
+            print(f"probe {cid}: no event (POST {status})")
+    if lat:
+        lat.sort()
+        print(f"probe latency ms: p50={statistics.median(lat):.1f} "
+              f"p95={lat[min(len(lat) - 1, int(len(lat) * .95))]:.1f} max={lat[-1]:.1f} (n={len(lat)})")
+
+    # hold and watch for drops
+    started = time.monotonic()
+    while time.monotonic() - started < args.hold:
+        await asyncio.sleep(min(5, args.hold))
+        alive = sum(1 for s in streams.values() if not s.closed)
+        print(f"[{time.monotonic() - started:5.0f}s] open streams: {alive}")
+
+    alive = sum(1 for s in streams.values() if not s.closed)
+    for s in streams.values():
+        s.close()
+    print(f"sustained {alive} concurrent streams")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("-n", type=int, default=1000, help="concurrent streams")
+    ap.add_argument("--hold", type=float, default=30, help="seconds to keep streams open")
+    ap.add_argument("--concurrency", type=int, default=500, help="parallel connects")
+    ap.add_argument("--probes", type=int, default=20)
+    ap.add_argument("--timeout", type=float, default=20)
+    ap.add_argument("--tag", default=str(int(time.time())))
+    asyncio.run(main(ap.parse_args()))
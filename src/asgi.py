@@ -0,0 +1,97 @@
+# ================== src/asgi.py ==================
+# ASGI entrypoint — SSE streams run on the event loop, everything else is the
+# Flask app behind a fixed-size WSGI thread pool.
+#   PYTHONPATH=src gunicorn -w 1 -k uvicorn.workers.UvicornWorker src.asgi:app
+# An idle /sse/* subscriber is a coroutine + asyncio.Queue, so open widgets no
+# longer pin the threads that serve /api/* requests.
+import os, asyncio
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+from a2wsgi import WSGIMiddleware
+from main import app as flask_app, hub, touch_client, user_channels, CONTENT_CHANNEL
+
+WSGI_THREADS = int(os.getenv("WSGI_THREADS", "8"))
+
+wsgi = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"),
+    (b"access-control-allow-origin", b"*"),
+]
+
+
+def _admin_logged_in(scope) -> bool:
+    """Read the Flask session cookie without entering a request context."""
+    raw = b"; ".join(v for k, v in scope.get("headers", ()) if k == b"cookie").decode("latin-1")
+    morsel = SimpleCookie(raw).get(flask_app.config.get("SESSION_COOKIE_NAME", "session"))
+    if morsel is None:
+        return False
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if serializer is None:
+        return False
+    try:
+        data = serializer.loads(morsel.value,
+                                max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return False
+    return bool(data.get("admin_logged_in"))
+
+
+def _last_event_id(scope):
+    for k, v in scope.get("headers", ()):
+        if k == b"last-event-id":
+            return v.decode("latin-1")
+    qs = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return (qs.get("lastEventId") or [None])[0]
+
+
+async def _stream(scope, channels, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+    events = hub.subscribe_async(channels, _last_event_id(scope))
+
+    async def pump():
+        async for chunk in events:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    async def until_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(until_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await events.aclose()
+
+
+async def _lifespan(receive, send):
+    while True:
+        msg = await receive()
+        if msg["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif msg["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    path = scope.get("path", "")
+    if scope["type"] == "http" and scope.get("method") == "GET":
+        cid = path[len("/sse/stream/"):] if path.startswith("/sse/stream/") else ""
+        if cid and "/" not in cid:
+            # presence may insert the client row on first sighting — keep it off the loop
+            await asyncio.get_running_loop().run_in_executor(None, touch_client, cid, True)
+            return await _stream(scope, user_channels(cid), receive, send)
+        if path == "/sse/content":
+            return await _stream(scope, CONTENT_CHANNEL, receive, send)
+        if path == "/sse/admin" and _admin_logged_in(scope):
+            return await _stream(scope, "admin", receive, send)
+    # everything else (incl. /sse/admin login page) → Flask
+    return await wsgi(scope, receive, send)
@@ -1,17 +1,31 @@
 # ================== src/main.py ==================
 # Flask + SSE (Server-Sent Events) realtime chat — no Socket.IO required
 from datetime import datetime, timezone
-import json, os, time, uuid, sqlite3, threading
-from queue import Queue, Empty
+import os, json, math, time, uuid, sqlite3
 from functools import wraps
-from flask import Flask, request, jsonify, send_from_directory, render_template, session, Response
+from flask import Flask, request, jsonify, send_from_directory, send_file, render_template, session, Response, stream_with_context
+from jinja2 import ChoiceLoader, FileSystemLoader
 from flask_cors import CORS
 from dotenv import load_dotenv
 # ---- extra routes (তোমার প্রজেক্টে আছে) ----
-from routes.contact import contact_bp
-from routes.ai import ai_bp
-# ---------- OpenAI (optional auto-reply when no agent online) ----------
-from openai import OpenAI
+from routes.contact import contact_bp, outbox, contact_limiter
+from routes.ai import ai_limiter
+from routes.cms import cms_bp, store as cms_store
+from services.db import pool
+from services.presence import PresenceTable
+from services.hub import Hub
+from services.jobs import KeyedExecutor
+from services import ai
+from services.answer_cache import AnswerCache
+from services.faq_index import FaqIndex
+from services.llm_gateway import gateway, GatewayError
+from services.context import ContextBuilder
+from services.ratelimit import RateLimiter, client_ip
+from services.page_render import RenderedPage
+from services.assets import AssetManifest
+from services.images import ImageManifest
+from services import images as image_variants
+from services import precompress
 
 
 load_dotenv()
@@ -19,7 +33,6 @@ load_dotenv()
 BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 TEMPL_DIR  = os.path.join(BASE_DIR, "templates")
-DB_PATH    = os.path.join(BASE_DIR, "dms_ai.db")
 
 ADMIN_USER = os.getenv("ADMIN_USER", "admin").strip()
 ADMIN_PASS = os.getenv("ADMIN_PASS", "admin123").strip()
@@ -39,106 +52,186 @@ CORS(app)
 now = lambda: time.time()
 
 # ---------- DB ----------
-def db():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
 def ensure_db():
-    con = db(); cur = con.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS messages(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        cid TEXT, role TEXT, content TEXT, ts REAL,
-        mid TEXT,
-        seen_by_agent INTEGER DEFAULT 0,
-        seen_by_client INTEGER DEFAULT 0
-    )""")
-    cur.execute("""CREATE TABLE IF NOT EXISTS clients(
-        cid TEXT PRIMARY KEY,
-        created REAL,
-        last_seen REAL,
-        online INTEGER DEFAULT 0
-    )""")
-    cur.execute("""CREATE TABLE IF NOT EXISTS agent_status(
-        id INTEGER PRIMARY KEY CHECK (id=1),
-        online INTEGER DEFAULT 0,
-        name TEXT,
-        last_seen REAL
-    )""")
-    cur.execute("INSERT OR IGNORE INTO agent_status(id,online,name,last_seen) VALUES(1,0,'Admin',0)")
-    # --- lightweight migration: add last_seen if missing
-    try:
-        cur.execute("SELECT last_seen FROM agent_status LIMIT 1")
-    except sqlite3.OperationalError:
-        cur.execute("ALTER TABLE agent_status ADD COLUMN last_seen REAL")
-        cur.execute("UPDATE agent_status SET last_seen = 0 WHERE id=1")
-    cur.execute("""CREATE TABLE IF NOT EXISTS contact_submissions(
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT, email TEXT, phone TEXT, topic TEXT, message TEXT, ts REAL
-    )""")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_cid_ts ON messages(cid,ts)")
-    con.commit(); con.close()
+    with pool.tx() as con:
+        con.execute("""CREATE TABLE IF NOT EXISTS messages(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cid TEXT, role TEXT, content TEXT, ts REAL,
+            mid TEXT,
+            seen_by_agent INTEGER DEFAULT 0,
+            seen_by_client INTEGER DEFAULT 0
+        )""")
+        con.execute("""CREATE TABLE IF NOT EXISTS clients(
+            cid TEXT PRIMARY KEY,
+            created REAL,
+            last_seen REAL,
+            online INTEGER DEFAULT 0
+        )""")
+        con.execute("""CREATE TABLE IF NOT EXISTS agent_status(
+            id INTEGER PRIMARY KEY CHECK (id=1),
+            online INTEGER DEFAULT 0,
+            name TEXT,
+            last_seen REAL
+        )""")
+        con.execute("INSERT OR IGNORE INTO agent_status(id,online,name,last_seen) VALUES(1,0,'Admin',0)")
+        # --- lightweight migration: add last_seen if missing
+        try:
+            con.execute("SELECT last_seen FROM agent_status LIMIT 1")
+        except sqlite3.OperationalError:
+            con.execute("ALTER TABLE agent_status ADD COLUMN last_seen REAL")
+            con.execute("UPDATE agent_status SET last_seen = 0 WHERE id=1")
+        # rolling per-conversation summary for AI context (services/context.py)
+        con.execute("""CREATE TABLE IF NOT EXISTS conversation_summaries(
+            cid TEXT PRIMARY KEY,
+            upto_id INTEGER DEFAULT 0,
+            summary TEXT,
+            updated REAL
+        )""")
+        con.execute("""CREATE TABLE IF NOT EXISTS contact_submissions(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT, email TEXT, phone TEXT, topic TEXT, message TEXT, ts REAL
+        )""")
+        # outbound mail, drained by the background sender in services/mailer.py
+        con.execute("""CREATE TABLE IF NOT EXISTS mail_outbox(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created REAL, to_addr TEXT, subject TEXT, body TEXT, reply_to TEXT,
+            ref TEXT,
+            status TEXT DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            next_try REAL,
+            last_error TEXT,
+            sent_at REAL
+        )""")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_mail_outbox_due ON mail_outbox(status,next_try)")
+        # token buckets shared by all workers (RATE_LIMIT_BACKEND=sqlite, services/ratelimit.py)
+        con.execute("""CREATE TABLE IF NOT EXISTS rate_buckets(
+            name TEXT, key TEXT, tokens REAL, ts REAL,
+            PRIMARY KEY(name, key)
+        ) WITHOUT ROWID""")
+        # sliding-window limiters (RateLimiter(sliding=True)): one row per hit still in the window
+        con.execute("CREATE TABLE IF NOT EXISTS rate_hits(name TEXT, key TEXT, ts REAL)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_rate_hits ON rate_hits(name,key,ts)")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_messages_cid_ts ON messages(cid,ts)")
+        # keyset pagination of /api/chat/history (cid=? AND id<>? ORDER BY id)
+        con.execute("CREATE INDEX IF NOT EXISTS idx_messages_cid_id ON messages(cid,id)")
+        # unread-by-agent user messages only (unseen_mids + startup reconcile of clients.unread)
+        con.execute("""CREATE INDEX IF NOT EXISTS idx_messages_unread ON messages(cid)
+                       WHERE role='user' AND COALESCE(seen_by_agent,0)=0""")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_clients_last_seen ON clients(last_seen,cid)")
+        # --- unread counter (maintained by add_msg / mark_seen) + change stamp for ?since=
+        try:
+            con.execute("SELECT unread, updated FROM clients LIMIT 1")
+        except sqlite3.OperationalError:
+            con.execute("ALTER TABLE clients ADD COLUMN unread INTEGER DEFAULT 0")
+            con.execute("ALTER TABLE clients ADD COLUMN updated REAL DEFAULT 0")
+        con.execute("CREATE INDEX IF NOT EXISTS idx_clients_updated ON clients(updated)")
+        # reconcile once at startup (cheap: one probe of idx_messages_unread per client)
+        con.execute("""UPDATE clients SET unread=(SELECT COUNT(1) FROM messages m
+                         WHERE m.cid=clients.cid AND m.role='user' AND COALESCE(m.seen_by_agent,0)=0)""")
 
 ensure_db()
+if outbox.configured():
+    outbox.wake()     # pick up mail left queued by a previous process
+presence = PresenceTable(pool)
 
 def add_msg(cid, role, content, mid=None):
+    """Store a message; returns (messages.id, mid)."""
     mid = mid or f"{'a' if role=='agent' else ('b' if role=='bot' else 'u')}_{uuid.uuid4().hex[:12]}"
-    con = db(); cur = con.cursor()
-    cur.execute("INSERT INTO messages(cid,role,content,ts,mid) VALUES(?,?,?,?,?)",
-                (cid, role, content, now(), mid))
-    con.commit(); con.close()
-    return mid
-
-def last_msgs(cid, limit=50):
-    con = db(); cur = con.cursor()
-    cur.execute("""SELECT role,content,ts,mid,seen_by_agent,seen_by_client
-                   FROM messages WHERE cid=? ORDER BY id DESC LIMIT ?""", (cid, limit))
-    rows = cur.fetchall(); con.close()
+    t = now()
+    with pool.tx() as con:
+        row_id = con.execute("INSERT INTO messages(cid,role,content,ts,mid) VALUES(?,?,?,?,?)",
+                             (cid, role, content, t, mid)).lastrowid
+        if role == "user":
+            con.execute("""INSERT INTO clients(cid,created,last_seen,online,unread,updated) VALUES(?,?,?,1,1,?)
+                           ON CONFLICT(cid) DO UPDATE SET unread=unread+1, updated=excluded.updated""",
+                        (cid, t, t, t))
+    return row_id, mid
+
+def unread_count(cid):
+    row = pool.query_one("SELECT unread FROM clients WHERE cid=?", (cid,))
+    return int(row[0] or 0) if row else 0
+
+def last_msgs(cid, limit=50, before_id=None, after_id=None):
+    """
+    Keyset pages over idx_messages_cid_id, always returned oldest → newest.
+      after_id  -> the `limit` messages right after that id (catch-up / deltas)
+      before_id -> the `limit` messages right before that id (scroll back)
+      neither   -> the newest `limit`
+    Returns (rows, has_more): one extra row is fetched to tell whether another
+    page exists in that direction, then trimmed.
+    """
+    cols = "id,role,content,ts,mid,seen_by_agent,seen_by_client"
+    if after_id is not None:
+        rows = pool.query(f"SELECT {cols} FROM messages WHERE cid=? AND id>? ORDER BY id ASC LIMIT ?",
+                          (cid, after_id, limit + 1))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = pool.query(f"SELECT {cols} FROM messages WHERE cid=? AND id<? ORDER BY id DESC LIMIT ?",
+                          (cid, before_id if before_id is not None else 2**63 - 1, limit + 1))
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        rows.reverse()
     out = []
-    for role, content, ts, mid, sba, sbc in reversed(rows):
+    for id_, role, content, ts, mid, sba, sbc in rows:
         out.append({
-            "role": role, "content": content, "ts": ts, "mid": mid,
+            "id": id_, "role": role, "content": content, "ts": ts, "mid": mid,
             "seen_by_agent": int(sba or 0), "seen_by_client": int(sbc or 0)
         })
-    return out
+    return out, has_more
+
+def history_version(cid):
+    """(latest message id, clients.updated) — changes whenever the history could."""
+    row = pool.query_one("""SELECT (SELECT MAX(id) FROM messages WHERE cid=?),
+                                   (SELECT updated FROM clients WHERE cid=?)""", (cid, cid))
+    return (row[0] or 0), (row[1] or 0)
 
 def unseen_mids(cid, whose):
     # whose: 'user' -> unseen by agent   |  'agent' -> unseen by client
     sql = ("SELECT mid FROM messages WHERE cid=? AND role='user' AND COALESCE(seen_by_agent,0)=0"
            if whose == 'user'
            else "SELECT mid FROM messages WHERE cid=? AND role IN('agent','bot') AND COALESCE(seen_by_client,0)=0")
-    con = db(); cur = con.cursor()
-    cur.execute(sql, (cid,))
-    out = [r[0] for r in cur.fetchall() if r[0]]
-    con.close()
-    return out
+    return [r[0] for r in pool.query(sql, (cid,)) if r[0]]
 
 def mark_seen(mids, by):
-    if not mids: return
+    """Set seen flags; returns {cid: unread} for clients whose unread counter changed."""
+    if not mids: return {}
     col = "seen_by_agent" if by == "agent" else "seen_by_client"
-    con = db(); cur = con.cursor()
     q = ",".join(["?"] * len(mids))
-    cur.execute(f"UPDATE messages SET {col}=1 WHERE mid IN ({q})", mids)
-    con.commit(); con.close()
+    changed = {}
+    with pool.tx() as con:
+        if by == "agent":
+            dec = con.execute(f"""SELECT cid, COUNT(1) FROM messages
+                                  WHERE mid IN ({q}) AND role='user' AND COALESCE(seen_by_agent,0)=0
+                                  GROUP BY cid""", mids).fetchall()
+        else:
+            # no unread counter to move, but clients.updated is part of the history ETag
+            dec = con.execute(f"""SELECT DISTINCT cid FROM messages
+                                  WHERE mid IN ({q}) AND role IN('agent','bot') AND COALESCE(seen_by_client,0)=0""",
+                              mids).fetchall()
+        con.execute(f"UPDATE messages SET {col}=1 WHERE mid IN ({q})", mids)
+        t = now()
+        if by == "agent":
+            for cid, n in dec:
+                con.execute("UPDATE clients SET unread=MAX(unread-?,0), updated=? WHERE cid=?", (n, t, cid))
+                row = con.execute("SELECT unread FROM clients WHERE cid=?", (cid,)).fetchone()
+                changed[cid] = int(row[0]) if row else 0
+        else:
+            con.executemany("UPDATE clients SET updated=? WHERE cid=?", [(t, cid) for cid, in dec])
+    return changed
 
 def touch_client(cid, online=True):
-    t = now()
-    con = db(); cur = con.cursor()
-    cur.execute("INSERT OR IGNORE INTO clients(cid,created,last_seen,online) VALUES(?,?,?,?)",
-                (cid, t, t, 1 if online else 0))
-    cur.execute("UPDATE clients SET last_seen=?, online=? WHERE cid=?",
-                (t, 1 if online else 0, cid))
-    con.commit(); con.close()
+    # heartbeats are absorbed in memory; presence flushes them in batches
+    presence.touch(cid, online)
 
 def set_agent_status(on: bool, name="Admin"):
     """online ফ্ল্যাগ আপডেট + last_seen = এখন (toggle মুহূর্ত)"""
     t = now()
-    con = db(); cur = con.cursor()
-    cur.execute("UPDATE agent_status SET online=?, name=?, last_seen=? WHERE id=1", (1 if on else 0, name, t))
-    con.commit(); con.close()
+    with pool.tx() as con:
+        con.execute("UPDATE agent_status SET online=?, name=?, last_seen=? WHERE id=1", (1 if on else 0, name, t))
 
 def get_agent_presence():
-    con = db(); cur = con.cursor()
-    cur.execute("SELECT online, last_seen FROM agent_status WHERE id=1")
-    row = cur.fetchone(); con.close()
+    row = pool.query_one("SELECT online, last_seen FROM agent_status WHERE id=1")
     if not row:
         return False, 0.0
     return bool(row[0]), float(row[1] or 0)
@@ -147,53 +240,49 @@ def agent_online():
     on, _ = get_agent_presence()
     return on
 
-# ---------- Tiny in-process Pub/Sub for SSE ----------
-class Hub:
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.channels = {}  # name -> set(Queue)
-
-    def subscribe(self, name: str):
-        q = Queue()
-        with self.lock:
-            self.channels.setdefault(name, set()).add(q)
-
-        def stream():
-            try:
-                yield "retry: 10000\n\n"  # auto-retry 10s
-                while True:
-                    try:
-                        item = q.get(timeout=15)  # keep-alive every ~15s
-                        ev   = item.get("event", "message")
-                        data = json.dumps(item.get("data", {}), ensure_ascii=False)
-                        yield f"event: {ev}\n" f"data: {data}\n\n"
-                    except Empty:
-                        # heartbeat comment
-                        yield ": ping\n\n"
-            finally:
-                with self.lock:
-                    self.channels.get(name, set()).discard(q)
-        return stream()
-
-    def publish(self, name: str, event: str, data: dict):
-        with self.lock:
-            subs = list(self.channels.get(name, set()))
-        msg = {"event": event, "data": data}
-        for q in subs:
-            try:
-                q.put_nowait(msg)
-            except:
-                pass
-
+# ---------- Pub/Sub for SSE (services/hub.py) ----------
 hub = Hub()
 
+def client_changed(cid, unread=None):
+    """Sidebar patch for admin tabs — carries the row, so no /api/clients re-fetch is needed."""
+    last_seen, online = presence.get(cid)
+    hub.publish("admin", "clients_list_changed", {
+        "cid": cid, "unread": unread_count(cid) if unread is None else unread,
+        "last_seen": last_seen, "online": online, "ts": now()})
+
+USERS_CHANNEL   = "users"     # every open visitor stream also listens here
+CONTENT_CHANNEL = "content"   # public: CMS section changes (also on /sse/content)
+
+def user_channels(cid):
+    return (f"user:{cid}", USERS_CHANNEL, CONTENT_CHANNEL)
+
 def broadcast_users(event, data):
-    con = db(); cur = con.cursor()
-    cur.execute("SELECT cid FROM clients")
-    cids = [r[0] for r in cur.fetchall()]
-    con.close()
-    for c in cids:
-        hub.publish(f"user:{c}", event, data)
+    # O(live subscribers): one publish, no scan of every cid ever seen
+    hub.publish(USERS_CHANNEL, event, data)
+
+@cms_store.on_change
+def content_changed(sections, snap):
+    """CMS save → open pages refetch just /api/content/<section> (its ETag = version)."""
+    for name in sections:
+        s = snap.sections.get(name)
+        hub.publish(CONTENT_CHANNEL, "content_changed", {
+            "section": name, "version": s.etag if s else None, "removed": s is None,
+            "revision": snap.revision, "ts": now()})
+
+# ---------- Rate limits (services/ratelimit.py; per client IP) ----------
+message_limiter = RateLimiter("client_message", int(os.getenv("RL_MESSAGE_PER_MIN", "20")), 60,
+                              burst=10, pool=pool)
+typing_limiter  = RateLimiter("typing", int(os.getenv("RL_TYPING_PER_MIN", "120")), 60,
+                              burst=20, pool=pool)
+
+def rate_limited(limiter):
+    """429 response if the caller is over the limit, else None. Logged-in agents are not limited."""
+    if session.get("admin_logged_in"):
+        return None
+    ok, retry = limiter.hit(client_ip(request.environ))
+    if ok:
+        return None
+    return jsonify({"ok": False, "error": "rate_limited"}), 429, {"Retry-After": str(math.ceil(retry))}
 
 # ---------- Auth ----------
 def login_required(fn):
@@ -230,11 +319,23 @@ def admin_logout():
     return jsonify({"ok":True})
 
 # ---------- SSE streams ----------
+def last_event_id():
+    # browsers resend the last id on reconnect; ?lastEventId= for manual reconnects
+    return request.headers.get("Last-Event-ID") or request.args.get("lastEventId")
+
 @app.get("/sse/stream/<cid>")
 def sse_user(cid):
     touch_client(cid, True)
     return Response(
-        hub.subscribe(f"user:{cid}"),
+        hub.subscribe(user_channels(cid), last_event_id()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control":"no-cache","X-Accel-Buffering":"no"}
+    )
+
+@app.get("/sse/content")
+def sse_content():
+    return Response(
+        hub.subscribe(CONTENT_CHANNEL, last_event_id()),
         mimetype="text/event-stream",
         headers={"Cache-Control":"no-cache","X-Accel-Buffering":"no"}
     )
@@ -243,7 +344,7 @@ def sse_user(cid):
 @login_required
 def sse_admin():
     return Response(
-        hub.subscribe("admin"),
+        hub.subscribe("admin", last_event_id()),
         mimetype="text/event-stream",
         headers={"Cache-Control":"no-cache","X-Accel-Buffering":"no"}
     )
@@ -274,11 +375,7 @@ def api_heartbeat():
 @app.get("/api/client/presence/<cid>")
 def api_presence(cid):
     """Chatbot UI last-seen/online ব্যাজের জন্য—raw timestamp ফেরত দেয়"""
-    con = db(); cur = con.cursor()
-    cur.execute("SELECT last_seen, online FROM clients WHERE cid=?", (cid,))
-    row = cur.fetchone(); con.close()
-    last_seen = float(row[0]) if row else 0.0
-    online    = bool(row[1]) if row else False
+    last_seen, online = presence.get(cid)
     return jsonify({
         "cid": cid,
         "online": online,
@@ -296,6 +393,9 @@ def api_typing():
       - who == 'agent' -> push to user stream (chatbot dots দেখাবে)
       - who == 'client' -> push to admin stream (dashboard dots দেখাবে)
     """
+    limited = rate_limited(typing_limiter)
+    if limited:
+        return limited
     data = request.get_json() or {}
     cid   = (data.get("cid") or "").strip()
     who   = (data.get("who") or "client").strip()
@@ -305,10 +405,10 @@ def api_typing():
 
     if who == "agent":
         # 🔔 admin typing → user chatbot
-        hub.publish(f"user:{cid}", "typing", {"who":"agent", "state": state, "ts": now()})
+        hub.publish(f"user:{cid}", "typing", {"who":"agent", "state": state, "ts": now()}, replay=False)
     else:
         # 🔔 client typing → admin dashboard
-        hub.publish("admin", "typing", {"cid": cid, "who": "user", "state": state, "ts": now()})
+        hub.publish("admin", "typing", {"cid": cid, "who": "user", "state": state, "ts": now()}, replay=False)
     return jsonify({"ok": True})
 
 @app.post("/api/seen")
@@ -328,7 +428,9 @@ def api_seen():
     if not mids:
         mids = unseen_mids(cid, "user" if who == "agent" else "agent")
 
-    mark_seen(mids, by=who)
+    changed = mark_seen(mids, by=who)
+    for c, unread in changed.items():
+        client_changed(c, unread)
     if who == "agent":
         hub.publish(f"user:{cid}", "seen", {"who":"agent", "mids": mids, "ts": now()})
     else:
@@ -344,6 +446,9 @@ def api_client_message():
     - Push to admin SSE
     - If admin offline: auto AI reply (push to user SSE + save DB)
     """
+    limited = rate_limited(message_limiter)
+    if limited:
+        return limited
     data = request.get_json() or {}
     cid  = (data.get("cid") or "").strip()
     text = (data.get("text") or "").strip()
@@ -352,27 +457,21 @@ def api_client_message():
         return jsonify({"ok":False,"error":"missing_fields"}), 400
 
     touch_client(cid, True)
-    mid = add_msg(cid, "user", text)
+    msg_id, mid = add_msg(cid, "user", text)
 
     # Admin dashboards realtime
     hub.publish("admin", "message", {
         "cid":cid,"role":"user","text":text,"mid":mid,"tempId":temp,"ts":now()
     })
-    # Sidebar unread refresh
-    hub.publish("admin", "clients_list_changed", {"cid":cid})
-
-    # If no live agent -> AI auto reply
-    if not agent_online() and OPENAI_KEY:
-        reply = ask_openai_sync(text)
-        bot_mid = add_msg(cid, "bot", reply)
-        # Push to user's SSE stream
-        hub.publish(f"user:{cid}", "message", {
-            "role":"bot","text":reply,"mid":bot_mid,"ts":now()
-        })
-        # Also notify admin tabs (history sync)
-        hub.publish("admin", "message", {
-            "cid":cid,"role":"bot","text":reply,"mid":bot_mid,"ts":now()
-        })
+    # Sidebar unread refresh (new count travels with the event)
+    client_changed(cid)
+
+    # If no live agent -> AI auto reply in the background (arrives over SSE)
+    if not agent_online() and ai.enabled():
+        hub.publish(f"user:{cid}", "typing", {"who":"bot", "state": True, "ts": now()}, replay=False)
+        if not ai_jobs.submit(cid, auto_reply, cid, text, msg_id):
+            # queue full: don't make the visitor wait, hand off to a human
+            send_bot_reply(cid, "Thanks! An agent will reply shortly.")
 
     return jsonify({"ok":True,"mid":mid})
 
@@ -391,65 +490,113 @@ def api_agent_message():
     if not cid or not text:
         return jsonify({"ok":False,"error":"missing_fields"}), 400
 
-    mid = add_msg(cid, "agent", text)
+    _, mid = add_msg(cid, "agent", text)
 
     # push to user
     hub.publish(f"user:{cid}", "message", {"role":"agent","text":text,"mid":mid,"ts":now()})
     # push to admin tabs
     hub.publish("admin", "message", {"cid":cid,"role":"agent","text":text,"mid":mid,"ts":now()})
-    hub.publish("admin", "clients_list_changed", {"cid":cid})
+    client_changed(cid)
 
     return jsonify({"ok":True,"mid":mid})
 
+HISTORY_MAX_LIMIT = 200
+
 @app.get("/api/chat/history/<cid>")
 def api_history(cid):
-    return jsonify(last_msgs(cid))
+    """
+    ?limit=N (default 50) &before_id=ID | &after_id=ID  — keyset pages, oldest → newest.
+    Conditional: ETag is keyed on the latest message id, so an unchanged window is a 304.
+    X-Has-More: 1 when another page exists in the requested direction. A 304 doesn't
+    repeat it: the ETag pins the window, so the value cached with the 200 still holds
+    (browsers keep the cached headers on a 304).
+    """
+    limit     = max(1, min(request.args.get("limit", 50, type=int), HISTORY_MAX_LIMIT))
+    before_id = request.args.get("before_id", type=int)
+    after_id  = request.args.get("after_id", type=int)
+
+    latest, updated = history_version(cid)
+    etag = f"{latest}.{updated!r}.{limit}.{before_id}.{after_id}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        rows, has_more = last_msgs(cid, limit, before_id, after_id)
+        resp = jsonify(rows)
+        resp.headers["X-Has-More"] = "1" if has_more else "0"
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"   # always revalidate, 304 when unchanged
+    return resp
+
+CLIENTS_MAX_LIMIT = 500
+
+def list_clients(since=None, before=None, limit=None):
+    """
+    One statement; unread is the counter kept by add_msg / mark_seen (O(1) per row).
+      since  -> rows changed after this ts: last_seen moved (incl. not-yet-flushed
+                presence) or unread changed
+      before -> keyset cursor "<last_seen>|<cid>" from the previous page
+    """
+    where, args = [], []
+    if since is not None:
+        where.append("(c.last_seen > ? OR c.updated > ? OR c.cid IN (SELECT value FROM json_each(?)))")
+        args += [since, since, json.dumps(presence.changed_since(since))]
+    if before:
+        b_ts, _, b_cid = before.partition("|")
+        where.append("(c.last_seen, c.cid) < (?, ?)")
+        args += [float(b_ts), b_cid]
+    sql = f"""SELECT c.cid, c.last_seen, c.online, c.unread
+              FROM clients c
+              {"WHERE " + " AND ".join(where) if where else ""}
+              ORDER BY c.last_seen DESC, c.cid DESC"""
+    if limit:
+        sql += " LIMIT ?"; args.append(limit)
+    rows = pool.query(sql, args)
+    out = []
+    for cid, last_seen, online, unread in rows:
+        ls, on = presence.overlay(cid, last_seen, online)
+        out.append({"cid":cid, "last_seen":ls, "online":on, "unread":int(unread or 0)})
+    # cursor follows DB order so pages never skip or repeat rows
+    nxt = f"{rows[-1][1]!r}|{rows[-1][0]}" if limit and len(rows) == limit else None
+    out.sort(key=lambda c: c["last_seen"], reverse=True)
+    return out, nxt
 
 @app.get("/api/clients")
 def api_clients():
-    con = db(); cur = con.cursor()
-    cur.execute("SELECT cid,last_seen,online FROM clients ORDER BY last_seen DESC")
-    rows = cur.fetchall()
-    out=[]
-    for cid,last_seen,online in rows:
-        cur.execute("""SELECT COUNT(1) FROM messages
-                       WHERE cid=? AND role='user' AND COALESCE(seen_by_agent,0)=0""",(cid,))
-        unread = cur.fetchone()[0] or 0
-        out.append({
-            "cid":cid,
-            "last_seen":float(last_seen or 0),
-            "online":bool(online),
-            "unread":int(unread)
-        })
-    con.close()
-    return jsonify({"clients":out})
+    """
+    ?limit=N&before=<cursor>  page through (newest first)
+    ?since=<ts>               only clients changed after ts (use the previous response's `ts`)
+    """
+    try:
+        since  = float(request.args["since"]) if request.args.get("since") else None
+        limit  = request.args.get("limit", type=int)
+        limit  = max(1, min(limit, CLIENTS_MAX_LIMIT)) if limit else None
+        before = request.args.get("before") or None
+        ts = now()
+        out, nxt = list_clients(since, before, limit)
+    except ValueError:
+        return jsonify({"ok":False,"error":"bad_cursor"}), 400
+    return jsonify({"clients":out, "next":nxt, "ts":ts})
 
 @app.delete("/api/clients/<cid>")
 @login_required
 def api_delete_client(cid):
-    con = db(); cur = con.cursor()
-    cur.execute("DELETE FROM messages WHERE cid=?", (cid,))
-    cur.execute("DELETE FROM clients WHERE cid=?", (cid,))
-    con.commit(); con.close()
-    hub.publish("admin","clients_list_changed",{"cid":cid})
+    with pool.tx() as con:
+        con.execute("DELETE FROM messages WHERE cid=?", (cid,))
+        con.execute("DELETE FROM clients WHERE cid=?", (cid,))
+        con.execute("DELETE FROM conversation_summaries WHERE cid=?", (cid,))
+    presence.forget(cid)
+    context.forget(cid)
+    hub.publish("admin","clients_list_changed",{"cid":cid,"deleted":True})
     hub.publish(f"user:{cid}","deleted",{"cid":cid})
     return jsonify({"ok":True})
 
 # ---------- FAQ / AI ----------
-from openai import OpenAI
+# OpenAI (optional auto-reply when no agent online): services/ai.py builds the
+# one shared client lazily, on the first AI request — nothing heavy at boot.
 import logging, traceback, os
 from flask import request, jsonify, render_template
 
-# Load the key safely
-OPENAI_KEY = os.getenv("OPENAI_API_KEY", "").strip()
-client = None
-if OPENAI_KEY:
-    try:
-        client = OpenAI(api_key=OPENAI_KEY)
-        logging.info("✅ OpenAI client initialized successfully")
-    except Exception as e:
-        logging.error(f"❌ OpenAI client init failed: {e}")
-else:
+if not ai.enabled():
     logging.warning("⚠️ OPENAI_API_KEY not found — AI in offline mode")
 
 # -------------------- Prompt Setup --------------------
@@ -460,27 +607,127 @@ SYSTEM_PROMPT = (
     "Use bullet points when helpful; keep paragraphs short. Do not invent any private data."
 )
 
+AI_OFFLINE_TEXT = "Thanks! An agent will reply shortly. (AI offline in dev mode.)"
+AI_EMPTY_TEXT   = "Thanks for your message. Please try again shortly."
+AI_BUSY_TEXT    = "Sorry—our AI is busy right now. Please try again in a moment."
+
+def _ai_messages(question, cid=None, msg_id=None):
+    """Standalone prompt, or with the conversation's recent turns + summary for a chat cid
+    (msg_id: the stored row of the question, so it isn't also sent as a turn)."""
+    if cid:
+        return context.build(cid, (question or '').strip(), SYSTEM_PROMPT, before_id=msg_id)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": (question or '').strip()},
+    ]
+
+# repeated / near-duplicate questions answer from memory (services/answer_cache.py)
+answer_cache = AnswerCache()
+# chat replies see recent turns + a rolling summary, packed under a token budget
+context = ContextBuilder(pool)
+# prebuilt FAQ answers, mmapped (scripts/build_faq_index.py → services/faq_index.py)
+faq_index = FaqIndex()
+
 # -------------------- Main Function --------------------
-def ask_openai_sync(question: str) -> str:
-    """Ask OpenAI model safely with error handling"""
-    if not client:
-        return "Thanks! An agent will reply shortly. (AI offline in dev mode.)"
+def ask_openai_sync(question: str, cid=None, msg_id=None) -> str:
+    """Ask OpenAI model safely with error handling (cid → with conversation context)"""
+    if not ai.enabled():
+        return AI_OFFLINE_TEXT
+    msgs = _ai_messages(question, cid, msg_id)
+    standalone = len(msgs) == 2        # no earlier turns → the cached answer fits
+    hit = answer_cache.get(question) if standalone else None
+    if hit is not None:
+        return hit
 
     try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.4,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": (question or '').strip()},
-            ],
-        )
-        answer = (resp.choices[0].message.content or "").strip()
-        return answer or "Thanks for your message. Please try again shortly."
+        answer = ai.complete(msgs, temperature=0.4).strip()
+        if not answer:
+            return AI_EMPTY_TEXT
+        if standalone:
+            answer_cache.put(question, answer)
+        return answer
+    except GatewayError as e:
+        # saturated / circuit open → degraded reply right away
+        logging.warning(f"⚠️ LLM gateway: {e}")
+        return AI_BUSY_TEXT
     except Exception as e:
         logging.error(f"❌ OpenAI API error: {e}")
         logging.error(traceback.format_exc())
-        return "Sorry—our AI is busy right now. Please try again in a moment."
+        return AI_BUSY_TEXT
+
+def stream_openai(question: str, cid=None, msg_id=None):
+    """Yield the answer piece by piece as the model generates it (same fallbacks as ask_openai_sync)."""
+    if not ai.enabled():
+        yield AI_OFFLINE_TEXT
+        return
+    msgs = _ai_messages(question, cid, msg_id)
+    standalone = len(msgs) == 2
+    hit = answer_cache.get(question) if standalone else None
+    if hit is not None:
+        yield hit
+        return
+    parts = []
+    try:
+        for piece in ai.stream(msgs, temperature=0.4):
+            parts.append(piece)
+            yield piece
+    except GatewayError as e:
+        logging.warning(f"⚠️ LLM gateway: {e}")
+        if not parts:
+            yield AI_BUSY_TEXT
+        return
+    except Exception as e:
+        logging.error(f"❌ OpenAI stream error: {e}")
+        logging.error(traceback.format_exc())
+        if not parts:
+            yield AI_BUSY_TEXT
+        return
+    answer = "".join(parts).strip()
+    if not answer:
+        yield AI_EMPTY_TEXT
+        return
+    if standalone:
+        answer_cache.put(question, answer)
+
+# -------------------- Auto reply (background) --------------------
+# LLM round-trips take seconds; the POST returns at once and the reply
+# arrives over SSE. Per-cid ordering keeps a visitor's replies in order.
+# While the model generates, partial text goes out as `message_delta`
+# (not replayed, never stored); only the final `message` hits the DB.
+ai_jobs = KeyedExecutor(name="ai-reply")
+AI_STREAM       = os.getenv("AI_STREAM", "1") != "0"
+DELTA_FLUSH_SEC = float(os.getenv("AI_DELTA_FLUSH_MS", "50")) / 1000   # coalesce tokens into ≤20 events/s
+
+def send_bot_reply(cid, reply, mid=None):
+    _, bot_mid = add_msg(cid, "bot", reply, mid)
+    # Push to user's SSE stream
+    hub.publish(f"user:{cid}", "message", {
+        "role":"bot","text":reply,"mid":bot_mid,"ts":now()
+    })
+    # Also notify admin tabs (history sync)
+    hub.publish("admin", "message", {
+        "cid":cid,"role":"bot","text":reply,"mid":bot_mid,"ts":now()
+    })
+
+def auto_reply(cid, text, msg_id=None):
+    try:
+        if not AI_STREAM:
+            send_bot_reply(cid, ask_openai_sync(text, cid, msg_id))
+            return
+        bot_mid = f"b_{uuid.uuid4().hex[:12]}"
+        parts, buf, flushed = [], [], 0.0
+        for piece in stream_openai(text, cid, msg_id):
+            parts.append(piece); buf.append(piece)
+            t = time.monotonic()
+            if t - flushed >= DELTA_FLUSH_SEC:     # first token goes out immediately
+                hub.publish(f"user:{cid}", "message_delta", {
+                    "mid":bot_mid,"delta":"".join(buf),"ts":now()
+                }, replay=False)
+                buf.clear(); flushed = t
+        # the final message carries the full text, so a tail left in buf is not lost
+        send_bot_reply(cid, "".join(parts).strip() or AI_EMPTY_TEXT, bot_mid)
+    finally:
+        hub.publish(f"user:{cid}", "typing", {"who":"bot", "state": False, "ts": now()}, replay=False)
 
 # -------------------- Flask Routes --------------------
 @app.get("/faq")
@@ -490,14 +737,34 @@ def faq_page():
 
 @app.post("/api/ai")
 def api_ai():
-    """Handle frontend chatbot request"""
+    """Handle frontend chatbot request
+
+    {question, stream:true} -> chunked application/x-ndjson:
+        {"delta": "..."} per piece, then {"done": true, "sources": [...]}
+    Questions matching the prebuilt FAQ index are answered from it (no LLM call).
+    """
+    limited = rate_limited(ai_limiter)
+    if limited:
+        return limited
     try:
-        q = (request.json or {}).get("question", "").strip()
+        body = request.json or {}
+        q = body.get("question", "").strip()
         if not q:
             return jsonify({"ok": False, "error": "empty"}), 200
 
-        ai_response = ask_openai_sync(q)
-        return jsonify({"ok": True, "text": ai_response, "sources": []}), 200
+        hit = faq_index.match(q)
+        sources = hit[1].get("sources", []) if hit else []
+
+        if body.get("stream"):
+            def gen():
+                for piece in ([hit[1]["a"]] if hit else stream_openai(q)):
+                    yield json.dumps({"delta": piece}, ensure_ascii=False) + "\n"
+                yield json.dumps({"done": True, "sources": sources}, ensure_ascii=False) + "\n"
+            return Response(stream_with_context(gen()), mimetype="application/x-ndjson",
+                            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+        ai_response = hit[1]["a"] if hit else ask_openai_sync(q)
+        return jsonify({"ok": True, "text": ai_response, "sources": sources}), 200
     except Exception as e:
         logging.error(f"API error: {e}")
         return jsonify({"ok": False, "error": "server"}), 500
@@ -509,6 +776,7 @@ def contact_page():
     return send_from_directory(STATIC_DIR, "contact.html")
 
 app.register_blueprint(contact_bp)
+app.register_blueprint(cms_bp, url_prefix="/api")
 
 # ---------- Pages ----------
 @app.get("/admin")
@@ -516,19 +784,128 @@ def admin_page():
     return render_template("dms-admin.html",
         logged_in=bool(session.get("admin_logged_in")))
 
+# Hashed + precompressed assets from scripts/build_assets.py (services/assets.py).
+# Without a build everything below falls back to the plain files in static/.
+assets = AssetManifest(os.path.join(STATIC_DIR, "_build"))
+if assets.page_path("templates/dms-admin.html"):
+    app.jinja_loader = ChoiceLoader([FileSystemLoader(os.path.join(assets.out_dir, "templates")), app.jinja_loader])
+
+# Resized AVIF/WebP/JPEG derivatives from scripts/build_images.py (services/images.py)
+images = ImageManifest(os.path.join(STATIC_DIR, "_img"))
+
+# every servable file under static/, listed once at boot — serve() does a set lookup, not a stat
+STATIC_FILES = {
+    os.path.relpath(os.path.join(root, n), STATIC_DIR).replace(os.sep, "/")
+    for root, dirs, names in os.walk(STATIC_DIR)
+    for n in names if not root.startswith((assets.out_dir, images.out_dir))
+}
+
+def send_built(entry, cache_control):
+    """Precompressed variant the client accepts, strong ETag per encoding."""
+    enc = precompress.negotiate(request.headers.get("Accept-Encoding"), entry["enc"])
+    etag = f'{entry["etag"]}-{enc}'
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    elif enc in entry["body"]:
+        resp = Response(entry["body"][enc], mimetype=entry["mime"])
+    else:
+        resp = send_file(entry["file"] + precompress.SUFFIX.get(enc, ""), mimetype=entry["mime"],
+                         etag=False, conditional=True)
+    if enc != "identity" and resp.status_code != 304:
+        resp.headers["Content-Encoding"] = enc
+    if entry["enc"]:
+        resp.headers["Vary"] = "Accept-Encoding"
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
+
+@app.get("/assets/<path:path>")
+def built_asset(path):
+    entry, cache_control = assets.lookup(path)
+    if entry is None:
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    return send_built(entry, cache_control)
+
+def width_hint():
+    """Requested CSS-pixel × DPR width: ?w= (srcset URLs) or a Sec-CH-Width / Width client hint."""
+    for value in (request.args.get("w"), request.headers.get("Sec-CH-Width"), request.headers.get("Width")):
+        try:
+            if value and int(value) > 0:
+                return int(value)
+        except ValueError:
+            pass
+    return None
+
+@app.get("/img/<path:path>")
+def responsive_image(path):
+    hit = images.pick(path, request.headers.get("Accept"), width_hint())
+    if hit is None:
+        # no derivatives for it (yet) — the original, if there is one
+        if f"images/{path}" in STATIC_FILES:
+            return send_from_directory(os.path.join(STATIC_DIR, "images"), path, max_age=300)
+        return jsonify({"ok": False, "error": "not_found"}), 404
+    file, mime, etag, version = hit
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = send_file(file, mimetype=mime, etag=False, conditional=True)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = (image_variants.IMMUTABLE if request.args.get("v") == version
+                                     else image_variants.SHORT)
+    resp.headers["Vary"] = "Accept" if request.args.get("w") else "Accept, Sec-CH-Width, Width"
+    return resp
+
+# Landing page = static/index.html with the CMS content baked in (services/page_render.py)
+landing = RenderedPage(assets.page_path("pages/index.html") or os.path.join(STATIC_DIR, "index.html"),
+                       os.path.join(BASE_DIR, "data", "rendered", "index.html"), cms_store)
+
+@cms_store.on_change
+def rerender_landing(sections, snap):
+    landing.build(snap)
+
+def landing_page():
+    body, enc, etag = landing.pick(request.headers.get("Accept-Encoding"))
+    if request.if_none_match.contains(etag):
+        landing.not_modified += 1
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype="text/html")
+        if enc != "identity":
+            resp.headers["Content-Encoding"] = enc
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = landing.cache_control
+    resp.headers["Vary"] = "Accept-Encoding"
+    return resp
+
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
 def serve(path):
-    target = os.path.join(STATIC_DIR, path)
-    if path and os.path.exists(target):
+    if path == "index.html":
+        return landing_page()
+    page = assets.page(f"pages/{path}")
+    if page is not None:
+        return send_built(page, "public, max-age=300")
+    if path in STATIC_FILES:
         return send_from_directory(STATIC_DIR, path)
-    # default portfolio landing (static/index.html)
-    return send_from_directory(STATIC_DIR, "index.html")
+    # default portfolio landing (pre-rendered static/index.html)
+    return landing_page()
+@app.get("/api/db/stats")
+@login_required
+def api_db_stats():
+    """Connection reuse + write-lock wait for this worker's pool"""
+    return jsonify({**pool.stats(), "presence": presence.stats(), "hub": hub.stats(), "ai_jobs": ai_jobs.stats(),
+                    "answer_cache": answer_cache.stats(), "faq_index": faq_index.stats(),
+                    "ai": ai.stats(), "llm": gateway.stats(), "context": context.stats(),
+                    "mail": outbox.stats(), "cms": cms_store.stats(),
+                    "landing": landing.stats(), "assets": assets.stats(), "images": images.stats(),
+                    "rate_limits": {l.name: l.stats() for l in (contact_limiter, ai_limiter,
+                                                                message_limiter, typing_limiter)}})
+
 @app.get("/api/health")
 def health():
     return {"ok": True, "ai_key_loaded": bool(OPENAI_KEY)}, 200
 # ---------- Run ----------
 if __name__ == "__main__":
     # Dev server supports streaming fine.
-    # Production: gunicorn -k gevent -w 1 app:app  (বা gthread)
+    # Production: gunicorn -k uvicorn.workers.UvicornWorker src.asgi:app  (see asgi.py)
     app.run(host="127.0.0.1", port=5000, debug=True, threaded=True)
\ No newline at end of file
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, render_template_string
+from flask import Blueprint, request, jsonify, render_template_string, Response, session, current_app
 import json
 import os
+from functools import wraps
+from services.content_store import ContentStore, PatchError, VersionConflict
 
 cms_bp = Blueprint('cms', __name__)
 
@@ -106,42 +108,44 @@ DEFAULT_CONTENT = {
     }
 }
 
-def ensure_content_file():
-    """Ensure content file exists with default content"""
-    os.makedirs(os.path.dirname(CONTENT_FILE), exist_ok=True)
-    if not os.path.exists(CONTENT_FILE):
-        with open(CONTENT_FILE, 'w') as f:
-            json.dump(DEFAULT_CONTENT, f, indent=2)
+# Parsed once and kept in memory with pre-serialized bodies + per-section ETags
+store = ContentStore(CONTENT_FILE, DEFAULT_CONTENT)
 
 def load_content():
-    """Load content from file"""
-    ensure_content_file()
-    try:
-        with open(CONTENT_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return DEFAULT_CONTENT
+    """Load content (in-memory copy; the file is only re-read when it changes)"""
+    return store.load()
 
 def save_content(content):
-    """Save content to file"""
-    ensure_content_file()
-    try:
-        with open(CONTENT_FILE, 'w') as f:
-            json.dump(content, f, indent=2)
-        return True
-    except:
-        return False
+    """Save content to file and refresh the in-memory copy"""
+    return store.save(content)
+
+def admin_required(fn):
+    """Writes and the panel need the dashboard login (session set by /admin/login)"""
+    @wraps(fn)
+    def wrap(*a, **k):
+        if not session.get('admin_logged_in'):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+        return fn(*a, **k)
+    return wrap
+
+def _cached_json(body, etag):
+    """Pre-serialized JSON body, or 304 when the client already has this ETag"""
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+    else:
+        resp = Response(body, mimetype='application/json')
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
 @cms_bp.route('/content', methods=['GET'])
 def get_content():
     """Get all content"""
-    content = load_content()
-    return jsonify({
-        'success': True,
-        'content': content
-    }), 200
+    snap = store.snapshot()
+    return _cached_json(snap.body, snap.etag)
 
 @cms_bp.route('/content', methods=['PUT'])
+@admin_required
 def update_content():
     """Update content"""
     try:
@@ -151,29 +155,22 @@ def update_content():
                 'success': False,
                 'error': 'No data provided'
             }), 400
-        
-        # Validate required structure
-        current_content = load_content()
-        
-        # Update only provided fields
-        for section, section_data in data.items():
-            if section in current_content:
-                if isinstance(section_data, dict):
-                    current_content[section].update(section_data)
-                else:
-                    current_content[section] = section_data
-        
-        if save_content(current_content):
-            return jsonify({
-                'success': True,
-                'message': 'Content updated successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to save content'
-            }), 500
-            
+
+        # Update only provided fields (merged under the writer lock)
+        snap = store.merge(data)
+        resp = jsonify({
+            'success': True,
+            'message': 'Content updated successfully'
+        })
+        resp.set_etag(snap.etag)
+        return resp, 200
+
+    except OSError:
+        current_app.logger.exception("[CMS] save failed")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to save content'
+        }), 500
     except Exception as e:
         return jsonify({
             'success': False,
@@ -183,21 +180,40 @@ def update_content():
 @cms_bp.route('/content/<section>', methods=['GET'])
 def get_content_section(section):
     """Get specific content section"""
-    content = load_content()
-    if section in content:
-        return jsonify({
-            'success': True,
-            'content': content[section]
-        }), 200
+    hit = store.section(section)
+    if hit:
+        return _cached_json(*hit)
     else:
         return jsonify({
             'success': False,
             'error': 'Section not found'
         }), 404
 
+def _expected_version():
+    """If-Match: <etag of the section the edit was based on> (optional)"""
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    return next(iter(request.if_match.as_set()), None)
+
+def _saved(section, snap):
+    resp = jsonify({
+        'success': True,
+        'message': f'{section} updated successfully',
+        'version': snap.sections[section].etag
+    })
+    resp.set_etag(snap.sections[section].etag)
+    return resp, 200
+
+def _conflict(section):
+    return jsonify({
+        'success': False,
+        'error': f'{section} was changed by someone else — reload and try again'
+    }), 412
+
 @cms_bp.route('/content/<section>', methods=['PUT'])
+@admin_required
 def update_content_section(section):
-    """Update specific content section"""
+    """Update specific content section (If-Match: version → 412 if it moved on)"""
     try:
         data = request.get_json()
         if not data:
@@ -205,28 +221,54 @@ def update_content_section(section):
                 'success': False,
                 'error': 'No data provided'
             }), 400
-        
-        content = load_content()
-        content[section] = data
-        
-        if save_content(content):
-            return jsonify({
-                'success': True,
-                'message': f'{section} updated successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to save content'
-            }), 500
-            
+
+        snap = store.update({section: data}, expect={section: _expected_version()})
+        return _saved(section, snap)
+
+    except VersionConflict:
+        return _conflict(section)
+    except OSError:
+        current_app.logger.exception("[CMS] save failed")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to save content'
+        }), 500
     except Exception as e:
         return jsonify({
             'success': False,
             'error': f'Error updating {section}: {str(e)}'
         }), 500
 
+@cms_bp.route('/content/<section>', methods=['PATCH'])
+@admin_required
+def patch_content_section(section):
+    """JSON-Patch (RFC 6902) a section: [{"op":"replace","path":"/title","value":"..."}]"""
+    try:
+        ops = request.get_json(force=True, silent=True)
+        snap = store.patch_section(section, ops, expect=_expected_version())
+        return _saved(section, snap)
+
+    except KeyError:
+        return jsonify({
+            'success': False,
+            'error': 'Section not found'
+        }), 404
+    except PatchError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid patch: {e}'
+        }), 400
+    except VersionConflict:
+        return _conflict(section)
+    except OSError:
+        current_app.logger.exception("[CMS] save failed")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to save content'
+        }), 500
+
 @cms_bp.route('/admin', methods=['GET'])
+@admin_required
 def admin_panel():
     """Simple admin panel for content management"""
     admin_html = """
@@ -344,12 +386,14 @@ def admin_panel():
                     };
                 }
                 
+                // PATCH only the edited fields; the rest of the section (roles, stats, …) stays
+                const ops = Object.entries(data).map(([k, v]) => ({op: 'add', path: '/' + k, value: v}));
                 fetch(`/api/content/${section}`, {
-                    method: 'PUT',
+                    method: 'PATCH',
                     headers: {
-                        'Content-Type': 'application/json'
+                        'Content-Type': 'application/json-patch+json'
                     },
-                    body: JSON.stringify(data)
+                    body: JSON.stringify(ops)
                 })
                 .then(response => response.json())
                 .then(data => {
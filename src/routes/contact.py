@@ -1,41 +1,30 @@
 # src/routes/contact.py
 from flask import Blueprint, request, jsonify, current_app, send_from_directory
-import os, time, re, smtplib, sqlite3
-from collections import defaultdict
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
+import os, time, re, math
 from datetime import datetime
 from zoneinfo import ZoneInfo  # Python 3.9+
 from dotenv import load_dotenv
+from services.db import pool
+from services.mailer import Outbox
+from services.ratelimit import RateLimiter, client_ip
 
 load_dotenv()
 
 # ---------- Paths ----------
 ROOT_DIR   = os.path.dirname(os.path.dirname(__file__))          # src/
 STATIC_DIR = os.path.join(ROOT_DIR, "static")
-DB_PATH    = os.path.join(ROOT_DIR, "dms_ai.db")
 
 # ---------- Blueprint ----------
 # সব API এর জন্য prefix `/api`
 contact_bp = Blueprint("contact", __name__, url_prefix="/api")
 
 # ---------- Helpers ----------
-def db():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-# ---- Rate-limit (in-memory) ----
-rate_limit_storage = defaultdict(list)
+# ---- Rate-limit (sliding window per client IP; shared across workers with RATE_LIMIT_BACKEND=sqlite) ----
+# At most MAX_REQUESTS in any TIME_WINDOW, back to back if need be (a quick
+# resubmit after a typo still goes through).
 MAX_REQUESTS = 3
 TIME_WINDOW = 300  # 5 min
-
-def is_rate_limited(ip: str) -> bool:
-    now = time.time()
-    rate_limit_storage[ip] = [t for t in rate_limit_storage[ip] if now - t < TIME_WINDOW]
-    if len(rate_limit_storage[ip]) >= MAX_REQUESTS:
-        return True
-    rate_limit_storage[ip].append(now)
-    return False
+contact_limiter = RateLimiter("contact", MAX_REQUESTS, TIME_WINDOW, pool=pool, sliding=True)
 
 # ---- Validators ----
 def validate_email(email: str) -> bool:
@@ -47,16 +36,12 @@ def validate_phone(phone: str) -> bool:
     clean = re.sub(r"[\s\-\(\)]+", "", phone)
     return re.match(r"^\+?[1-9]\d{0,15}$", clean) is not None
 
-# ---- Optional email sender (only if creds exist) ----
-def try_send_email(name: str, email: str, phone: str, service: str, message: str) -> bool:
-    smtp_server = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-    smtp_port   = int(os.getenv("EMAIL_PORT", "587"))
-    user        = os.getenv("EMAIL_HOST_USER")
-    password    = os.getenv("EMAIL_HOST_PASSWORD")
-    to_addr     = os.getenv("EMAIL_TO") or user
+# ---- Outbound mail (queued; sent by services/mailer.py in the background) ----
+outbox = Outbox(pool)
 
-    # যদি .env ক্রেডেনশিয়াল না থাকে, ইমেইল স্কিপ — কিন্তু API OK থাকবে
-    if not user or not password:
+def queue_contact_email(con, submission_id, name, email, phone, service, message) -> bool:
+    # যদি .env ক্রেডেনশিয়াল না থাকে, ইমেইল স্কিপ — কিন্তু API OK থাকবে
+    if not outbox.configured():
         current_app.logger.info("[MAIL] skipped (no credentials)")
         return False
 
@@ -69,21 +54,8 @@ def try_send_email(name: str, email: str, phone: str, service: str, message: str
         f"Message:\n{message}\n\n"
         "---\nSent from DMS MEHEDI Website"
     )
-
-    msg = MIMEMultipart()
-    msg["From"] = formataddr(("DMS MEHEDI Site", user))
-    msg["To"] = to_addr
-    msg["Subject"] = f"New Contact Form Submission from {name}"
-    if email:
-        msg["Reply-To"] = email
-    msg.attach(MIMEText(body, "plain", "utf-8"))
-
-    current_app.logger.info(f"[MAIL] sending via {smtp_server}:{smtp_port} as {user} → {to_addr}")
-    with smtplib.SMTP(smtp_server, smtp_port, timeout=20) as server:
-        server.starttls()
-        server.login(user, password)
-        server.send_message(msg)
-    current_app.logger.info("[MAIL] sent OK")
+    outbox.enqueue(con, f"New Contact Form Submission from {name}", body,
+                   reply_to=email or None, ref=f"contact:{submission_id}")
     return True
 
 # ---------- Routes ----------
@@ -122,9 +94,10 @@ def contact_status():
 def handle_contact():
     try:
         # rate limit
-        ip = request.environ.get("HTTP_X_FORWARDED_FOR", request.remote_addr)
-        if is_rate_limited(ip):
-            return jsonify({"success": False, "error": "Too many requests. Try again later."}), 429
+        ok, retry = contact_limiter.hit(client_ip(request.environ))
+        if not ok:
+            return jsonify({"success": False, "error": "Too many requests. Try again later."}), 429, \
+                   {"Retry-After": str(math.ceil(retry))}
 
         data = request.get_json(silent=True) or request.form.to_dict()
 
@@ -157,24 +130,20 @@ def handle_contact():
         if errors:
             return jsonify({"success": False, "errors": errors}), 400
 
-        # save to DB (যেমন আগেরটা করতো)
-        con = db(); cur = con.cursor()
-        cur.execute("""
-            INSERT INTO contact_submissions(name,email,phone,topic,message,ts)
-            VALUES(?,?,?,?,?,?)
-        """, (name, email, phone, service, message, time.time()))
-        con.commit(); con.close()
-
-        # optional email
-        emailed = False
-        try:
-            emailed = try_send_email(name, email, phone, service, message)
-        except Exception:
-            current_app.logger.exception("[MAIL] failed")
+        # save to DB (যেমন আগেরটা করতো) + queue the notification in the same transaction
+        with pool.tx() as con:
+            cur = con.execute("""
+                INSERT INTO contact_submissions(name,email,phone,topic,message,ts)
+                VALUES(?,?,?,?,?,?)
+            """, (name, email, phone, service, message, time.time()))
+            queued = queue_contact_email(con, cur.lastrowid, name, email, phone, service, message)
+        if queued:
+            outbox.wake()
 
         return jsonify({
             "success": True,
-            "emailed": bool(emailed),
+            "queued": queued,
+            "emailed": queued,   # pre-outbox name of the same flag; kept for existing clients
             "message": "Thanks! We’ve received your message — DMS MEHEDI"
         }), 200
 
@@ -0,0 +1,70 @@
+# ================== src/services/ai.py ==================
+# The one OpenAI client for the whole app (main.py and scripts/build_faq_index.py).
+# The SDK (openai + httpx + pydantic models, ~0.5 s to import) is not loaded
+# at boot: the client is built on the first AI request, over one shared httpx
+# connection pool, and every call goes through services.llm_gateway.
+# A missing key no longer breaks the boot — calls raise AIUnavailable instead.
+import os, sys, logging, threading
+
+from services import fake_llm
+from services.llm_gateway import gateway, GatewayError, CALL_TIMEOUT
+
+MODEL          = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+HTTP_POOL      = int(os.getenv("AI_HTTP_POOL", "10"))        # max connections to the API
+HTTP_KEEPALIVE = int(os.getenv("AI_HTTP_KEEPALIVE", "5"))    # idle connections kept warm
+
+
+class AIUnavailable(GatewayError):
+    """No OPENAI_API_KEY (and AI_FAKE off)."""
+
+
+_lock = threading.Lock()
+_client = None
+_http = None
+
+
+def api_key():
+    return os.getenv("OPENAI_API_KEY", "").strip()
+
+
+def enabled():
+    """Would an AI call work? Cheap — does not import the SDK."""
+    return fake_llm.enabled() or bool(api_key())
+
+
+def client():
+    global _client, _http
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is None:
+            if fake_llm.enabled():
+                _client = fake_llm.FakeOpenAI()
+                logging.warning("⚠️ AI_FAKE set — using the local fake LLM")
+            elif api_key():
+                import httpx
+                from openai import OpenAI     # deferred: first AI request pays the import, not the boot
+                _http = httpx.Client(
+                    limits=httpx.Limits(max_connections=HTTP_POOL, max_keepalive_connections=HTTP_KEEPALIVE),
+                    timeout=httpx.Timeout(CALL_TIMEOUT, connect=10.0),
+                )
+                _client = OpenAI(api_key=api_key(), http_client=_http)
+                logging.info("✅ OpenAI client initialized successfully")
+            else:
+                raise AIUnavailable("OPENAI_API_KEY is not set")
+    return _client
+
+
+def complete(messages, temperature=None, model=MODEL):
+    """Answer text for a chat completion."""
+    return gateway.complete(client(), model, messages, temperature)
+
+
+def stream(messages, temperature=None, model=MODEL):
+    """Answer pieces as they are generated."""
+    yield from gateway.stream(client(), model, messages, temperature)
+
+
+def stats():
+    return {"enabled": enabled(), "fake": fake_llm.enabled(), "model": MODEL,
+            "client_ready": _client is not None, "sdk_loaded": "openai" in sys.modules}
@@ -0,0 +1,182 @@
+# ================== src/services/answer_cache.py ==================
+# Answer cache in front of the LLM: visitors ask the same FAQ questions in
+# slightly different words, and each one used to cost a full OpenAI call.
+#
+#   1. exact   — normalized question text (case, punctuation, quotes, spaces)
+#   2. similar — hashed word + char-trigram vectors, cosine >= threshold, and
+#                every key term of the question present in the cached one with
+#                negations agreeing (same_question; services/faq_index.py uses
+#                it too): the n-gram cosine alone rates "do you NOT offer X"
+#                ≈ "do you offer X"
+#
+# Entries expire after a TTL and the least recently used go first once the
+# cache is full. Vectors are sparse (~50 non-zero features of DIM); an
+# inverted index feature -> {slot: weight} scores only the entries that share
+# a feature with the question, and candidates are tried best score first.
+import os, re, math, time, zlib, threading, unicodedata
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.getenv("AI_CACHE_SIZE", "1000"))
+CACHE_TTL  = float(os.getenv("AI_CACHE_TTL_SEC", "86400"))
+CACHE_SIM  = float(os.getenv("AI_CACHE_SIM", "0.9"))       # cosine needed for a near-duplicate hit
+DIM        = 4096                                           # hashed feature space
+
+_QUOTES = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"'})
+_PUNCT  = re.compile(r"[^\w\s']+")
+_SPACE  = re.compile(r"\s+")
+
+# words that don't change what is being asked
+STOPWORDS = set("""a an the and or but if so of to in on at by for from with about as into vs versus
+    do does did done you your yours we our us i me my it its is are was were be been am this that these
+    those there what which who whom how when where why can could would should will shall may might
+    any some also please tell me have has had get""".split())
+NEGATIONS = {"not", "no", "never", "without", "dont", "doesnt", "didnt", "cant", "cannot", "wont",
+             "isnt", "arent", "nor", "except"}
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "es", "s", "ed")
+
+
+def normalize(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text or "").translate(_QUOTES).lower()
+    t = _PUNCT.sub(" ", t).replace("'", "")
+    return _SPACE.sub(" ", t).strip()
+
+
+def _h(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % DIM
+
+
+def features(norm: str) -> dict:
+    """Sparse L2-normalized vector {slot: weight}: words + char trigrams."""
+    vec = {}
+    for w in norm.split():
+        k = _h("w:" + w)
+        vec[k] = vec.get(k, 0.0) + 1.0
+    padded = f" {norm} "
+    for i in range(len(padded) - 2):
+        k = _h("c:" + padded[i:i + 3])
+        vec[k] = vec.get(k, 0.0) + 1.0
+    n = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+    return {k: v / n for k, v in vec.items()}
+
+
+def _stem(word):
+    for suf in _SUFFIXES:
+        if len(word) - len(suf) >= 3 and word.endswith(suf):
+            return word[:-len(suf)]
+    return word
+
+
+def key_terms(norm: str) -> set:
+    """Content words of a normalized question (crudely stemmed), negations included."""
+    return {_stem(w) for w in norm.split() if w not in STOPWORDS and len(w) >= 2}
+
+
+def same_question(asked: set, known: set) -> bool:
+    """Every key term asked about is covered, and both agree on negation."""
+    return asked <= known and (asked & NEGATIONS) == (known & NEGATIONS)
+
+
+class _Entry:
+    __slots__ = ("answer", "expires", "terms", "slot")
+
+    def __init__(self, answer, expires, terms, slot):
+        self.answer, self.expires, self.terms, self.slot = answer, expires, terms, slot
+
+
+class AnswerCache:
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL, threshold=CACHE_SIM):
+        self.size = size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()   # normalized question -> _Entry (LRU order)
+        self.keys = [None] * size      # slot -> normalized question
+        self.free = list(range(size - 1, -1, -1))
+        self.postings = {}             # feature -> {slot: weight}
+        self.hits = self.similar_hits = self.misses = self.stores = self.evictions = 0
+        self.term_rejects = 0
+
+    # ---- lookups ----
+    def get(self, question):
+        """Cached answer for question (or a near-duplicate of it), else None."""
+        norm = normalize(question)
+        if not norm:
+            return None
+        now = time.time()
+        with self.lock:
+            e = self.entries.get(norm)
+            if e is not None and e.expires > now:
+                self.entries.move_to_end(norm)
+                self.hits += 1
+                return e.answer
+            if e is not None:
+                self._drop(norm)
+            key = self._nearest(features(norm), key_terms(norm), now)
+            if key is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.similar_hits += 1
+            return self.entries[key].answer
+
+    def _nearest(self, vec, terms, now):
+        # caller holds self.lock
+        scores = {}
+        for k, w in vec.items():
+            for slot, v in self.postings.get(k, {}).items():
+                scores[slot] = scores.get(slot, 0.0) + w * v
+        close = [slot for slot, s in scores.items() if s >= self.threshold]
+        for slot in sorted(close, key=scores.__getitem__, reverse=True):
+            key = self.keys[slot]
+            e = self.entries[key]
+            if e.expires <= now:
+                continue
+            if same_question(terms, e.terms):
+                return key
+            self.term_rejects += 1
+        return None
+
+    # ---- writes ----
+    def put(self, question, answer):
+        norm = normalize(question)
+        if not norm or not answer:
+            return
+        vec = features(norm)
+        with self.lock:
+            if norm in self.entries:
+                self._drop(norm)
+            while len(self.entries) >= self.size:
+                self._drop(next(iter(self.entries)))   # least recently used
+                self.evictions += 1
+            slot = self.free.pop()
+            self.keys[slot] = norm
+            for k, w in vec.items():
+                self.postings.setdefault(k, {})[slot] = w
+            self.entries[norm] = _Entry(answer, time.time() + self.ttl, key_terms(norm), slot)
+            self.stores += 1
+
+    def _drop(self, norm):
+        # caller holds self.lock
+        e = self.entries.pop(norm)
+        self.keys[e.slot] = None
+        for k in features(norm):              # the vector lives only in postings
+            p = self.postings[k]
+            del p[e.slot]
+            if not p:
+                del self.postings[k]
+        self.free.append(e.slot)
+
+    def clear(self):
+        with self.lock:
+            for norm in list(self.entries):
+                self._drop(norm)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {"size": len(self.entries), "max": self.size, "ttl": self.ttl,
+                    "threshold": self.threshold, "features": len(self.postings),
+                    "hits": self.hits, "similar_hits": self.similar_hits, "misses": self.misses,
+                    "term_rejects": self.term_rejects,
+                    "hit_ratio": round((self.hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+                    "stores": self.stores, "evictions": self.evictions}
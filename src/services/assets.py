@@ -0,0 +1,190 @@
+# ================== src/services/assets.py ==================
+# Static asset pipeline.
+#   build():  copy static/{css,js,images,assets,sound}/* to static/_build/ as
+#             name.<contenthash>.ext (+ .gz/.br for text types), rewrite the
+#             references inside CSS/JS and in the pages (index.html, faq.html,
+#             templates/dms-admin.html), and write _build/manifest.json;
+#             with an image manifest, <img sizes=…> tags get a /img/ srcset
+#   AssetManifest: loaded once at startup — serving a hashed URL is a dict
+#             lookup (no stat), small text assets are held in memory
+# Hashed URLs (/assets/...) never change content, so they are cached for a
+# year as immutable; a new build produces new names.
+import os, re, json, shutil, hashlib, mimetypes
+from urllib.parse import quote, unquote
+
+from services import precompress
+
+ASSET_DIRS  = ("css", "js", "images", "assets", "sound")
+SKIP        = {"desktop.ini", "Thumbs.db", ".DS_Store"}
+TEXT_EXT    = {".css", ".js", ".svg", ".json", ".txt", ".xml", ".ico", ".html"}
+URL_PREFIX  = "/assets/"
+MEMORY_MAX  = 512 * 1024           # keep text assets up to this size in memory
+
+IMMUTABLE   = "public, max-age=31536000, immutable"
+SHORT       = "public, max-age=300"
+
+# a quoted string / url(...) that points into one of the asset folders
+_REF = re.compile(r"""(?P<q>["'`(])(?P<url>(?:/static/|/|\./|(?:\.\./)+)?(?:%s)/[^"'`()?#\s][^"'`()?#]*)"""
+                  % "|".join(ASSET_DIRS))
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _hashed_name(rel, digest):
+    base, ext = os.path.splitext(rel)
+    return f"{base}.{digest}{ext}"
+
+
+def _resolve(url, base_dir):
+    """Static-relative path a reference points at ("css/style.css"), or None."""
+    url = unquote(url)
+    if url.startswith("/static/"):
+        return url[len("/static/"):]
+    if url.startswith("/"):
+        return url[1:]
+    return os.path.normpath(os.path.join(base_dir, url)).replace(os.sep, "/").lstrip("./")
+
+
+def rewrite(text, mapping, base_dir=""):
+    """Point every known asset reference at its hashed URL."""
+    def sub(m):
+        rel = _resolve(m.group("url"), base_dir)
+        hashed = mapping.get(rel)
+        if hashed is None:
+            return m.group(0)
+        return m.group("q") + URL_PREFIX + quote(hashed)
+    return _REF.sub(sub, text)
+
+
+def build(static_dir, templates_dir, out_dir=None, pages=("index.html", "faq.html"),
+          templates=("dms-admin.html",), images=None):
+    """Fingerprint + precompress assets, rewrite pages. Returns the manifest.
+    images: an ImageManifest (services/images.py) — pages then get srcset/derivative URLs."""
+    out_dir = out_dir or os.path.join(static_dir, "_build")
+    tmp_dir = out_dir + ".new"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    files = []
+    for top in ASSET_DIRS:
+        for root, _, names in os.walk(os.path.join(static_dir, top)):
+            for n in sorted(names):
+                if n not in SKIP and not n.startswith("."):
+                    files.append(os.path.relpath(os.path.join(root, n), static_dir).replace(os.sep, "/"))
+    # binaries first, then CSS (may url() images), then JS (may name images/sounds)
+    order = {".css": 1, ".js": 2}
+    files.sort(key=lambda r: (order.get(os.path.splitext(r)[1].lower(), 0), r))
+
+    mapping, assets = {}, {}
+    for rel in files:
+        with open(os.path.join(static_dir, rel), "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(rel)[1].lower()
+        if ext in (".css", ".js"):
+            data = rewrite(data.decode("utf-8"), mapping,
+                           os.path.dirname(rel) if ext == ".css" else "").encode("utf-8")
+        digest = _digest(data)
+        hashed = _hashed_name(rel, digest)
+        path = os.path.join(tmp_dir, hashed)
+        if ext in TEXT_EXT:
+            encodings = [e for e in precompress.write_variants(path, data) if e != "identity"]
+        else:
+            precompress.write_atomic(path, data)
+            encodings = []
+        mapping[rel] = hashed
+        assets[hashed] = {"src": rel, "etag": digest, "size": len(data), "enc": encodings,
+                          "mime": mimetypes.guess_type(rel)[0] or "application/octet-stream"}
+
+    built_pages = {}
+    for name, src_dir, out_sub in [(p, static_dir, "pages") for p in pages] + \
+                                  [(t, templates_dir, "templates") for t in templates]:
+        src = os.path.join(src_dir, name)
+        if not os.path.exists(src):
+            continue
+        with open(src, encoding="utf-8") as f:
+            text = f.read()
+        if images is not None:
+            text = images.rewrite(text)
+        text = rewrite(text, mapping)
+        data = text.encode("utf-8")
+        path = os.path.join(tmp_dir, out_sub, name)
+        encodings = [e for e in precompress.write_variants(path, data) if e != "identity"]
+        built_pages[f"{out_sub}/{name}"] = {"etag": _digest(data), "size": len(data), "enc": encodings}
+
+    manifest = {"version": 1, "prefix": URL_PREFIX, "files": mapping, "assets": assets, "pages": built_pages}
+    precompress.write_atomic(os.path.join(tmp_dir, "manifest.json"),
+                             json.dumps(manifest, indent=1, ensure_ascii=False).encode("utf-8"))
+    # swap the whole tree in one go
+    old = out_dir + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+class AssetManifest:
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.assets = {}         # hashed rel → entry (+ "file", "body" for in-memory ones)
+        self.files = {}          # logical rel → hashed rel
+        self.pages = {}
+        self.hits = self.misses = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.out_dir, "manifest.json"), encoding="utf-8") as f:
+                m = json.load(f)
+        except (OSError, ValueError):
+            return False
+        assets = {}
+        for hashed, e in m.get("assets", {}).items():
+            e = dict(e, file=os.path.join(self.out_dir, hashed), body={})
+            if e["size"] <= MEMORY_MAX and e["enc"]:
+                for enc in ("identity", *e["enc"]):
+                    with open(e["file"] + precompress.SUFFIX.get(enc, ""), "rb") as f:
+                        e["body"][enc] = f.read()
+            assets[hashed] = e
+        self.assets, self.files, self.pages = assets, m.get("files", {}), m.get("pages", {})
+        return True
+
+    @property
+    def ready(self):
+        return bool(self.assets)
+
+    def url(self, rel):
+        """Hashed URL for a static-relative path (falls back to /static/<rel>)."""
+        hashed = self.files.get(rel)
+        return URL_PREFIX + quote(hashed) if hashed else "/static/" + quote(rel)
+
+    def lookup(self, path):
+        """(entry, cache_control) for /assets/<path> (already URL-decoded); logical names work too, briefly cached."""
+        e = self.assets.get(path)
+        if e is not None:
+            self.hits += 1
+            return e, IMMUTABLE
+        hashed = self.files.get(path)
+        if hashed is not None:
+            self.hits += 1
+            return self.assets[hashed], SHORT
+        self.misses += 1
+        return None, None
+
+    def page_path(self, name):
+        """Built (reference-rewritten) copy of a page/template, e.g. "pages/faq.html", or None."""
+        return os.path.join(self.out_dir, name) if name in self.pages else None
+
+    def page(self, name):
+        """Entry (same shape as an asset's) for serving a built page, or None."""
+        p = self.pages.get(name)
+        if p is None:
+            return None
+        return dict(p, file=os.path.join(self.out_dir, name), mime="text/html", body={})
+
+    def stats(self):
+        return {"ready": self.ready, "assets": len(self.assets), "pages": len(self.pages),
+                "in_memory_bytes": sum(len(b) for e in self.assets.values() for b in e["body"].values()),
+                "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,363 @@
+# ================== src/services/content_store.py ==================
+# CMS content (data/content.json) held in memory, parsed once.
+#   - each section keeps its response body pre-serialized plus an ETag that is
+#     a hash of the section itself, so editing one section leaves the others'
+#     ETags (and clients' 304s) untouched
+#   - reads do no I/O; the file is stat()ed at most every CMS_CHECK_SEC to
+#     pick up edits made outside the app
+#   - writes run under a writer lock (thread lock + flock on content.json.lock,
+#     so gunicorn workers serialize too), re-read the file first if another
+#     process changed it, and land via temp file + fsync + rename: readers see
+#     the old file or the new one, never half of one
+#   - only changed sections are re-serialized; the file is spliced from the
+#     cached per-section fragments (indent=2 as before, or CMS_COMPACT=1)
+#   - the section ETag doubles as its version: a write based on an old one
+#     raises VersionConflict instead of silently overwriting
+#   - on_change(fn) listeners hear which sections a write actually changed
+import os, json, time, fcntl, hashlib, logging, tempfile, threading
+from contextlib import contextmanager
+
+CHECK_SEC = float(os.getenv("CMS_CHECK_SEC", "1"))
+COMPACT   = os.getenv("CMS_COMPACT", "0") == "1"
+
+
+class PatchError(ValueError):
+    """A JSON-Patch op that doesn't apply (bad path, failed test, …)."""
+
+
+class VersionConflict(Exception):
+    """The section changed since the version the edit was based on."""
+
+
+def _etag(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+# ---------- JSON-Patch (RFC 6902) ----------
+def _pointer(path):
+    if path == "":
+        return []
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"bad path {path!r}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+
+
+def _walk(doc, parts):
+    for p in parts:
+        try:
+            doc = doc[int(p)] if isinstance(doc, list) else doc[p]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise PatchError(f"path not found: /{'/'.join(parts)}")
+    return doc
+
+
+def _remove(doc, path):
+    parts = _pointer(path)
+    if not parts:
+        raise PatchError("can't remove the whole section")
+    parent, key = _walk(doc, parts[:-1]), parts[-1]
+    try:
+        return parent.pop(int(key) if isinstance(parent, list) else key)
+    except (KeyError, IndexError, ValueError, TypeError, AttributeError):
+        raise PatchError(f"path not found: {path}")
+
+
+def _add(doc, path, value, replace=False):
+    parts = _pointer(path)
+    if not parts:
+        return value
+    parent, key = _walk(doc, parts[:-1]), parts[-1]
+    if isinstance(parent, list):
+        if key == "-" and not replace:
+            parent.append(value)
+            return doc
+        try:
+            i = int(key)
+        except ValueError:
+            raise PatchError(f"bad array index in {path}")
+        if not 0 <= i < len(parent) + (0 if replace else 1):
+            raise PatchError(f"index out of range: {path}")
+        if replace:
+            parent[i] = value
+        else:
+            parent.insert(i, value)
+    elif isinstance(parent, dict):
+        if replace and key not in parent:
+            raise PatchError(f"path not found: {path}")
+        parent[key] = value
+    else:
+        raise PatchError(f"not a container: {path}")
+    return doc
+
+
+def apply_patch(doc, ops):
+    """Apply RFC 6902 ops (add/remove/replace/move/copy/test) to doc; returns the result."""
+    if not isinstance(ops, list):
+        raise PatchError("patch must be a list of operations")
+    for op in ops:
+        if not isinstance(op, dict) or "path" not in op:
+            raise PatchError(f"bad operation {op!r}")
+        kind, path = op.get("op"), op["path"]
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"{kind} needs a value")
+        if kind == "add":
+            doc = _add(doc, path, op["value"])
+        elif kind == "replace":
+            doc = _add(doc, path, op["value"], replace=True)
+        elif kind == "remove":
+            _remove(doc, path)
+        elif kind in ("move", "copy"):
+            if "from" not in op:
+                raise PatchError(f"{kind} needs from")
+            if kind == "move":
+                value = _remove(doc, op["from"])
+            else:
+                value = json.loads(json.dumps(_walk(doc, _pointer(op["from"]))))
+            doc = _add(doc, path, value)
+        elif kind == "test":
+            if _walk(doc, _pointer(path)) != op["value"]:
+                raise PatchError(f"test failed at {path}")
+        else:
+            raise PatchError(f"unknown op {kind!r}")
+    return doc
+
+
+# ---------- Snapshot ----------
+class _Section:
+    __slots__ = ("value", "raw", "body", "etag", "_disk")
+
+    def __init__(self, value):
+        self.value = value
+        self.raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.body = b'{"success":true,"content":' + self.raw + b"}"
+        self.etag = _etag(self.raw)
+        self._disk = None
+
+    def disk(self, compact):
+        if compact:
+            return self.raw.decode("utf-8")
+        if self._disk is None:
+            # exactly what json.dump(content, f, indent=2) writes under a top-level key
+            self._disk = json.dumps(self.value, indent=2).replace("\n", "\n  ")
+        return self._disk
+
+
+class _Snapshot:
+    __slots__ = ("sections", "body", "etag", "stamp", "revision")
+
+    def __init__(self, sections, stamp, revision):
+        self.sections = sections        # name -> _Section, in file order
+        self.stamp = stamp
+        self.revision = revision
+        self.body = (b'{"success":true,"content":{'
+                     + b",".join(json.dumps(k, ensure_ascii=False).encode("utf-8") + b":" + s.raw
+                                 for k, s in sections.items()) + b"}}")
+        self.etag = _etag("|".join(f"{k}:{s.etag}" for k, s in sections.items()).encode())
+
+    @classmethod
+    def parse(cls, content, stamp, revision):
+        return cls({k: _Section(v) for k, v in content.items()}, stamp, revision)
+
+    def render(self, compact):
+        if compact:
+            return "{" + ",".join(f"{json.dumps(k)}:{s.disk(True)}" for k, s in self.sections.items()) + "}"
+        if not self.sections:
+            return "{}"
+        return "{\n" + ",\n".join(f"  {json.dumps(k)}: {s.disk(False)}"
+                                  for k, s in self.sections.items()) + "\n}"
+
+
+class ContentStore:
+    def __init__(self, path, default, check_sec=CHECK_SEC, compact=COMPACT):
+        self.path = os.path.abspath(path)
+        self.default = default
+        self.check_sec = check_sec
+        self.compact = compact
+        self.lock = threading.RLock()
+        self.snap = None
+        self.checked = 0.0
+        self._depth = 0
+        self.listeners = []          # fn(changed_section_names, snapshot) after each write
+        self.reloads = self.reads = self.parse_errors = 0
+        self.writes = self.conflicts = 0
+        self.write_sec = 0.0
+
+    # ---- disk ----
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def _ensure_file(self):
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._write(_Snapshot.parse(self.default, None, 0))
+
+    def _reload(self, stamp):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+            if not isinstance(content, dict):
+                raise ValueError("content.json must hold an object")
+        except (OSError, ValueError):
+            self.parse_errors += 1
+            logging.exception(f"[CMS] could not read {self.path}")
+            if self.snap is not None:
+                self.snap.stamp = stamp      # don't retry until the file changes again
+                return self.snap
+            content = self.default
+        self.reloads += 1
+        self.snap = _Snapshot.parse(content, stamp, self.snap.revision + 1 if self.snap else 0)
+        return self.snap
+
+    def _write(self, snap):
+        """temp file in the same dir → fsync → rename over content.json → fsync the dir"""
+        d = os.path.dirname(self.path)
+        fd, tmp = tempfile.mkstemp(prefix=".content.", suffix=".tmp", dir=d)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(snap.render(self.compact))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        dfd = os.open(d, os.O_RDONLY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
+        snap.stamp = self._stamp()
+
+    @contextmanager
+    def _writer(self):
+        """Thread lock + cross-process flock; yields the current snapshot, fresh from disk."""
+        with self.lock:
+            if self._depth:                  # nested (e.g. patch → update): already held
+                yield self.snap
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".lock", "a") as lf:
+                fcntl.flock(lf, fcntl.LOCK_EX)
+                self._depth += 1
+                try:
+                    self._ensure_file()
+                    stamp = self._stamp()
+                    if self.snap is None or stamp != self.snap.stamp:
+                        self._reload(stamp)  # another worker wrote since we last looked
+                    yield self.snap
+                finally:
+                    self._depth -= 1
+                    fcntl.flock(lf, fcntl.LOCK_UN)
+
+    # ---- reads ----
+    def snapshot(self) -> _Snapshot:
+        snap, now = self.snap, time.monotonic()
+        if snap is not None and now - self.checked < self.check_sec:
+            self.reads += 1
+            return snap
+        with self.lock:
+            if self.snap is None and not os.path.exists(self.path):
+                with self._writer():         # first boot: create it under the writer lock
+                    pass
+            stamp = self._stamp()
+            if self.snap is None or stamp != self.snap.stamp:
+                self._reload(stamp)
+            self.checked = now
+            self.reads += 1
+            return self.snap
+
+    def section(self, name):
+        """(body bytes, etag) for one section, or None."""
+        s = self.snapshot().sections.get(name)
+        return (s.body, s.etag) if s else None
+
+    def load(self) -> dict:
+        """A private copy of the content, safe to mutate."""
+        return json.loads(self.snapshot().body)["content"]
+
+    # ---- writes ----
+    def update(self, changes, expect=None, replace=False):
+        """Write {section: value}; other sections are kept (or dropped with replace=True).
+
+        expect: {section: etag} the edit was based on → VersionConflict if one moved.
+        Returns the new snapshot.
+        """
+        t = time.perf_counter()
+        with self._writer() as cur:
+            for name, etag in (expect or {}).items():
+                have = cur.sections.get(name)
+                if etag is not None and (have.etag if have else None) != etag:
+                    self.conflicts += 1
+                    raise VersionConflict(name)
+            sections = {} if replace else dict(cur.sections)
+            for name, value in changes.items():
+                new, old = _Section(value), cur.sections.get(name)
+                sections[name] = old if old is not None and old.raw == new.raw else new
+            changed = [k for k, v in sections.items() if cur.sections.get(k) is not v]
+            changed += [k for k in cur.sections if k not in sections]
+            if not changed:
+                return cur                   # same bytes: nothing to write or announce
+            snap = _Snapshot(sections, None, cur.revision + 1)
+            self._write(snap)
+            self.snap = snap
+            self.checked = time.monotonic()
+            self.writes += 1
+            self.write_sec += time.perf_counter() - t
+        for fn in self.listeners:
+            try:
+                fn(changed, snap)
+            except Exception:
+                logging.exception("[CMS] change listener failed")
+        return snap
+
+    def merge(self, data):
+        """PUT /api/content semantics: dict values are merged into existing dict
+        sections, anything else replaces; unknown sections are ignored."""
+        with self._writer() as cur:
+            changes = {}
+            for name, value in data.items():
+                s = cur.sections.get(name)
+                if s is None:
+                    continue
+                if isinstance(value, dict) and isinstance(s.value, dict):
+                    value = {**json.loads(s.raw), **value}
+                changes[name] = value
+            return self.update(changes)
+
+    def patch_section(self, name, ops, expect=None):
+        """Apply JSON-Patch ops to one section (paths relative to it). KeyError if missing."""
+        with self._writer() as cur:
+            s = cur.sections.get(name)
+            if s is None:
+                raise KeyError(name)
+            value = apply_patch(json.loads(s.raw), ops)
+            return self.update({name: value}, expect={name: expect} if expect else None)
+
+    def save(self, content) -> bool:
+        """Replace the whole document."""
+        try:
+            self.update(content, replace=True)
+            return True
+        except OSError:
+            logging.exception(f"[CMS] could not write {self.path}")
+            return False
+
+    def on_change(self, fn):
+        self.listeners.append(fn)
+        return fn
+
+    def stats(self):
+        snap = self.snap
+        return {"path": os.path.basename(self.path), "loaded": snap is not None,
+                "sections": len(snap.sections) if snap else 0, "etag": snap.etag if snap else None,
+                "revision": snap.revision if snap else None, "compact": self.compact,
+                "reads": self.reads, "reloads": self.reloads, "parse_errors": self.parse_errors,
+                "writes": self.writes, "conflicts": self.conflicts,
+                "write_avg_ms": round(self.write_sec * 1000 / self.writes, 3) if self.writes else None}
@@ -0,0 +1,143 @@
+# ================== src/services/context.py ==================
+# Conversation context for AI replies, packed under a token budget.
+#   - the newest turns of a cid go in verbatim, newest first, while they fit
+#   - turns that slide out of that window are folded into a rolling summary
+#     (local + extractive, no LLM call), incrementally: each turn is folded once
+#   - the summary is cached in memory (LRU) and persisted in conversation_summaries
+# Prompt size therefore stays flat however long the conversation gets.
+import os, re, time, threading
+from collections import OrderedDict
+
+CONTEXT_TOKENS  = int(os.getenv("AI_CONTEXT_TOKENS", "1200"))   # whole prompt budget
+MAX_TURNS       = int(os.getenv("AI_CONTEXT_TURNS", "12"))      # verbatim turns considered
+SUMMARY_TOKENS  = int(os.getenv("AI_SUMMARY_TOKENS", "250"))
+CACHE_SIZE      = int(os.getenv("AI_CONTEXT_CACHE", "2000"))    # cids with a cached summary
+SUMMARY_SCAN    = 200             # turns folded at most per update (first build of a long chat)
+LINE_CHARS      = 160             # per summarized turn
+MSG_OVERHEAD    = 4               # role/separator tokens per chat message
+
+_SENTENCE = re.compile(r"(?<=[.!?।])\s")
+_SPACE    = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local estimate: ~4 ASCII chars per token, ~2 per non-ASCII char (e.g. Bengali)."""
+    if not text:
+        return 0
+    n = len(text)
+    wide = (len(text.encode("utf-8")) - n) // 2     # 3-byte chars add 2 bytes each
+    return (n - wide + 3) // 4 + (wide + 1) // 2
+
+
+def _line(role, content):
+    text = _SPACE.sub(" ", content or "").strip()
+    text = _SENTENCE.split(text, 1)[0]
+    if len(text) > LINE_CHARS:
+        text = text[:LINE_CHARS - 1].rstrip() + "…"
+    return f"- {'visitor' if role == 'user' else 'we'}: {text}"
+
+
+class ContextBuilder:
+    def __init__(self, pool, budget=CONTEXT_TOKENS, max_turns=MAX_TURNS,
+                 summary_tokens=SUMMARY_TOKENS, cache_size=CACHE_SIZE):
+        self.pool = pool
+        self.budget = budget
+        self.max_turns = max_turns
+        self.summary_tokens = summary_tokens
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.summaries = OrderedDict()   # cid -> (upto_id, summary)
+        self.builds = self.folded = self.cache_hits = self.prompt_tokens = 0
+
+    def build(self, cid, question, system_prompt, before_id=None):
+        """Chat messages: system (+ summary), recent turns, then the question.
+
+        before_id: messages.id of the stored row that *is* `question` — only turns
+        before it are context (later ones get their own reply job).
+        """
+        rows = self.pool.query("""SELECT id, role, content FROM messages WHERE cid=? AND id<?
+                                  ORDER BY id DESC LIMIT ?""",
+                               (cid, before_id if before_id is not None else 2**63 - 1, self.max_turns))
+
+        upto, summary = self._summary(cid)
+        room = (self.budget - estimate_tokens(system_prompt) - estimate_tokens(question)
+                - 2 * MSG_OVERHEAD - self.summary_tokens)
+        turns = []
+        for id_, role, content in rows:                  # newest → oldest
+            if id_ <= upto:
+                break                                    # already in the summary
+            cost = estimate_tokens(content) + MSG_OVERHEAD
+            if cost > room:
+                break
+            room -= cost
+            turns.append((id_, role, content))
+        turns.reverse()
+
+        # everything older than the packed window and newer than the summary gets folded
+        window_start = turns[0][0] if turns else (rows[0][0] + 1 if rows else 0)
+        if window_start - 1 > upto:
+            upto, summary = self._fold(cid, upto, summary, window_start)
+
+        system = system_prompt
+        if summary:
+            system += "\n\nEarlier in this conversation (summary):\n" + summary
+        msgs = [{"role": "system", "content": system}]
+        msgs += [{"role": "user" if r == "user" else "assistant", "content": c} for _, r, c in turns]
+        msgs.append({"role": "user", "content": question})
+        with self.lock:
+            self.builds += 1
+            self.prompt_tokens += sum(estimate_tokens(m["content"]) + MSG_OVERHEAD for m in msgs)
+        return msgs
+
+    # ---- rolling summary ----
+    def _summary(self, cid):
+        with self.lock:
+            hit = self.summaries.get(cid)
+            if hit is not None:
+                self.summaries.move_to_end(cid)
+                self.cache_hits += 1
+                return hit
+        row = self.pool.query_one("SELECT upto_id, summary FROM conversation_summaries WHERE cid=?", (cid,))
+        hit = (row[0], row[1] or "") if row else (0, "")
+        self._remember(cid, hit)
+        return hit
+
+    def _fold(self, cid, upto, summary, window_start):
+        rows = self.pool.query("""SELECT id, role, content FROM messages WHERE cid=? AND id>? AND id<?
+                                  ORDER BY id DESC LIMIT ?""", (cid, upto, window_start, SUMMARY_SCAN))
+        lines = summary.split("\n") if summary else []
+        for _, role, content in reversed(rows):
+            ln = _line(role, content)
+            if (content or "").strip() and ln not in lines:    # repeats add nothing
+                lines.append(ln)
+        # keep the opener (what the visitor came for) and the newest lines that fit
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            del lines[1]
+        summary = "\n".join(lines)
+        upto = window_start - 1
+        with self.pool.tx() as con:
+            con.execute("""INSERT INTO conversation_summaries(cid, upto_id, summary, updated) VALUES(?,?,?,?)
+                           ON CONFLICT(cid) DO UPDATE SET upto_id=excluded.upto_id,
+                               summary=excluded.summary, updated=excluded.updated""",
+                        (cid, upto, summary, time.time()))
+        self._remember(cid, (upto, summary))
+        with self.lock:
+            self.folded += len(rows)
+        return upto, summary
+
+    def _remember(self, cid, value):
+        with self.lock:
+            self.summaries[cid] = value
+            self.summaries.move_to_end(cid)
+            while len(self.summaries) > self.cache_size:
+                self.summaries.popitem(last=False)
+
+    def forget(self, cid):
+        with self.lock:
+            self.summaries.pop(cid, None)
+
+    def stats(self):
+        with self.lock:
+            return {"budget": self.budget, "max_turns": self.max_turns, "cached": len(self.summaries),
+                    "builds": self.builds, "cache_hits": self.cache_hits, "folded_turns": self.folded,
+                    "avg_prompt_tokens": round(self.prompt_tokens / self.builds, 1) if self.builds else None}
@@ -0,0 +1,126 @@
+# ================== src/services/db.py ==================
+# Shared SQLite connection layer — one long-lived connection per thread, WAL journal
+import os, sqlite3, threading, time
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))   # src/
+DB_PATH  = os.path.join(BASE_DIR, "dms_ai.db")
+
+# WAL: readers never block the writer (heartbeats vs chat writes)
+# synchronous=NORMAL is durable enough under WAL and skips an fsync per commit
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous",  "NORMAL"),
+    ("busy_timeout", int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))),
+    ("cache_size",   -int(os.getenv("SQLITE_CACHE_KB", "8192"))),   # negative = KiB
+    ("temp_store",   "MEMORY"),
+)
+# sqlite3 keeps an LRU of compiled statements per connection — a long-lived
+# connection means every helper's SQL is prepared once and reused
+STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+
+
+class ConnectionPool:
+    """Per-thread SQLite connections, opened lazily and reused for the thread's lifetime."""
+
+    def __init__(self, path, pragmas=PRAGMAS, cached_statements=STATEMENT_CACHE):
+        self.path = path
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # also called after fork: a connection must never cross a process boundary
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._opened = 0
+        self._checkouts = 0
+        self._tx = 0
+        self._busy = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _open(self):
+        con = sqlite3.connect(
+            self.path,
+            timeout=0,                      # waiting is handled by busy_timeout
+            isolation_level=None,           # explicit BEGIN/COMMIT via tx()
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for key, val in self.pragmas:
+            con.execute(f"PRAGMA {key}={val}")
+        with self._lock:
+            self._opened += 1
+        return con
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (never close it — it is reused)."""
+        if os.getpid() != self._pid:
+            self._reset()
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = self._open()
+        with self._lock:
+            self._checkouts += 1
+        return con
+
+    @contextmanager
+    def tx(self):
+        """Write transaction: BEGIN IMMEDIATE … COMMIT (rollback on error).
+
+        Time spent acquiring the write lock is recorded as lock wait.
+        Nested use joins the outer transaction.
+        """
+        con = self.connection()
+        if con.in_transaction:
+            yield con
+            return
+        t0 = time.perf_counter()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            with self._lock:
+                self._busy += 1
+            raise
+        waited = time.perf_counter() - t0
+        with self._lock:
+            self._tx += 1
+            self._wait_total += waited
+            if waited > self._wait_max:
+                self._wait_max = waited
+        try:
+            yield con
+        except BaseException:
+            con.rollback()
+            raise
+        else:
+            con.commit()
+
+    def query(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "path": os.path.basename(self.path),
+                "pid": self._pid,
+                "connections": self._opened,
+                "checkouts": self._checkouts,
+                "reused": self._checkouts - self._opened,
+                "transactions": self._tx,
+                "busy_errors": self._busy,
+                "lock_wait_total_ms": round(self._wait_total * 1000, 3),
+                "lock_wait_avg_ms": round(self._wait_total * 1000 / self._tx, 3) if self._tx else 0.0,
+                "lock_wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+pool = ConnectionPool(DB_PATH)
+
+def db():
+    return pool.connection()
@@ -0,0 +1,50 @@
+# ================== src/services/fake_llm.py ==================
+# Offline stand-in for the OpenAI client (AI_FAKE=1): same
+# client.chat.completions.create(...) surface, canned answer after a
+# configurable delay (word by word with stream=True), so the auto-reply
+# pipeline can be exercised without a key.
+import os, time
+from types import SimpleNamespace
+
+LATENCY_MS = float(os.getenv("AI_FAKE_LATENCY_MS", "1200"))   # whole completion
+TTFT_MS    = float(os.getenv("AI_FAKE_TTFT_MS", "250"))        # first streamed token
+
+
+def enabled():
+    return os.getenv("AI_FAKE", "").strip().lower() in ("1", "true", "yes")
+
+
+class _Completions:
+    def __init__(self, latency_ms, ttft_ms):
+        self.latency_ms = latency_ms
+        self.ttft_ms = min(ttft_ms, latency_ms)
+        self.calls = 0
+
+    def create(self, model=None, messages=(), temperature=None, stream=False, **_):
+        self.calls += 1
+        question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        text = f"(fake {model or 'llm'}) You asked: {question[:200]}"
+        if stream:
+            return self._stream(model, text)
+        time.sleep(self.latency_ms / 1000.0)
+        msg = SimpleNamespace(role="assistant", content=text)
+        return SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, message=msg, finish_reason="stop")])
+
+    def _stream(self, model, text):
+        # word-sized chunks: first after TTFT, the rest spread over the remaining latency
+        words = [w + " " for w in text.split(" ")]
+        words[-1] = words[-1].rstrip()
+        gap = (self.latency_ms - self.ttft_ms) / 1000.0 / max(1, len(words) - 1)
+        time.sleep(self.ttft_ms / 1000.0)
+        for i, w in enumerate(words):
+            if i:
+                time.sleep(gap)
+            delta = SimpleNamespace(role="assistant" if i == 0 else None, content=w)
+            yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+        yield SimpleNamespace(model=model, choices=[SimpleNamespace(index=0, delta=SimpleNamespace(role=None, content=None),
+                                                                    finish_reason="stop")])
+
+
+class FakeOpenAI:
+    def __init__(self, latency_ms=LATENCY_MS, ttft_ms=TTFT_MS, **_):
+        self.chat = SimpleNamespace(completions=_Completions(latency_ms, ttft_ms))
@@ -0,0 +1,139 @@
+# ================== src/services/faq_index.py ==================
+# Precomputed FAQ answers, memory-mapped read-only at startup.
+# Built offline by scripts/build_faq_index.py; /api/ai answers from it when
+# a question matches an indexed one confidently enough, else asks the LLM.
+# "Confidently" = cosine >= FAQ_MIN_SCORE *and* no key term of the visitor's
+# question missing from the indexed one (negations must agree too): the n-gram
+# cosine alone rates "Amazon SEO" ≈ "Shopify SEO" and "do NOT use" ≈ "use".
+#
+# File layout (little-endian; vectors are services.answer_cache.features):
+#   header   8s magic, u32 n, u32 dim, u32 nnz, u32 blob_len
+#   indptr   u32[n+1]        row i = indices/data[indptr[i]:indptr[i+1]]
+#   indices  u16[nnz]  (+2 bytes padding when nnz is odd)
+#   data     f32[nnz]
+#   offsets  u32[n+1]        entry i = blob[offsets[i]:offsets[i+1]]
+#   blob     UTF-8 JSON {"q","a","sources"} per entry
+import os, json, mmap, struct, logging
+
+from services.answer_cache import DIM, normalize, features, key_terms, same_question
+
+try:
+    import numpy as np
+except ImportError:   # optional
+    np = None
+
+BASE_DIR   = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))   # src/
+INDEX_PATH = os.getenv("FAQ_INDEX_PATH", os.path.join(BASE_DIR, "data", "faq_index.bin"))
+MIN_SCORE  = float(os.getenv("FAQ_MIN_SCORE", "0.9"))     # cosine needed to skip the LLM
+
+MAGIC  = b"DMSFAQ1\0"
+HEADER = struct.Struct("<8sIIII")
+
+
+def write_index(path, entries):
+    """entries: [{"q", "a", "sources"}] -> index file at path (atomic replace)."""
+    indptr, indices, data = [0], [], []
+    offsets, blob = [0], bytearray()
+    for e in entries:
+        vec = sorted(features(normalize(e["q"])).items())
+        indices += [k for k, _ in vec]
+        data += [v for _, v in vec]
+        indptr.append(len(indices))
+        blob += json.dumps(e, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        offsets.append(len(blob))
+    n, nnz = len(entries), len(indices)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, n, DIM, nnz, len(blob)))
+        f.write(struct.pack(f"<{n + 1}I", *indptr))
+        f.write(struct.pack(f"<{nnz}H", *indices))
+        if nnz % 2:
+            f.write(b"\0\0")
+        f.write(struct.pack(f"<{nnz}f", *data))
+        f.write(struct.pack(f"<{n + 1}I", *offsets))
+        f.write(blob)
+    os.replace(tmp, path)
+
+
+class FaqIndex:
+    def __init__(self, path=INDEX_PATH, min_score=MIN_SCORE):
+        self.path = path
+        self.min_score = min_score
+        self.n = 0
+        self.hits = self.misses = self.term_rejects = 0
+        self._mm = None
+        self._exact = {}
+        try:
+            self._open()
+        except FileNotFoundError:
+            logging.info(f"[faq_index] {path} not built — every question goes to the LLM")
+        except Exception:
+            logging.exception(f"[faq_index] could not open {path}")
+            self.n = 0
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, dim, nnz, blob_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or dim != DIM:
+            raise ValueError(f"incompatible index (magic={magic!r}, dim={dim}, expected {DIM})")
+        view = memoryview(self._mm)
+        pos = HEADER.size
+        self.indptr = view[pos:pos + 4 * (n + 1)].cast("I");  pos += 4 * (n + 1)
+        self.indices = view[pos:pos + 2 * nnz].cast("H");     pos += 2 * nnz + (2 if nnz % 2 else 0)
+        self.data = view[pos:pos + 4 * nnz].cast("f");        pos += 4 * nnz
+        self.offsets = view[pos:pos + 4 * (n + 1)].cast("I"); pos += 4 * (n + 1)
+        self.blob = view[pos:pos + blob_len]
+        if np is not None:
+            # zero-copy views over the mapping
+            self._np = (np.frombuffer(self.indptr, np.uint32), np.frombuffer(self.indices, np.uint16),
+                        np.frombuffer(self.data, np.float32))
+        self.n = n
+        # the questions themselves are tiny; exact matches skip scoring entirely
+        self._exact = {normalize(self.entry(i)["q"]): i for i in range(n)}
+
+    def entry(self, i):
+        return json.loads(bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]))
+
+    def _scores(self, vec):
+        if np is not None:
+            indptr, indices, data = self._np
+            q = np.zeros(DIM, np.float32)
+            q[list(vec)] = list(vec.values())
+            prod = data * q[indices]
+            sums = np.concatenate(([0.0], np.cumsum(prod, dtype=np.float64)))
+            return sums[indptr[1:]] - sums[indptr[:-1]]
+        out = []
+        for i in range(self.n):
+            lo, hi = self.indptr[i], self.indptr[i + 1]
+            out.append(sum(self.data[j] * vec.get(self.indices[j], 0.0) for j in range(lo, hi)))
+        return out
+
+    def match(self, question):
+        """(score, {"q","a","sources"}) for the best entry >= min_score whose key terms
+        cover the question's, else None."""
+        if not self.n:
+            return None
+        norm = normalize(question)
+        if not norm:
+            return None
+        i = self._exact.get(norm)
+        if i is not None:
+            self.hits += 1
+            return 1.0, self.entry(i)
+        scores = self._scores(features(norm))
+        best = max(range(self.n), key=scores.__getitem__)
+        if scores[best] < self.min_score:
+            self.misses += 1
+            return None
+        entry = self.entry(best)
+        if not same_question(key_terms(norm), key_terms(normalize(entry["q"]))):
+            self.term_rejects += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return float(scores[best]), entry
+
+    def stats(self):
+        return {"path": self.path, "entries": self.n, "min_score": self.min_score,
+                "hits": self.hits, "misses": self.misses, "term_rejects": self.term_rejects}
@@ -0,0 +1,278 @@
+# ================== src/services/hub.py ==================
+# Tiny Pub/Sub for SSE.
+# Sync subscribers (WSGI threads) block on a Queue; async subscribers (ASGI)
+# await an asyncio.Queue, so an idle stream costs a coroutine, not a thread.
+# Subscribers always live in this process; the backend (hub_backends.py)
+# carries publishes to the other workers.
+#
+# Every event gets a monotonically increasing id and is kept in a bounded
+# per-channel ring, so a reconnect with Last-Event-ID replays only what was
+# missed. If the ring has rolled past that id the stream sends `resync`
+# and the client re-fetches over HTTP instead.
+#
+# A published event is framed and UTF-8 encoded exactly once; every
+# subscriber (and the replay ring) shares the same immutable bytes.
+import os, json, time, asyncio, threading
+from collections import deque, OrderedDict
+from queue import Queue, Empty
+from services.hub_backends import make_backend
+
+KEEPALIVE_SEC   = 15
+RETRY_MS        = 10000
+REPLAY_SIZE     = int(os.getenv("SSE_REPLAY_SIZE", "64"))        # events kept per channel
+REPLAY_CHANNELS = int(os.getenv("SSE_REPLAY_CHANNELS", "5000"))  # channels with a ring (LRU)
+
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+PING_FRAME   = b": ping\n\n"
+
+
+def sse_frame(item: dict) -> bytes:
+    ev   = item.get("event", "message")
+    data = json.dumps(item.get("data", {}), ensure_ascii=False)
+    head = f"id: {item['id']}\n" if item.get("replay", True) and "id" in item else ""
+    return (head + f"event: {ev}\n" f"data: {data}\n\n").encode("utf-8")
+
+
+def parse_event_id(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _channels(names):
+    return (names,) if isinstance(names, str) else tuple(names)
+
+
+class _Event:
+    __slots__ = ("id", "replay", "frame")
+
+    def __init__(self, msg: dict):
+        self.id = msg.get("id", 0)
+        self.replay = msg.get("replay", True)
+        self.frame = sse_frame(msg)
+
+
+class _Ring:
+    __slots__ = ("items", "floor")
+
+    def __init__(self, floor):
+        self.items = deque(maxlen=REPLAY_SIZE)
+        self.floor = floor      # ids <= floor may have been dropped
+
+
+class _AsyncSub:
+    __slots__ = ("loop", "q")
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.q = asyncio.Queue()
+
+
+class Hub:
+    def __init__(self, backend=None):
+        self.lock = threading.Lock()
+        self.channels = {}  # name -> set(Queue | _AsyncSub)
+        self.backend = backend or make_backend()
+        self._pid = None
+        self._last_id = 0
+        self.rings = OrderedDict()   # name -> _Ring (LRU)
+        # nothing from before this process started can be replayed
+        self.evicted_floor = self._next_id()
+        self.replayed = self.resyncs = self.backend_resyncs = 0
+
+    def _next_id(self):
+        # microsecond clock, forced strictly increasing — close to monotonic
+        # across workers too, which is what replay over the unix backend needs
+        with self.lock:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+            return self._last_id
+
+    def _ensure_backend(self):
+        # started lazily so every forked worker gets its own broker connection
+        if self._pid != os.getpid():
+            with self.lock:
+                if self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self.backend.start(self._fanout, self._resync)
+
+    def _add(self, names, sub):
+        self._ensure_backend()
+        with self.lock:
+            for name in names:
+                self.channels.setdefault(name, set()).add(sub)
+
+    def _discard(self, names, sub):
+        with self.lock:
+            for name in names:
+                subs = self.channels.get(name)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self.channels[name]
+
+    def _replay(self, names, last_id):
+        """Events newer than last_id across names (id order), or None if some are gone."""
+        items, lost = [], False
+        with self.lock:
+            for name in names:
+                ring = self.rings.get(name)
+                if ring is None:
+                    lost |= last_id < self.evicted_floor
+                else:
+                    lost |= last_id < ring.floor
+                    items += [e for e in ring.items if e.id > last_id]
+        if len(names) > 1:
+            items.sort(key=lambda e: e.id)
+        if lost:
+            self.resyncs += 1
+            return None
+        self.replayed += len(items)
+        return items
+
+    def _opening(self, names, last_event_id):
+        """retry + replayed frames; returns (frames, highest id already sent)."""
+        frames = [f"retry: {RETRY_MS}\n\n".encode()]  # auto-retry 10s
+        last_id = parse_event_id(last_event_id)
+        if last_id is None:
+            return frames, 0
+        items = self._replay(names, last_id)
+        if items is None:
+            frames.append(RESYNC_FRAME)
+            return frames, 0
+        frames += [e.frame for e in items]
+        return frames, (items[-1].id if items else last_id)
+
+    def subscribe(self, names, last_event_id=None):
+        """Blocking generator for WSGI responses (holds one worker thread).
+
+        names: one channel or a tuple of channels merged into one stream.
+        """
+        names = _channels(names)
+        q = Queue()
+        self._add(names, q)   # subscribe first so nothing slips between replay and live
+
+        def stream():
+            try:
+                frames, high = self._opening(names, last_event_id)
+                yield b"".join(frames)
+                while True:
+                    try:
+                        ev = q.get(timeout=KEEPALIVE_SEC)  # keep-alive every ~15s
+                        if ev.id <= high:
+                            continue              # already sent during replay
+                        yield ev.frame
+                    except Empty:
+                        # heartbeat comment
+                        yield PING_FRAME
+            finally:
+                self._discard(names, q)
+        return stream()
+
+    async def subscribe_async(self, names, last_event_id=None):
+        """Async generator for ASGI responses (no thread held while idle)."""
+        names = _channels(names)
+        sub = _AsyncSub(asyncio.get_running_loop())
+        self._add(names, sub)
+        try:
+            frames, high = self._opening(names, last_event_id)
+            yield b"".join(frames)
+            while True:
+                try:
+                    ev = await asyncio.wait_for(sub.q.get(), KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    yield PING_FRAME
+                    continue
+                if ev.id <= high:
+                    continue
+                yield ev.frame
+        finally:
+            self._discard(names, sub)
+
+    def publish(self, name: str, event: str, data: dict, replay=True):
+        """replay=False for transient events (typing) that must not be replayed."""
+        self._ensure_backend()
+        msg = {"id": self._next_id(), "event": event, "data": data, "replay": replay}
+        self._fanout(name, msg)
+        self.backend.publish(name, msg)
+
+    def _fanout(self, name: str, msg: dict):
+        """Deliver to this process's subscribers (local publish or from the backend)."""
+        ev = _Event(msg)   # serialize once, share the bytes
+        with self.lock:
+            subs = list(self.channels.get(name, ()))
+            if ev.replay:
+                self._remember(name, ev)
+        self._send(subs, ev)
+
+    def _resync(self, names=None):
+        """The backend lost events for names (None = any channel): live streams get
+        `resync`, and a later Last-Event-ID from before now can't be replayed either."""
+        ev = _Event({"id": self._next_id(), "event": "resync", "data": {}, "replay": False})
+        with self.lock:
+            if names is None:
+                subs = set().union(*self.channels.values())
+                self.evicted_floor = ev.id
+                for ring in self.rings.values():
+                    ring.floor = ev.id
+            else:
+                subs = set()
+                for name in names:
+                    subs |= self.channels.get(name, set())
+                    ring = self.rings.get(name)
+                    if ring is not None:
+                        ring.floor = ev.id
+                    elif name in self.channels:
+                        self.rings[name] = _Ring(ev.id)
+            self.backend_resyncs += 1
+        self._send(subs, ev)
+
+    def _send(self, subs, ev):
+        by_loop = {}
+        for s in subs:
+            if isinstance(s, _AsyncSub):
+                by_loop.setdefault(s.loop, []).append(s.q)
+                continue
+            try:
+                s.put_nowait(ev)
+            except Exception:
+                pass
+        # one wake-up per event loop, however many async subscribers it hosts
+        for loop, queues in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, queues, ev)
+            except RuntimeError:
+                pass  # loop closed
+
+    def _remember(self, name, ev):
+        # caller holds self.lock
+        ring = self.rings.get(name)
+        if ring is None:
+            ring = self.rings[name] = _Ring(self.evicted_floor)
+            if len(self.rings) > REPLAY_CHANNELS:
+                _, old = self.rings.popitem(last=False)
+                if old.items:
+                    self.evicted_floor = max(self.evicted_floor, old.items[-1].id)
+        else:
+            self.rings.move_to_end(name)
+        if len(ring.items) == ring.items.maxlen:
+            ring.floor = ring.items[0].id
+        ring.items.append(ev)
+
+    def stats(self):
+        with self.lock:
+            chans = list(self.channels.values())
+            rings = len(self.rings)
+        live = set().union(*chans)   # a stream may listen on several channels
+        async_subs = sum(1 for s in live if isinstance(s, _AsyncSub))
+        total = len(live)
+        return {"channels": len(chans), "subscribers": total,
+                "async_subscribers": async_subs, "sync_subscribers": total - async_subs,
+                "replay_channels": rings, "replayed": self.replayed, "resyncs": self.resyncs,
+                "backend_resyncs": self.backend_resyncs,
+                **self.backend.stats()}
+
+
+def _deliver(queues, ev):
+    for q in queues:
+        q.put_nowait(ev)
@@ -0,0 +1,298 @@
+# ================== src/services/hub_backends.py ==================
+# Hub backends — how a publish reaches subscribers living in other processes.
+#   HUB_BACKEND=local                      single worker (default)
+#   HUB_BACKEND=unix:/tmp/dms-hub.sock     N workers on one host
+#
+# unix: every worker keeps one connection to a tiny line-forwarding broker.
+# The broker is hosted by whichever process holds <sock>.lock (flock), so the
+# first worker to start runs it and another takes over if that worker dies.
+# It can also be run on its own:  python src/services/hub_backends.py /tmp/dms-hub.sock
+#
+# While the broker is unreachable (restart / failover) publishes are held for
+# HUB_HOLD_SEC and sent on reconnect. Whatever could not be delivered — held
+# lines that expired or overflowed, and anything other workers sent while we
+# were away — ends in `resync` for the affected streams, never in silence.
+import os, json, time, fcntl, socket, logging, selectors, threading
+from collections import deque
+
+log = logging.getLogger("hub")
+
+
+class LocalBackend:
+    """Everything lives in this process — nothing to forward."""
+    name = "local"
+
+    def start(self, deliver, resync=None):
+        pass
+
+    def publish(self, channel: str, msg: dict):
+        pass
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class UnixSocketBackend:
+    """Cross-process fan-out over a Unix socket broker (newline-delimited JSON)."""
+    name = "unix"
+    RECONNECT_SEC = 0.2
+    HOLD_SEC = float(os.getenv("HUB_HOLD_SEC", "5"))       # keep publishes this long while disconnected
+    HOLD_MAX = int(os.getenv("HUB_HOLD_MAX", "2000"))
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = None
+        self.wlock = threading.Lock()
+        self.deliver = None
+        self.resync = None
+        self._pid = None
+        self._broker = None
+        self.held = deque()          # (ts, channel, line) published while disconnected
+        self.lost = set()            # channels whose held lines expired / overflowed
+        self.sent = self.received = self.dropped = self.flushed = self.reconnects = 0
+
+    def start(self, deliver, resync=None):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self.sock = None
+        self.held.clear()
+        self.lost.clear()
+        self.deliver = deliver
+        self.resync = resync
+        threading.Thread(target=self._run, name="hub-unix", daemon=True).start()
+
+    # ---- outbound ----
+    def publish(self, channel: str, msg: dict):
+        line = json.dumps({"c": channel, "m": msg}, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+        with self.wlock:
+            sock = self.sock
+            if sock is not None:
+                try:
+                    sock.sendall(line)
+                    self.sent += 1
+                    return
+                except OSError:
+                    self._close(sock)
+            self._hold(channel, line)
+
+    def _hold(self, channel, line):
+        # caller holds self.wlock
+        self.held.append((time.monotonic(), channel, line))
+        if len(self.held) > self.HOLD_MAX:
+            _, ch, _ = self.held.popleft()
+            self.lost.add(ch)
+            self.dropped += 1
+
+    def _flush(self, sock):
+        """Send what was held while disconnected (+ a resync note for what wasn't kept)."""
+        # caller holds self.wlock
+        cutoff = time.monotonic() - self.HOLD_SEC
+        while self.held:
+            ts, ch, line = self.held[0]
+            if ts < cutoff:
+                self.lost.add(ch)
+                self.dropped += 1
+            else:
+                sock.sendall(line)
+                self.flushed += 1
+            self.held.popleft()
+        if self.lost:
+            sock.sendall(json.dumps({"r": sorted(self.lost)}).encode() + b"\n")
+            self.lost.clear()
+
+    # ---- inbound ----
+    def _run(self):
+        connected_before = False
+        while True:
+            sock = self._connect()
+            if sock is None:
+                self._try_host_broker()
+                time.sleep(self.RECONNECT_SEC)
+                continue
+            with self.wlock:
+                try:
+                    self._flush(sock)
+                except OSError:
+                    sock.close()
+                    continue
+                self.sock = sock
+            if connected_before:
+                # other workers' events sent while we were away never reached us
+                self.reconnects += 1
+                if self.resync:
+                    self.resync(None)
+            connected_before = True
+            buf = b""
+            try:
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    buf += chunk
+                    *lines, buf = buf.split(b"\n")
+                    for line in lines:
+                        self._dispatch(line)
+            except OSError:
+                pass
+            self._close(sock)
+
+    def _dispatch(self, line):
+        try:
+            env = json.loads(line)
+            self.received += 1
+            if "r" in env:
+                if self.resync:
+                    self.resync(env["r"])     # a worker lost publishes on these channels
+                return
+            self.deliver(env["c"], env["m"])
+        except Exception:
+            log.exception("[hub] bad envelope")
+
+    def _connect(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            s.connect(self.path)
+            return s
+        except OSError:
+            s.close()
+            return None
+
+    def _close(self, sock):
+        if self.sock is sock:
+            self.sock = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def _try_host_broker(self):
+        if self._broker is not None:
+            return
+        broker = Broker(self.path)
+        if broker.acquire():
+            self._broker = broker
+            threading.Thread(target=broker.serve_forever, name="hub-broker", daemon=True).start()
+
+    def stats(self):
+        return {"backend": self.name, "path": self.path, "connected": self.sock is not None,
+                "hosting_broker": self._broker is not None,
+                "sent": self.sent, "received": self.received, "dropped": self.dropped,
+                "held": len(self.held), "flushed": self.flushed, "reconnects": self.reconnects}
+
+
+class Broker:
+    """Forwards every line from one connection to all the others."""
+    MAX_BUFFER = 8 * 1024 * 1024   # a consumer this far behind is dropped
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_fd = None
+
+    def acquire(self) -> bool:
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.lock_fd = fd
+        return True
+
+    def serve_forever(self):
+        try:
+            os.unlink(self.path)   # stale socket from a dead broker
+        except FileNotFoundError:
+            pass
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        srv.bind(self.path)
+        srv.listen(128)
+        srv.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(srv, selectors.EVENT_READ, None)
+        peers = {}   # sock -> [inbuf, outbuf]
+        log.info("[hub] broker listening on %s (pid %s)", self.path, os.getpid())
+
+        def drop(s):
+            peers.pop(s, None)
+            try:
+                sel.unregister(s)
+            except (KeyError, ValueError):
+                pass
+            s.close()
+
+        def queue(s, data):
+            st = peers.get(s)
+            if st is None:
+                return
+            if not st[1]:
+                try:
+                    n = s.send(data)
+                except BlockingIOError:
+                    n = 0
+                except OSError:
+                    return drop(s)
+                data = data[n:]
+                if not data:
+                    return
+                sel.modify(s, selectors.EVENT_READ | selectors.EVENT_WRITE, None)
+            st[1] += data
+            if len(st[1]) > self.MAX_BUFFER:
+                drop(s)
+
+        while True:
+            for key, mask in sel.select():
+                s = key.fileobj
+                if s is srv:
+                    conn, _ = srv.accept()
+                    conn.setblocking(False)
+                    peers[conn] = [b"", b""]
+                    sel.register(conn, selectors.EVENT_READ, None)
+                    continue
+                if s not in peers:
+                    continue
+                if mask & selectors.EVENT_WRITE:
+                    st = peers[s]
+                    try:
+                        n = s.send(st[1])
+                    except BlockingIOError:
+                        n = 0
+                    except OSError:
+                        drop(s); continue
+                    st[1] = st[1][n:]
+                    if not st[1]:
+                        sel.modify(s, selectors.EVENT_READ, None)
+                if mask & selectors.EVENT_READ:
+                    try:
+                        chunk = s.recv(65536)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        chunk = b""
+                    if not chunk:
+                        drop(s); continue
+                    st = peers[s]
+                    st[0] += chunk
+                    cut = st[0].rfind(b"\n") + 1
+                    if not cut:
+                        continue
+                    data, st[0] = st[0][:cut], st[0][cut:]
+                    for other in list(peers):
+                        if other is not s:
+                            queue(other, data)
+
+
+def make_backend(spec=None):
+    spec = (spec if spec is not None else os.getenv("HUB_BACKEND", "local")).strip()
+    if spec.startswith("unix:"):
+        return UnixSocketBackend(spec[len("unix:"):])
+    return LocalBackend()
+
+
+if __name__ == "__main__":
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    b = Broker(sys.argv[1] if len(sys.argv) > 1 else "/tmp/dms-hub.sock")
+    if not b.acquire():
+        sys.exit("another broker already holds the lock")
+    b.serve_forever()
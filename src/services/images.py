@@ -0,0 +1,270 @@
+# ================== src/services/images.py ==================
+# Responsive image derivatives for static/images.
+#   build():  resize every source to the standard WIDTHS (never upscaled) and
+#             encode AVIF + WebP + a JPEG/PNG fallback into static/_img/ as
+#             name.<srchash>.<w>.<ext>, in a process pool; a source whose
+#             sha256 (and encode settings) match the previous manifest is
+#             skipped. Writes _img/manifest.json, removes stale derivatives.
+#   ImageManifest: loaded once at startup; pick() chooses the format from
+#             Accept (avif > webp > fallback) and the smallest width covering
+#             the hint; rewrite() adds srcset to <img sizes=…> tags of the
+#             built pages (services/assets.py calls it).
+# Pillow is optional and only imported by the build side (the app imports this
+# module at boot for ImageManifest): without it build() refuses and
+# ImageManifest serves whatever an earlier build left (or nothing — /img/ then
+# falls back to the original file).
+import os, io, re, json, hashlib
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote, unquote
+
+from services import precompress
+
+WIDTHS       = tuple(int(w) for w in os.getenv("IMG_WIDTHS", "320,640,960,1280,1920").split(","))
+WORKERS      = int(os.getenv("IMG_WORKERS", "0")) or os.cpu_count() or 1
+QUALITY      = {"avif": int(os.getenv("IMG_AVIF_QUALITY", "50")),
+                "webp": int(os.getenv("IMG_WEBP_QUALITY", "78")),
+                "jpeg": int(os.getenv("IMG_JPEG_QUALITY", "82"))}
+SOURCE_EXT   = {".jpg", ".jpeg", ".png", ".webp"}
+URL_PREFIX   = "/img/"
+MIME         = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+EXT          = {"avif": ".avif", "webp": ".webp", "jpeg": ".jpg", "png": ".png"}
+
+IMMUTABLE    = "public, max-age=31536000, immutable"
+SHORT        = "public, max-age=300"
+
+# <img …> tags and their src attribute (rewrite() only touches images/… sources)
+_IMG = re.compile(r"<img\b[^>]*>", re.I)
+_SRC = re.compile(r"""\ssrc=(?P<q>["'])(?P<url>[^"']+)(?P=q)""")
+_ICON = re.compile(r"""(?P<head><link\b[^>]*\srel=["'](?:shortcut )?icon["'][^>]*\shref=)(?P<q>["'])(?P<url>[^"']+)(?P=q)""", re.I)
+
+
+def available():
+    """Pillow importable? (imports it — build side only)"""
+    try:
+        import PIL.Image
+    except ImportError:
+        return False
+    return True
+
+
+def modern_formats():
+    """Formats this Pillow build can write, best first."""
+    if not available():
+        return ()
+    from PIL import features
+    return tuple(f for f in ("avif", "webp") if features.check(f))
+
+
+def _settings(formats, widths):
+    return {"formats": list(formats), "widths": list(widths), "quality": QUALITY}
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _encode(im, fmt):
+    buf = io.BytesIO()
+    if fmt == "avif":
+        im.save(buf, "AVIF", quality=QUALITY["avif"], speed=6)
+    elif fmt == "webp":
+        im.save(buf, "WEBP", quality=QUALITY["webp"], method=6)
+    elif fmt == "jpeg":
+        im.save(buf, "JPEG", quality=QUALITY["jpeg"], optimize=True, progressive=True)
+    else:
+        im.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def _derive(src, rel, sha, out_dir, formats, widths):
+    """Worker (runs in the pool): all derivatives of one source. Returns its manifest entry."""
+    from PIL import Image, ImageOps
+    with Image.open(src) as im:
+        im = ImageOps.exif_transpose(im)
+        alpha = im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info)
+        im = im.convert("RGBA" if alpha else "RGB")
+    sw, sh = im.size
+    targets = sorted({w for w in widths if w < sw} | {min(sw, max(widths))})
+    base = os.path.splitext(rel)[0]
+    fallback = "png" if alpha else "jpeg"
+    variants = {}
+    for w in targets:
+        scaled = im if w == sw else im.resize((w, max(1, round(sh * w / sw))), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in (*formats, fallback):
+            data = _encode(scaled, fmt)
+            name = f"{base}.{sha[:10]}.{w}{EXT[fmt]}"
+            precompress.write_atomic(os.path.join(out_dir, name), data)
+            variants.setdefault(fmt, {})[str(w)] = {"file": name, "size": len(data)}
+    return rel, {"sha256": sha, "width": sw, "height": sh, "fallback": fallback,
+                 "size": os.path.getsize(src), "variants": variants}
+
+
+def build(images_dir, out_dir, widths=WIDTHS, formats=None, workers=WORKERS):
+    """Generate missing/changed derivatives. Returns (manifest, rebuilt sources)."""
+    if not available():
+        raise RuntimeError("Pillow is not installed")
+    formats = modern_formats() if formats is None else tuple(formats)
+    settings = _settings(formats, widths)
+    try:
+        with open(os.path.join(out_dir, "manifest.json"), encoding="utf-8") as f:
+            old = json.load(f)
+    except (OSError, ValueError):
+        old = {}
+    old_images = old.get("images", {}) if old.get("settings") == settings else {}
+
+    images, jobs = {}, []
+    for root, _, names in os.walk(images_dir):
+        for n in sorted(names):
+            if os.path.splitext(n)[1].lower() not in SOURCE_EXT or n.startswith("."):
+                continue
+            src = os.path.join(root, n)
+            rel = os.path.relpath(src, images_dir).replace(os.sep, "/")
+            sha = _sha256(src)
+            prev = old_images.get(rel)
+            if prev and prev["sha256"] == sha and all(
+                    os.path.exists(os.path.join(out_dir, v["file"]))
+                    for per_w in prev["variants"].values() for v in per_w.values()):
+                images[rel] = prev                    # unchanged — keep the old derivatives
+            else:
+                jobs.append((src, rel, sha, out_dir, formats, widths))
+
+    if len(jobs) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+            for rel, entry in ex.map(_derive, *zip(*jobs)):
+                images[rel] = entry
+    else:
+        for job in jobs:
+            rel, entry = _derive(*job)
+            images[rel] = entry
+
+    manifest = {"version": 1, "prefix": URL_PREFIX, "settings": settings,
+                "images": dict(sorted(images.items()))}
+    precompress.write_atomic(os.path.join(out_dir, "manifest.json"),
+                             json.dumps(manifest, indent=1, ensure_ascii=False).encode("utf-8"))
+    # derivatives of changed/removed sources
+    keep = {v["file"] for e in images.values() for per_w in e["variants"].values() for v in per_w.values()}
+    for root, _, names in os.walk(out_dir):
+        for n in names:
+            rel = os.path.relpath(os.path.join(root, n), out_dir).replace(os.sep, "/")
+            if rel != "manifest.json" and rel not in keep:
+                os.unlink(os.path.join(root, n))
+    return manifest, [j[1] for j in jobs]
+
+
+def accepted_formats(accept):
+    """Image formats an Accept header allows (q=0 means refused)."""
+    out = set()
+    for part in (accept or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k.strip() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if q > 0 and name.startswith("image/"):
+            out.add(name[len("image/"):])
+    return out
+
+
+def _image_rel(url):
+    """images-relative path an <img src> points at ("logo.png"), or None."""
+    url = unquote(url)
+    for prefix in ("/static/", "./", "/"):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+            break
+    return url[len("images/"):] if url.startswith("images/") else None
+
+
+class ImageManifest:
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.images = {}
+        self.served = {}          # format -> responses
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.out_dir, "manifest.json"), encoding="utf-8") as f:
+                m = json.load(f)
+        except (OSError, ValueError):
+            return False
+        images = {}
+        for rel, e in m.get("images", {}).items():
+            widths = {fmt: sorted(int(w) for w in per_w) for fmt, per_w in e["variants"].items()}
+            images[rel] = dict(e, widths=widths, version=e["sha256"][:10])
+        self.images = images
+        return True
+
+    @property
+    def ready(self):
+        return bool(self.images)
+
+    def url(self, rel, width=None):
+        e = self.images.get(rel)
+        if e is None:
+            return None
+        w = width or e["widths"][e["fallback"]][-1]
+        return f"{URL_PREFIX}{quote(rel)}?w={w}&v={e['version']}"
+
+    def srcset(self, rel):
+        e = self.images.get(rel)
+        if e is None:
+            return None
+        return ", ".join(f"{self.url(rel, w)} {w}w" for w in e["widths"][e["fallback"]])
+
+    def pick(self, rel, accept, width=None):
+        """(file, mime, etag, version) of the best derivative for this client, or None."""
+        e = self.images.get(rel)
+        if e is None:
+            self.misses += 1
+            return None
+        ok = accepted_formats(accept)
+        fmt = next((f for f in ("avif", "webp") if f in ok and f in e["variants"]), e["fallback"])
+        widths = e["widths"][fmt]
+        w = next((x for x in widths if x >= width), widths[-1]) if width else widths[-1]
+        v = e["variants"][fmt][str(w)]
+        self.served[fmt] = self.served.get(fmt, 0) + 1
+        return os.path.join(self.out_dir, v["file"]), MIME[fmt], v["file"].rsplit("/", 1)[-1], e["version"]
+
+    def rewrite(self, text):
+        """Give every <img sizes="…" src="images/…"> a srcset of /img/ URLs (plain src left alone),
+        and point an images/ favicon at its smallest derivative."""
+        def sub(m):
+            tag = m.group(0)
+            if " srcset=" in tag or " sizes=" not in tag:
+                return tag
+            src = _SRC.search(tag)
+            rel = src and _image_rel(src.group("url"))
+            if not rel or rel not in self.images:
+                return tag
+            e = self.images[rel]
+            default = next((w for w in e["widths"][e["fallback"]] if w >= 960), e["widths"][e["fallback"]][-1])
+            new_src = self.url(rel, default).replace("&", "&amp;")
+            return (tag[:src.start("url")] + new_src + tag[src.end("url"):]).replace(
+                "<img", f'<img srcset="{self.srcset(rel).replace("&", "&amp;")}"', 1)
+        def icon(m):
+            rel = _image_rel(m.group("url"))
+            if rel not in self.images:
+                return m.group(0)
+            url = self.url(rel, self.images[rel]["widths"][self.images[rel]["fallback"]][0])
+            return m.group("head") + m.group("q") + url.replace("&", "&amp;") + m.group("q")
+        return _ICON.sub(icon, _IMG.sub(sub, text))
+
+    def stats(self):
+        derived = {}
+        for e in self.images.values():
+            for fmt, per_w in e["variants"].items():
+                derived[fmt] = derived.get(fmt, 0) + sum(v["size"] for v in per_w.values())
+        return {"ready": self.ready, "images": len(self.images),
+                "source_bytes": sum(e["size"] for e in self.images.values()),
+                "derived_bytes": derived, "served": self.served, "misses": self.misses}
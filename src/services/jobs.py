@@ -0,0 +1,81 @@
+# ================== src/services/jobs.py ==================
+# Bounded background job queue with per-key ordering.
+# Jobs with the same key (a chat cid) run one at a time in submit order;
+# different keys run in parallel on a fixed pool of worker threads.
+# submit() refuses work once `max_pending` jobs are queued (backpressure)
+# instead of letting a slow upstream pile up unbounded memory.
+import os, time, logging, threading
+from collections import deque
+from queue import Queue
+
+WORKERS     = int(os.getenv("AI_WORKERS", "4"))
+MAX_PENDING = int(os.getenv("AI_MAX_PENDING", "256"))
+
+
+class KeyedExecutor:
+    def __init__(self, workers=WORKERS, max_pending=MAX_PENDING, name="jobs"):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.name = name
+        self.lock = threading.Lock()
+        self.tails = {}        # key -> deque of jobs; present while the key is queued/running
+        self.ready = Queue()   # keys with a job to run and no worker on them
+        self.pending = 0
+        self._pid = None
+        self.done = self.failed = self.rejected = 0
+        self.busy_sec = 0.0
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Queue fn(*args) behind earlier jobs for key. False if the queue is full."""
+        self._ensure_workers()
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            q = self.tails.get(key)
+            if q is None:
+                q = self.tails[key] = deque()
+                self.ready.put(key)       # idle key → hand it to a worker
+            q.append((fn, args, kwargs))
+        return True
+
+    def _run(self):
+        while True:
+            key = self.ready.get()
+            with self.lock:
+                fn, args, kwargs = self.tails[key].popleft()
+            t = time.perf_counter()
+            try:
+                fn(*args, **kwargs)
+                ok = True
+            except Exception:
+                logging.exception(f"[{self.name}] job for {key!r} failed")
+                ok = False
+            with self.lock:
+                self.pending -= 1
+                self.busy_sec += time.perf_counter() - t
+                if ok: self.done += 1
+                else:  self.failed += 1
+                if self.tails[key]:
+                    self.ready.put(key)   # next job for this key, still one at a time
+                else:
+                    del self.tails[key]
+
+    def _ensure_workers(self):
+        # started lazily so forked workers get their own threads
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self.lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True).start()
+
+    def stats(self):
+        with self.lock:
+            return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending,
+                    "keys": len(self.tails), "done": self.done, "failed": self.failed,
+                    "rejected": self.rejected, "busy_sec": round(self.busy_sec, 3)}
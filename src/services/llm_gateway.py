@@ -0,0 +1,271 @@
+# ================== src/services/llm_gateway.py ==================
+# One door for every chat.completions call (main.py and the offline scripts):
+#   - at most LLM_MAX_CONCURRENCY calls in flight; callers queue up to
+#     LLM_QUEUE_TIMEOUT_SEC for a slot, then get GatewayBusy
+#   - single-flight: an identical prompt already in flight is joined, not resent
+#     (streams too — joiners get the pieces produced so far, then the rest live)
+#   - per-call timeout, and a circuit breaker that fails fast for
+#     LLM_BREAKER_COOLDOWN_SEC after LLM_BREAKER_FAILURES consecutive errors
+#   - latency histogram (total, and time-to-first-token for streams)
+# Callers keep their own degraded path (fallback strings) for GatewayError.
+import os, json, time, hashlib, logging, threading
+from bisect import bisect_left
+
+MAX_CONCURRENCY  = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+CALL_TIMEOUT     = float(os.getenv("LLM_TIMEOUT_SEC", "30"))
+QUEUE_TIMEOUT    = float(os.getenv("LLM_QUEUE_TIMEOUT_SEC", "10"))
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN_SEC", "30"))
+
+BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class GatewayError(RuntimeError):
+    pass
+
+
+class GatewayBusy(GatewayError):
+    """No concurrency slot within the queue timeout."""
+
+
+class CircuitOpen(GatewayError):
+    """Upstream kept failing; calls are short-circuited until the cooldown ends."""
+
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.n = 0
+        self.total = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(self.bounds, ms)] += 1
+        self.n += 1
+        self.total += ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th sample (None past the last bound)."""
+        if not self.n:
+            return None
+        rank, seen = q * self.n, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+    def snapshot(self):
+        labels = [f"<={b}ms" for b in self.bounds] + [f">{self.bounds[-1]}ms"]
+        return {"count": self.n, "avg_ms": round(self.total / self.n, 1) if self.n else None,
+                "p50_ms": self.quantile(.5), "p95_ms": self.quantile(.95),
+                "buckets": dict(zip(labels, self.counts))}
+
+
+class _Flight:
+    __slots__ = ("cond", "parts", "done", "error", "joiners")
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.parts = []
+        self.done = False
+        self.error = None
+        self.joiners = 0
+
+
+class LLMGateway:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, timeout=CALL_TIMEOUT, queue_timeout=QUEUE_TIMEOUT,
+                 breaker_failures=BREAKER_FAILURES, breaker_cooldown=BREAKER_COOLDOWN):
+        self.max_concurrency = max_concurrency
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.lock = threading.Lock()
+        self.flights = {}            # prompt key -> _Flight
+        self.in_flight = self.waiting = 0
+        self.fail_streak = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.calls = self.coalesced = self.failures = self.timeouts = self.rejected = self.short_circuited = 0
+        self.latency = Histogram()
+        self.ttft = Histogram()
+
+    # ---- public ----
+    def complete(self, client, model, messages, temperature=None):
+        """Answer text for a chat completion (shared with identical in-flight prompts)."""
+        return "".join(self._run("complete", client, model, messages, temperature))
+
+    def stream(self, client, model, messages, temperature=None):
+        """Yield answer pieces as they are generated."""
+        return self._run("stream", client, model, messages, temperature)
+
+    # ---- single-flight ----
+    def _run(self, mode, client, model, messages, temperature):
+        key = hashlib.sha1(json.dumps([mode, model, temperature, messages], sort_keys=True,
+                                      ensure_ascii=False).encode("utf-8")).hexdigest()
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                flight.joiners += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = self.flights[key] = _Flight()
+                leader = True
+        if leader:
+            return self._lead(key, flight, mode, client, model, messages, temperature)
+        return self._follow(flight)
+
+    def _lead(self, key, flight, mode, client, model, messages, temperature):
+        upstream = self._call(mode, client, model, messages, temperature)
+        finished = False
+
+        def publish(piece):
+            with flight.cond:
+                flight.parts.append(piece)
+                flight.cond.notify_all()
+        try:
+            for piece in upstream:
+                publish(piece)
+                yield piece
+            finished = True
+        except GeneratorExit:
+            # our caller went away; finish quietly if someone joined this prompt
+            if flight.joiners:
+                try:
+                    for piece in upstream:
+                        publish(piece)
+                    finished = True
+                except Exception as e:
+                    flight.error = e
+            else:
+                upstream.close()
+            raise
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            with flight.cond:
+                flight.done = True
+                if not finished and flight.error is None:
+                    flight.error = GatewayError("leader cancelled")
+                flight.cond.notify_all()
+
+    def _follow(self, flight):
+        i, deadline = 0, time.monotonic() + self.queue_timeout + self.timeout
+        while True:
+            with flight.cond:
+                while i >= len(flight.parts) and not flight.done:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        raise GatewayError("timed out waiting for a coalesced call")
+                    flight.cond.wait(left)
+                new, i = flight.parts[i:], len(flight.parts)
+                done, error = flight.done, flight.error
+            yield from new
+            if done and i >= len(flight.parts):
+                if error is not None:
+                    raise error
+                return
+
+    # ---- the actual upstream call ----
+    def _call(self, mode, client, model, messages, temperature):
+        self._check_breaker()
+        with self.lock:
+            self.waiting += 1
+        got = self.slots.acquire(timeout=self.queue_timeout)
+        with self.lock:
+            self.waiting -= 1
+            if not got:
+                self.rejected += 1
+                self.probing = False
+        if not got:
+            raise GatewayBusy(f"no LLM slot within {self.queue_timeout:g}s")
+        with self.lock:
+            self.in_flight += 1
+            self.calls += 1
+        t0 = time.perf_counter()
+        outcome = False       # True ok / False failed / None cancelled by the caller
+        kwargs = {"model": model, "messages": messages, "timeout": self.timeout}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        try:
+            if mode == "complete":
+                resp = client.chat.completions.create(**kwargs)
+                outcome = True
+                yield resp.choices[0].message.content or ""
+                return
+            first = True
+            for piece in self._pieces(client.chat.completions.create(stream=True, **kwargs)):
+                if first:
+                    with self.lock:
+                        self.ttft.add((time.perf_counter() - t0) * 1000)
+                    first = False
+                yield piece
+            outcome = True
+        except GeneratorExit:
+            outcome = outcome or None
+            raise
+        except Exception as e:
+            if "timeout" in type(e).__name__.lower() or "timed out" in str(e).lower():
+                with self.lock:
+                    self.timeouts += 1
+            raise
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                if outcome is not None:
+                    self.latency.add((time.perf_counter() - t0) * 1000)
+            self.slots.release()
+            self._record(outcome)
+
+    @staticmethod
+    def _pieces(stream):
+        for chunk in stream:
+            piece = chunk.choices[0].delta.content if chunk.choices else None
+            if piece:
+                yield piece
+
+    # ---- circuit breaker ----
+    def _check_breaker(self):
+        with self.lock:
+            if self.open_until <= 0:
+                return
+            if time.monotonic() < self.open_until or self.probing:
+                self.short_circuited += 1
+                raise CircuitOpen("LLM circuit open")
+            self.probing = True     # half-open: this call is the probe
+
+    def _record(self, ok):
+        with self.lock:
+            self.probing = False
+            if ok is None:
+                return            # cancelled: says nothing about upstream health
+            if ok:
+                self.fail_streak = 0
+                self.open_until = 0.0
+                return
+            self.failures += 1
+            self.fail_streak += 1
+            if self.open_until > 0 or self.fail_streak >= self.breaker_failures:
+                self.open_until = time.monotonic() + self.breaker_cooldown
+                logging.warning(f"[llm] circuit open for {self.breaker_cooldown:g}s "
+                                f"after {self.fail_streak} failures")
+
+    def stats(self):
+        with self.lock:
+            state = ("closed" if self.open_until <= 0 else
+                     "open" if time.monotonic() < self.open_until else "half-open")
+            return {"max_concurrency": self.max_concurrency, "in_flight": self.in_flight,
+                    "waiting": self.waiting, "calls": self.calls, "coalesced": self.coalesced,
+                    "failures": self.failures, "timeouts": self.timeouts, "rejected": self.rejected,
+                    "short_circuited": self.short_circuited, "breaker": state,
+                    "latency": self.latency.snapshot(), "ttft": self.ttft.snapshot()}
+
+
+# shared by main.py and services/ai.py
+gateway = LLMGateway()
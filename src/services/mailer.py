@@ -0,0 +1,217 @@
+# ================== src/services/mailer.py ==================
+# Outbound mail queue: requests only INSERT into mail_outbox (inside their own
+# transaction); a background sender drains it over one reused, authenticated
+# SMTP session, a batch at a time, with exponential backoff on failure.
+#
+# A claimed row is leased (next_try pushed forward) rather than locked, so a
+# worker that dies mid-send just lets the lease expire and the row is retried.
+# Sent rows are deleted MAIL_KEEP_DAYS after sending (failed ones are kept).
+import os, time, atexit, logging, smtplib, threading
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+
+POLL_SEC     = float(os.getenv("MAIL_POLL_SEC", "5"))
+BATCH        = int(os.getenv("MAIL_BATCH", "20"))
+MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+BACKOFF_SEC  = float(os.getenv("MAIL_BACKOFF_SEC", "30"))      # 30s, 60s, 2m, 4m … capped at 1h
+IDLE_SEC     = float(os.getenv("MAIL_IDLE_SEC", "60"))         # close the session after this long idle
+KEEP_DAYS    = float(os.getenv("MAIL_KEEP_DAYS", "30"))       # sent rows older than this are pruned
+PRUNE_SEC    = 3600                                             # how often the sender prunes
+LEASE_SEC    = 120
+
+
+def smtp_settings():
+    return {
+        "host": os.getenv("EMAIL_HOST", "smtp.gmail.com"),
+        "port": int(os.getenv("EMAIL_PORT", "587")),
+        "user": os.getenv("EMAIL_HOST_USER"),
+        "password": os.getenv("EMAIL_HOST_PASSWORD"),
+        "tls": os.getenv("EMAIL_USE_TLS", "1") != "0",
+        "to": os.getenv("EMAIL_TO") or os.getenv("EMAIL_HOST_USER"),
+    }
+
+
+class Outbox:
+    def __init__(self, pool, interval=POLL_SEC, batch=BATCH, max_attempts=MAX_ATTEMPTS,
+                 backoff=BACKOFF_SEC, idle=IDLE_SEC, keep_days=KEEP_DAYS):
+        self.pool = pool
+        self.interval = interval
+        self.batch = batch
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.idle = idle
+        self.keep_days = keep_days
+        self.lock = threading.Lock()
+        self.smtp = None
+        self.smtp_used = 0.0
+        self.pruned_at = 0.0
+        self._pid = None
+        self._wake = threading.Event()
+        self.sent = self.failed = self.retried = self.sessions = self.pruned = 0
+
+    # ---- producer side ----
+    def configured(self):
+        s = smtp_settings()
+        return bool(s["user"] and s["password"])
+
+    def enqueue(self, con, subject, body, to_addr=None, reply_to=None, ref=None):
+        """Queue a mail inside the caller's transaction (con from pool.tx())."""
+        t = time.time()
+        con.execute("""INSERT INTO mail_outbox(created,to_addr,subject,body,reply_to,ref,next_try)
+                       VALUES(?,?,?,?,?,?,?)""",
+                    (t, to_addr or smtp_settings()["to"], subject, body, reply_to, ref, t))
+
+    def wake(self):
+        """Call after the enqueuing transaction committed."""
+        self._ensure_sender()
+        self._wake.set()
+
+    # ---- sender ----
+    def _claim(self):
+        now = time.time()
+        with self.pool.tx() as con:
+            rows = con.execute("""SELECT id,to_addr,subject,body,reply_to,attempts FROM mail_outbox
+                                  WHERE status='queued' AND next_try<=? ORDER BY id LIMIT ?""",
+                               (now, self.batch)).fetchall()
+            if rows:
+                con.executemany("UPDATE mail_outbox SET next_try=? WHERE id=?",
+                                [(now + LEASE_SEC, r[0]) for r in rows])
+        return rows
+
+    def _session(self, s):
+        if self.smtp is not None:
+            if time.time() - self.smtp_used < 10:
+                return self.smtp                    # hot session: a drop is caught by the caller
+            try:
+                if self.smtp.noop()[0] == 250:
+                    return self.smtp
+            except Exception:
+                pass
+            self._close()
+        smtp = smtplib.SMTP(s["host"], s["port"], timeout=20)
+        if s["tls"]:
+            smtp.starttls()
+        if s["password"] and smtp.has_extn("auth"):
+            smtp.login(s["user"], s["password"])
+        self.smtp = smtp
+        self.sessions += 1
+        logging.info(f"[MAIL] session open {s['host']}:{s['port']} as {s['user']}")
+        return smtp
+
+    def _close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+            self.smtp = None
+
+    def _message(self, s, to_addr, subject, body, reply_to):
+        msg = MIMEMultipart()
+        msg["From"] = formataddr(("DMS MEHEDI Site", s["user"] or ""))
+        msg["To"] = to_addr
+        msg["Subject"] = subject
+        if reply_to:
+            msg["Reply-To"] = reply_to
+        msg.attach(MIMEText(body, "plain", "utf-8"))
+        return msg
+
+    def drain(self):
+        """Send everything due, batch by batch. Returns how many went out."""
+        total = 0
+        while True:
+            rows = self._claim()
+            if not rows:
+                break
+            s = smtp_settings()
+            done, failed = [], []
+            for id_, to_addr, subject, body, reply_to, attempts in rows:
+                msg = self._message(s, to_addr, subject, body, reply_to)
+                try:
+                    try:
+                        self._session(s).send_message(msg)
+                    except smtplib.SMTPServerDisconnected:
+                        self._close()                       # stale session: one fresh try
+                        self._session(s).send_message(msg)
+                    done.append(id_)
+                    self.smtp_used = time.time()
+                except Exception as e:
+                    logging.warning(f"[MAIL] #{id_} attempt {attempts + 1} failed: {e}")
+                    failed.append((id_, attempts + 1, str(e)[:500]))
+            self._finish(done, failed)
+            total += len(done)
+            if failed and not done:
+                self._close()
+                break          # server trouble: leave the rest to backoff
+        return total
+
+    def _finish(self, done, failed):
+        now = time.time()
+        with self.pool.tx() as con:
+            if done:
+                con.executemany("UPDATE mail_outbox SET status='sent', sent_at=?, attempts=attempts+1 WHERE id=?",
+                                [(now, i) for i in done])
+            for id_, attempts, err in failed:
+                if attempts >= self.max_attempts:
+                    con.execute("UPDATE mail_outbox SET status='failed', attempts=?, last_error=? WHERE id=?",
+                                (attempts, err, id_))
+                else:
+                    delay = min(3600.0, self.backoff * 2 ** (attempts - 1))
+                    con.execute("UPDATE mail_outbox SET attempts=?, last_error=?, next_try=? WHERE id=?",
+                                (attempts, err, now + delay, id_))
+        with self.lock:
+            self.sent += len(done)
+            self.failed += sum(1 for _, a, _ in failed if a >= self.max_attempts)
+            self.retried += sum(1 for _, a, _ in failed if a < self.max_attempts)
+
+    def prune(self):
+        """Delete sent rows older than keep_days. Returns how many went."""
+        cutoff = time.time() - self.keep_days * 86400
+        with self.pool.tx() as con:
+            n = con.execute("DELETE FROM mail_outbox WHERE status='sent' AND sent_at<?", (cutoff,)).rowcount
+        with self.lock:
+            self.pruned += n
+        if n:
+            logging.info(f"[MAIL] pruned {n} sent rows older than {self.keep_days:g} days")
+        return n
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.drain()
+                if time.time() - self.pruned_at > PRUNE_SEC:
+                    self.pruned_at = time.time()
+                    self.prune()
+            except Exception:
+                logging.exception("[MAIL] sender loop failed")
+                self._close()
+            if self.smtp is not None and time.time() - self.smtp_used > self.idle:
+                self._close()
+
+    def _ensure_sender(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self.lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+        threading.Thread(target=self._run, name="mail-sender", daemon=True).start()
+        atexit.register(self._close)
+
+    def stats(self):
+        now = time.time()
+        rows = self.pool.query("""SELECT status, COUNT(1), SUM(next_try<=?), MIN(created)
+                                  FROM mail_outbox GROUP BY status""", (now,))
+        by = {r[0]: r for r in rows}
+        q = by.get("queued")
+        with self.lock:
+            return {"queued": q[1] if q else 0, "due": int(q[2] or 0) if q else 0,
+                    "oldest_queued_sec": round(now - q[3], 1) if q else None,
+                    "sent_total": by["sent"][1] if "sent" in by else 0,
+                    "failed_total": by["failed"][1] if "failed" in by else 0,
+                    "sent": self.sent, "retried": self.retried, "failed": self.failed,
+                    "pruned": self.pruned, "sessions": self.sessions, "session_open": self.smtp is not None}
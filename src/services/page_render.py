@@ -0,0 +1,132 @@
+# ================== src/services/page_render.py ==================
+# Server-side render of the landing page: elements in static/index.html marked
+# data-cms="section.key[.index]" get their text from the CMS content, and the
+# result is written (with .gz/.br siblings) to data/rendered/ and kept in
+# memory with a strong ETag per encoding.
+#   - rebuilt when the CMS saves (ContentStore.on_change) and whenever the
+#     content ETag moved (another worker / an external edit), never per request
+#   - a restart with unchanged template + content loads the files from disk
+#     instead of compressing again
+import os, re, json, html, hashlib, logging, threading
+
+from services import precompress
+
+MAX_AGE = int(os.getenv("CMS_PAGE_MAX_AGE", "300"))     # browsers revalidate (304) after this
+SWR     = int(os.getenv("CMS_PAGE_SWR", "86400"))       # stale-while-revalidate window
+
+_CMS_TAG = re.compile(r'<(?P<tag>[a-zA-Z][\w-]*)(?P<attrs>[^>]*?\sdata-cms="(?P<path>[^"]+)"[^>]*)>'
+                      r'(?P<inner>.*?)</(?P=tag)>', re.S)
+
+
+def lookup(content, path):
+    """content["a"]["b"][0] for "a.b.0"; None when missing or not a plain value."""
+    cur = content
+    for part in path.split("."):
+        if isinstance(cur, list):
+            try:
+                cur = cur[int(part)]
+            except (ValueError, IndexError):
+                return None
+        elif isinstance(cur, dict):
+            cur = cur.get(part)
+        else:
+            return None
+    return cur if isinstance(cur, (str, int, float)) and not isinstance(cur, bool) else None
+
+
+def render(template: str, content: dict) -> str:
+    def sub(m):
+        value = lookup(content, m.group("path"))
+        if value is None:
+            return m.group(0)             # keep the template's own text
+        return f'<{m.group("tag")}{m.group("attrs")}>{html.escape(str(value), quote=False)}</{m.group("tag")}>'
+    return _CMS_TAG.sub(sub, template)
+
+
+def _hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=10).hexdigest()
+
+
+class RenderedPage:
+    def __init__(self, template_path, out_path, store, max_age=MAX_AGE, swr=SWR):
+        self.template_path = template_path
+        self.out_path = out_path
+        self.store = store
+        self.cache_control = f"public, max-age={max_age}, stale-while-revalidate={swr}"
+        self.lock = threading.Lock()
+        self.variants = None        # encoding -> (bytes, strong etag)
+        self.content_etag = None
+        self.revision = -1
+        self.builds = self.disk_loads = self.served = self.not_modified = self.joined = 0
+
+    def _template(self):
+        with open(self.template_path, "rb") as f:
+            raw = f.read()
+        return raw, _hash(raw)
+
+    def _load_from_disk(self, meta):
+        try:
+            with open(self.out_path + ".json") as f:
+                if json.load(f) != meta:
+                    return None
+            out = {}
+            for enc, suffix in (("identity", ""), *precompress.SUFFIX.items()):
+                if os.path.exists(self.out_path + suffix):
+                    with open(self.out_path + suffix, "rb") as f:
+                        out[enc] = f.read()
+            return out if _hash(out.get("identity", b"")) == meta["etag"] else None
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def build(self, snap=None):
+        """Render from the current CMS snapshot (write to disk unless it's already there)."""
+        snap = snap or self.store.snapshot()
+        with self.lock:
+            # requests that noticed the same change queue up here: the first renders,
+            # the rest reuse it (and an older snapshot never replaces a newer page)
+            if self.variants is not None and (snap.etag == self.content_etag or snap.revision < self.revision):
+                self.joined += 1
+                return self.variants
+            raw, template_hash = self._template()
+            content = json.loads(snap.body)["content"]
+            page = render(raw.decode("utf-8"), content).encode("utf-8")
+            meta = {"template": template_hash, "content": snap.etag, "etag": _hash(page)}
+            variants = self._load_from_disk(meta)
+            if variants is not None:
+                self.disk_loads += 1
+            else:
+                variants = precompress.write_variants(self.out_path, page)
+                precompress.write_atomic(self.out_path + ".json", json.dumps(meta).encode())
+                self.builds += 1
+            self.variants = {enc: (body, f"{meta['etag']}-{enc}") for enc, body in variants.items()}
+            self.content_etag = snap.etag
+            self.revision = snap.revision
+            logging.info(f"[PAGE] {os.path.basename(self.out_path)} rendered ({meta['etag']}, "
+                         f"{', '.join(f'{k} {len(v)}B' for k, v in variants.items())})")
+        return self.variants
+
+    def current(self):
+        snap = self.store.snapshot()
+        if self.variants is None or snap.etag != self.content_etag:
+            try:
+                self.build(snap)
+            except Exception:
+                logging.exception("[PAGE] render failed")
+                if self.variants is None:
+                    raise
+        return self.variants
+
+    def pick(self, accept_encoding):
+        """(body, encoding, etag) for this client."""
+        variants = self.current()
+        enc = precompress.negotiate(accept_encoding, variants)
+        body, etag = variants[enc]
+        self.served += 1
+        return body, enc, etag
+
+    def stats(self):
+        v = self.variants
+        return {"ready": v is not None, "content": self.content_etag,
+                "sizes": {k: len(b) for k, (b, _) in v.items()} if v else None,
+                "builds": self.builds, "disk_loads": self.disk_loads, "joined": self.joined,
+                "served": self.served, "not_modified": self.not_modified}
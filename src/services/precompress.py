@@ -0,0 +1,77 @@
+# ================== src/services/precompress.py ==================
+# Precompressed variants of static responses: compress once (at build/save
+# time), write `x`, `x.gz`, `x.br` next to each other, and pick one per
+# request from Accept-Encoding — no per-request compression.
+# brotli is optional: without it only gzip variants are produced.
+import os, gzip, tempfile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL   = 9
+BROTLI_LEVEL = 11
+SUFFIX = {"br": ".br", "gzip": ".gz"}
+
+
+def encode(data: bytes) -> dict:
+    """{"identity": data, "gzip": …, "br": …} — a variant is dropped when it isn't smaller."""
+    out = {"identity": data, "gzip": gzip.compress(data, GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        out["br"] = brotli.compress(data, quality=BROTLI_LEVEL)
+    return {k: v for k, v in out.items() if k == "identity" or len(v) < len(data)}
+
+
+def write_atomic(path, data: bytes):
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp.", dir=d)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)             # mkstemp creates 0600
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_variants(path, data: bytes) -> dict:
+    """Write path (+ .gz/.br siblings); stale siblings are removed. Returns the variants."""
+    variants = encode(data)
+    write_atomic(path, data)
+    for enc, suffix in SUFFIX.items():
+        if enc in variants:
+            write_atomic(path + suffix, variants[enc])
+        elif os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+    return variants
+
+
+def negotiate(accept_encoding, available):
+    """Best of br > gzip > identity that the client accepts (q=0 means refused)."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for p in params.split(";"):
+            k, _, v = p.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    for enc in ("br", "gzip"):
+        if enc in available and accepted.get(enc, accepted.get("*", 0.0)) > 0:
+            return enc
+    return "identity"
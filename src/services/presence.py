@@ -0,0 +1,125 @@
+# ================== src/services/presence.py ==================
+# Write-behind presence table: heartbeats land in memory, a background thread
+# flushes them to `clients` in one executemany transaction per interval.
+import os, time, atexit, logging, threading
+
+FLUSH_SEC = float(os.getenv("PRESENCE_FLUSH_SEC", "5"))
+IDLE_SEC  = float(os.getenv("PRESENCE_IDLE_SEC", "600"))   # drop clean rows after this long
+
+
+class PresenceTable:
+    def __init__(self, pool, interval=FLUSH_SEC, idle=IDLE_SEC):
+        self.pool = pool
+        self.interval = interval
+        self.idle = idle
+        self.lock = threading.Lock()
+        self.rows = {}       # cid -> [last_seen, online]
+        self.dirty = set()
+        self.inflight = set()   # being flushed right now
+        self._pid = None
+        self._wake = threading.Event()
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    # ---- writes ----
+    def touch(self, cid, online=True):
+        t = time.time()
+        with self.lock:
+            row = self.rows.get(cid)
+            if row is not None:
+                row[0] = t; row[1] = bool(online)
+                self.dirty.add(cid)
+        if row is None:
+            # first sighting in this process: make sure the row exists so
+            # /api/clients and message joins see it; later touches stay in memory
+            with self.pool.tx() as con:
+                con.execute("INSERT OR IGNORE INTO clients(cid,created,last_seen,online) VALUES(?,?,?,?)",
+                            (cid, t, t, 1 if online else 0))
+            with self.lock:
+                self.rows[cid] = [t, bool(online)]
+                self.dirty.add(cid)
+        self._ensure_flusher()
+
+    def forget(self, cid):
+        with self.lock:
+            self.rows.pop(cid, None)
+            self.dirty.discard(cid)
+
+    # ---- reads ----
+    def get(self, cid):
+        """(last_seen, online) — memory first, DB for clients not seen by this process."""
+        with self.lock:
+            row = self.rows.get(cid)
+            if row is not None:
+                return row[0], row[1]
+        row = self.pool.query_one("SELECT last_seen, online FROM clients WHERE cid=?", (cid,))
+        if not row:
+            return 0.0, False
+        return float(row[0] or 0), bool(row[1])
+
+    def overlay(self, cid, last_seen, online):
+        """Newer in-memory values win over what is (not yet) in the DB."""
+        with self.lock:
+            row = self.rows.get(cid)
+        if row is not None and row[0] >= (last_seen or 0):
+            return row[0], row[1]
+        return float(last_seen or 0), bool(online)
+
+    def changed_since(self, since):
+        """cids whose newer last_seen has not reached the DB yet."""
+        with self.lock:
+            return [c for c in self.dirty | self.inflight if c in self.rows and self.rows[c][0] > since]
+
+    # ---- flush ----
+    def flush(self):
+        with self.lock:
+            if not self.dirty:
+                batch = []
+            else:
+                batch = [(self.rows[c][0], 1 if self.rows[c][1] else 0, c)
+                         for c in self.dirty if c in self.rows]
+                self.inflight, self.dirty = self.dirty, set()
+        if batch:
+            try:
+                with self.pool.tx() as con:
+                    con.executemany("UPDATE clients SET last_seen=?, online=? WHERE cid=?", batch)
+            except Exception:
+                logging.exception("[presence] flush failed")
+                with self.lock:
+                    self.dirty.update(c for _, _, c in batch if c in self.rows)
+                    self.inflight = set()
+                return 0
+            with self.lock:
+                self.inflight = set()
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+        self._evict_idle()
+        return len(batch)
+
+    def _evict_idle(self):
+        cutoff = time.time() - self.idle
+        with self.lock:
+            for cid in [c for c, r in self.rows.items() if r[0] < cutoff and c not in self.dirty]:
+                del self.rows[cid]
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self.lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+        threading.Thread(target=self._run, name="presence-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    def stats(self):
+        with self.lock:
+            return {"rows": len(self.rows), "dirty": len(self.dirty), "interval": self.interval,
+                    "flushes": self.flushes, "flushed_rows": self.flushed_rows}
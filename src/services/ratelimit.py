@@ -0,0 +1,189 @@
+# ================== src/services/ratelimit.py ==================
+# Token-bucket rate limiter: "limit requests per window" with a burst of
+# `limit`, refilled continuously. Each key costs one (tokens, ts) pair and an
+# O(1) update per hit.
+# sliding=True instead keeps the times of the last `limit` accepted hits per
+# key (a sliding log): exactly `limit` in any `window`, all of them back to
+# back if need be. A bucket can't promise both — anything that allows `limit`
+# at once also lets more through within the window as it refills — so use it
+# for small limits where "N per window" is the rule visitors see.
+#   - memory backend: keys spread over lock-sharded LRU maps, bounded by
+#     max_keys (idle keys fall off the end, so spray traffic can't grow it)
+#   - sqlite backend (RATE_LIMIT_BACKEND=sqlite): buckets live in the shared
+#     rate_buckets table (sliding: one rate_hits row per hit in the window),
+#     so every worker process sees the same limits
+import os, time, zlib, logging, threading
+from collections import OrderedDict, deque
+
+BACKEND         = os.getenv("RATE_LIMIT_BACKEND", "memory")          # memory | sqlite
+MAX_KEYS        = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))     # per limiter (memory)
+SHARDS          = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1"))  # proxies that append to X-Forwarded-For
+PRUNE_EVERY     = 1000            # sqlite: hits between sweeps of full (= forgotten) buckets / old hits
+
+
+def client_ip(environ, trusted=TRUSTED_PROXIES):
+    """Caller address from a WSGI environ.
+
+    X-Forwarded-For is client-writable except for what our own proxies
+    append, so take the entry `trusted` places from the right, not the first.
+    """
+    hops = [h.strip() for h in (environ.get("HTTP_X_FORWARDED_FOR") or "").split(",") if h.strip()]
+    if trusted > 0 and hops:
+        return hops[-min(trusted, len(hops))]
+    return environ.get("REMOTE_ADDR") or "unknown"
+
+
+class RateLimiter:
+    def __init__(self, name, limit, window, burst=None, pool=None, backend=BACKEND,
+                 max_keys=MAX_KEYS, shards=SHARDS, sliding=False):
+        self.name = name
+        self.limit = int(limit)
+        self.window = float(window)
+        self.sliding = sliding
+        if sliding and burst is not None:
+            raise ValueError("a sliding window has no separate burst")
+        self.rate = limit / float(window)          # tokens per second
+        self.burst = float(burst or limit)
+        self.pool = pool if backend == "sqlite" else None
+        if backend == "sqlite" and pool is None:
+            raise ValueError("sqlite rate limit backend needs a pool")
+        self.per_shard = max(1, max_keys // shards)
+        self.shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self.lock = threading.Lock()
+        self.allowed = self.rejected = self.evicted = self.errors = 0
+        self._since_prune = 0
+
+    def hit(self, key, cost=1.0):
+        """Take `cost` tokens for key. Returns (allowed, retry_after_seconds)."""
+        now = time.time()
+        if self.pool is not None:
+            try:
+                hit = self._hit_sqlite_sliding if self.sliding else self._hit_sqlite
+                ok, wait = hit(key, cost, now)
+            except Exception:
+                # fail open: a locked/broken DB must not take the endpoints down
+                logging.exception(f"[RATE] {self.name}: sqlite backend failed")
+                with self.lock:
+                    self.errors += 1
+                ok, wait = True, 0.0
+        else:
+            ok, wait = self._hit_memory(key, cost, now)
+        with self.lock:
+            if ok:
+                self.allowed += 1
+            else:
+                self.rejected += 1
+        return ok, wait
+
+    def _take(self, tokens, ts, cost, now):
+        tokens = min(self.burst, tokens + (now - ts) * self.rate)
+        if tokens >= cost:
+            return True, tokens - cost, 0.0
+        return False, tokens, (cost - tokens) / self.rate
+
+    def _slide(self, hits, cost, now):
+        """hits: ascending accept times of one key, trimmed to the window in place.
+        Returns (allowed, retry_after); the caller records `cost` hits at now if allowed."""
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        n = int(cost)
+        if len(hits) + n <= self.limit:
+            return True, 0.0
+        # free once enough of the oldest hits leave the window
+        return False, max(0.0, hits[len(hits) + n - self.limit - 1] + self.window - now)
+
+    # ---- memory ----
+    def _hit_memory(self, key, cost, now):
+        lock, buckets = self.shards[zlib.crc32(key.encode("utf-8", "replace")) % len(self.shards)]
+        evicted = 0
+        with lock:
+            b = buckets.get(key)
+            if b is None:
+                b = buckets[key] = deque() if self.sliding else [self.burst, now]
+                while len(buckets) > self.per_shard:
+                    buckets.popitem(last=False)
+                    evicted += 1
+            else:
+                buckets.move_to_end(key)
+            if self.sliding:
+                ok, wait = self._slide(b, cost, now)
+                if ok:
+                    b.extend([now] * int(cost))
+            else:
+                ok, b[0], wait = self._take(b[0], b[1], cost, now)
+                b[1] = now
+        if evicted:
+            with self.lock:
+                self.evicted += evicted
+        return ok, wait
+
+    # ---- sqlite ----
+    def _hit_sqlite(self, key, cost, now):
+        with self.pool.tx() as con:
+            row = con.execute("SELECT tokens, ts FROM rate_buckets WHERE name=? AND key=?",
+                              (self.name, key)).fetchone()
+            tokens, ts = (row[0], row[1]) if row else (self.burst, now)
+            ok, tokens, wait = self._take(tokens, ts, cost, now)
+            con.execute("INSERT OR REPLACE INTO rate_buckets(name, key, tokens, ts) VALUES(?,?,?,?)",
+                        (self.name, key, tokens, now))
+            self._since_prune += 1
+            if self._since_prune >= PRUNE_EVERY:
+                self._since_prune = 0
+                # a bucket idle long enough to refill completely is the same as no row
+                cur = con.execute("DELETE FROM rate_buckets WHERE name=? AND ts<?",
+                                  (self.name, now - self.burst / self.rate))
+                with self.lock:
+                    self.evicted += cur.rowcount
+        return ok, wait
+
+    def _hit_sqlite_sliding(self, key, cost, now):
+        with self.pool.tx() as con:
+            con.execute("DELETE FROM rate_hits WHERE name=? AND key=? AND ts<=?",
+                        (self.name, key, now - self.window))
+            hits = deque(r[0] for r in con.execute(
+                "SELECT ts FROM rate_hits WHERE name=? AND key=? ORDER BY ts", (self.name, key)))
+            ok, wait = self._slide(hits, cost, now)
+            if ok:
+                con.executemany("INSERT INTO rate_hits(name, key, ts) VALUES(?,?,?)",
+                                [(self.name, key, now)] * int(cost))
+            self._since_prune += 1
+            if self._since_prune >= PRUNE_EVERY:
+                self._since_prune = 0
+                # keys that stopped hitting never run the per-key delete above
+                cur = con.execute("DELETE FROM rate_hits WHERE name=? AND ts<=?",
+                                  (self.name, now - self.window))
+                with self.lock:
+                    self.evicted += cur.rowcount
+        return ok, wait
+
+    def reset(self, key=None):
+        for lock, buckets in self.shards:
+            with lock:
+                if key is None:
+                    buckets.clear()
+                else:
+                    buckets.pop(key, None)
+        if self.pool is not None:
+            table = "rate_hits" if self.sliding else "rate_buckets"
+            with self.pool.tx() as con:
+                if key is None:
+                    con.execute(f"DELETE FROM {table} WHERE name=?", (self.name,))
+                else:
+                    con.execute(f"DELETE FROM {table} WHERE name=? AND key=?", (self.name, key))
+
+    def stats(self):
+        keys = 0
+        if self.pool is not None:
+            keys = self.pool.query_one(
+                "SELECT COUNT(DISTINCT key) FROM rate_hits WHERE name=?" if self.sliding else
+                "SELECT COUNT(1) FROM rate_buckets WHERE name=?", (self.name,))[0]
+        for lock, buckets in self.shards:
+            with lock:
+                keys += len(buckets)
+        with self.lock:
+            return {"backend": "sqlite" if self.pool is not None else "memory",
+                    "window": "sliding" if self.sliding else "bucket",
+                    "rate_per_min": round(self.rate * 60, 3), "burst": self.burst,
+                    "keys": keys, "allowed": self.allowed, "rejected": self.rejected,
+                    "evicted": self.evicted, "errors": self.errors}
@@ -158,8 +158,14 @@
         // টাইপিং থামাও—মেসেজ এলেই
         hideTyping();
 
+        // streamed already (message_delta) → just settle the final text
+        const streamed = mid && document.getElementById(bubbleId(mid));
+        if (streamed) {
+          streamed.textContent = text;
+          streamed.classList.remove("dms-caret");
+          scrollEnd();
         // এজেন্ট/বট মেসেজে টাইপরাইটার (ইচ্ছা করলে সরাসরি addBubble করতে পারো)
-        if (role === "agent" || role === "bot") {
+        } else if (role === "agent" || role === "bot") {
           addTypewriter("agent", text, mid);
         } else {
           addBubble("user", text, mid);
@@ -174,6 +180,44 @@
       } catch { }
     });
 
+    // CMS save → refetch only that section and hand it to the page (script.js
+    // updates the [data-cms="section.…"] elements from `dms:content`). Pages with
+    // nothing of that section on them don't fetch at all.
+    const contentSeen = {};
+    const showsSection = s => [...document.querySelectorAll("[data-cms]")].some(el => el.dataset.cms.split(".")[0] === s);
+    es.addEventListener("content_changed", async e => {
+      try {
+        const d = JSON.parse(e.data || "{}");   // {section, version, removed}
+        if (!d.section || contentSeen[d.section] === d.version || !showsSection(d.section)) return;
+        contentSeen[d.section] = d.version;
+        let content = null;
+        if (!d.removed) {
+          const r = await fetch(`/api/content/${encodeURIComponent(d.section)}`);
+          if (!r.ok) return;
+          content = (await r.json()).content;
+        }
+        window.dispatchEvent(new CustomEvent("dms:content", { detail: { section: d.section, version: d.version, content } }));
+      } catch { }
+    });
+
+    // bot reply while it is being generated: {mid, delta}; the final `message` follows
+    es.addEventListener("message_delta", e => {
+      try {
+        const d = JSON.parse(e.data || "{}");
+        if (!d.mid || !d.delta) return;
+        let el = document.getElementById(bubbleId(d.mid));
+        if (!el) {
+          hideTyping();
+          el = document.createElement("div");
+          el.className = "dms-chat__bubble dms-chat__bubble--agent dms-caret";
+          el.id = bubbleId(d.mid);
+          msgsEl.appendChild(el);
+        }
+        el.textContent += d.delta;
+        scrollEnd();
+      } catch { }
+    });
+
     // seen receipts (agent -> user)
     es.addEventListener("seen", e => {
       try {
@@ -190,25 +234,37 @@
       } catch { }
     });
 
-    es.onerror = () => { /* auto-reconnect by browser */ };
+    // server could not replay what we missed (Last-Event-ID too old) → re-fetch
+    es.addEventListener("resync", () => { loadHistory(true); });
+
+    es.onerror = () => { /* auto-reconnect by browser (resends Last-Event-ID) */ };
   }
   initSSE();
 
   // ---------- History + Heartbeat ----------
-  (async function loadHistory() {
+  // lastId = highest message id we have rendered; a resync only asks for what came after it
+  let lastId = 0;
+  async function loadHistory(delta) {
     try {
-      const r = await fetch(`/api/chat/history/${encodeURIComponent(cid)}`);
-      const list = await r.json();
-      msgsEl.innerHTML = "";
+      const base = `/api/chat/history/${encodeURIComponent(cid)}`;
+      if (!delta || !lastId) msgsEl.innerHTML = "";
       const mids = [];
-      (list || []).forEach(m => {
-        addBubble(m.role === 'user' ? 'user' : 'agent', m.content, m.mid);
-        if (m.role !== 'user' && !m.seen_by_client && m.mid) mids.push(m.mid);
-      });
+      for (let more = true; more;) {
+        const r = await fetch(delta && lastId ? `${base}?after_id=${lastId}&limit=200` : base);
+        const list = await r.json();
+        (list || []).forEach(m => {
+          lastId = Math.max(lastId, m.id || 0);
+          if (m.mid && document.getElementById(bubbleId(m.mid))) return;  // already shown via SSE
+          addBubble(m.role === 'user' ? 'user' : 'agent', m.content, m.mid);
+          if (m.role !== 'user' && !m.seen_by_client && m.mid) mids.push(m.mid);
+        });
+        more = !!(delta && lastId) && r.headers.get("X-Has-More") === "1";
+      }
       if (mids.length) markSeen(mids, "client");
       scrollEnd();
     } catch { }
-  })();
+  }
+  loadHistory();
 
   function heartbeat() {
     fetch("/api/client/heartbeat", {
@@ -302,13 +358,18 @@
         method: "POST", headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ cid, text, tempId })
       });
-      const j = await r.json();
-      const serverMid = j && j.mid ? j.mid : null;
-      const el = document.querySelector(`[data-tempid="${tempId}"]`);
-      if (el) {
-        el.id = "b_" + (serverMid || tmpMid);
-        el.removeAttribute("data-tempid");
-        el.setAttribute("data-status", "sent");
+      if (r.status === 429) {           // rate limited: not saved, say so instead of ticking it
+        d.removeAttribute("data-tempid");
+        d.setAttribute("data-status", "failed");
+      } else {
+        const j = await r.json();
+        const serverMid = j && j.mid ? j.mid : null;
+        const el = document.querySelector(`[data-tempid="${tempId}"]`);
+        if (el) {
+          el.id = "b_" + (serverMid || tmpMid);
+          el.removeAttribute("data-tempid");
+          el.setAttribute("data-status", "sent");
+        }
       }
     } catch {
       d.setAttribute("data-status", "sent");
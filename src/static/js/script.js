@@ -11,6 +11,7 @@ document.addEventListener('DOMContentLoaded', function() {
     initTestimonials();
     initContactForm();
     initSmoothScrolling();
+    initLiveContent();
 });
 
 // Custom Cursor
@@ -713,6 +714,24 @@ function initSmoothScrolling() {
     });
 }
 
+// Live CMS content: after an admin save the chat widget re-fetches the changed
+// section and fires `dms:content`; refresh that section's data-cms elements
+// (same "section.key.index" paths the server-side render fills in)
+function initLiveContent() {
+    window.addEventListener('dms:content', (e) => {
+        const { section, content } = e.detail || {};
+        if (!section || content == null) return;
+        document.querySelectorAll('[data-cms]').forEach(el => {
+            const [head, ...path] = el.dataset.cms.split('.');
+            if (head !== section) return;
+            const value = path.reduce((cur, key) => (cur == null ? undefined : cur[key]), content);
+            if ((typeof value === 'string' || typeof value === 'number') && el.textContent !== String(value)) {
+                el.textContent = value;
+            }
+        });
+    });
+}
+
 // Rate limiting for form submissions
 class RateLimiter {
     constructor(maxAttempts = 3, windowMs = 300000) { // 3 attempts per 5 minutes